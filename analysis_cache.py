@@ -0,0 +1,165 @@
+import os
+import json
+import pathlib
+import logging
+import hashlib
+import sqlite3
+
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def get_content_hash(file: str = None) -> str:
+    """Compute the SHA-256 digest of the file content.
+    :param file: {str}
+    :returns digest: {str}
+    """
+    digest = hashlib.sha256()
+    with open(file, 'rb') as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class AnalysisCache():
+    '''Persistent SQLite store of per-file analysis counters.
+    Each entry is keyed on the file path and is considered current while
+    the size and mtime of the file are unchanged.  When content hashing
+    is enabled, a file whose mtime changed but whose content did not
+    (e.g.: after a fresh git checkout) is also treated as current.
+    '''
+
+    def __init__(self, **kwargs):
+        '''Class constructor
+        :param cache_file: {str} - the SQLite database file
+        :param version: {str} - entries written by another version are discarded
+        :param use_hash: {bool} - whether to also key entries on a content hash
+        '''
+
+        self._cache_file = kwargs['cache_file']
+        self._version = str(kwargs.get('version', ''))
+        self._use_hash = kwargs.get('use_hash', False)
+
+        self._conn = None
+        self._entries = {}
+        self._current = {}
+        self._changed = {}
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self) -> None:
+        '''Open the database, creating it if needed, and load all entries
+        '''
+        dirname = os.path.dirname(os.path.abspath(self._cache_file))
+        if not os.path.exists(dirname):
+            pathlib.Path(dirname).mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(self._cache_file)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, content_hash TEXT, counters TEXT)")
+
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != self._version:
+            logging.info("Cache file '{}' was written by version '{}' - discarding it".format(self._cache_file, row[0] if row else None))
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (self._version,))
+            self._conn.commit()
+
+        for path, size, mtime_ns, content_hash, counters in self._conn.execute("SELECT path, size, mtime_ns, content_hash, counters FROM files"):
+            self._entries[path] = (size, mtime_ns, content_hash, counters)
+
+        logging.info("Loaded '{}' entries from cache file '{}'".format(len(self._entries), self._cache_file))
+
+    def close(self) -> None:
+        '''Close the database
+        '''
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def get_stale_files(self, file_list: list = None) -> list:
+        '''Find the files that are new or changed since they were cached.
+        The stat results for every file are remembered for update().
+        A file that no longer exists is skipped, as if it was never listed.
+        :param file_list: {list}
+        :returns stale_list: {list}
+        '''
+        stale_list = []
+        self._current = {}
+
+        for file in file_list:
+            path = os.path.abspath(file)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Removed since the walk - left out of the current files, so commit() drops its entry
+                logging.info("File '{}' was removed before it could be checked - skipping it".format(path))
+                continue
+            entry = self._entries.get(path)
+            content_hash = None
+
+            if entry is not None and entry[0] == stat.st_size:
+                if entry[1] == stat.st_mtime_ns:
+                    self._current[path] = entry
+                    continue
+
+                if self._use_hash:
+                    content_hash = get_content_hash(path)
+                    if content_hash == entry[2]:
+                        # Same content, only the mtime moved on
+                        entry = (stat.st_size, stat.st_mtime_ns, content_hash, entry[3])
+                        self._current[path] = entry
+                        self._changed[path] = entry
+                        continue
+
+            if self._use_hash and content_hash is None:
+                content_hash = get_content_hash(path)
+
+            self._current[path] = (stat.st_size, stat.st_mtime_ns, content_hash, None)
+            stale_list.append(file)
+
+        return stale_list
+
+    def update(self, file: str = None, counters: dict = None) -> None:
+        '''Store the freshly computed counters of a stale file.
+        :param file: {str}
+        :param counters: {dict}
+        '''
+        path = os.path.abspath(file)
+        size, mtime_ns, content_hash, _ = self._current[path]
+        entry = (size, mtime_ns, content_hash, json.dumps(counters))
+        self._current[path] = entry
+        self._changed[path] = entry
+
+    def get_counters(self, file: str = None) -> dict:
+        '''Get the cached counters of a file seen by get_stale_files().
+        :param file: {str}
+        :returns counters: {dict} - None if the file was removed before get_stale_files() checked it
+        '''
+        entry = self._current.get(os.path.abspath(file))
+        if entry is None:
+            return None
+        return json.loads(entry[3])
+
+    def commit(self) -> int:
+        '''Write the changed entries and drop the files that no longer exist.
+        :returns deleted_ctr: {int} - the number of entries dropped
+        '''
+        deleted_list = [(path,) for path in self._entries if path not in self._current]
+
+        self._conn.executemany("DELETE FROM files WHERE path = ?", deleted_list)
+        self._conn.executemany("INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash, counters) VALUES (?, ?, ?, ?, ?)",
+                               [(path,) + entry for path, entry in self._changed.items()])
+        self._conn.commit()
+
+        logging.info("Wrote '{}' entries to and dropped '{}' entries from cache file '{}'".format(len(self._changed), len(deleted_list), self._cache_file))
+
+        self._entries = dict(self._current)
+        self._changed = {}
+
+        return len(deleted_list)
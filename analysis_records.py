@@ -0,0 +1,145 @@
+import os
+import csv
+import json
+import logging
+
+
+RECORD_FORMAT_LIST = ['jsonl', 'csv']
+
+DEFAULT_RECORD_FORMAT = 'jsonl'
+
+
+class RecordWriter():
+    '''Streams one record per analyzed file as soon as it is available
+    and a final rollup of the counters by directory and by package.
+    Only the per-directory totals are held in memory, so memory does
+    not grow with the number of files.
+    Every record has a 'record_type' ('file', 'directory' or 'package')
+    and a 'path' followed by the counters.  Directory and package
+    rollups include all files below them.
+    '''
+
+    def __init__(self, **kwargs):
+        '''Class constructor
+        :param outfile: {str} - the records file
+        :param indir: {str} - the analyzed directory, rollup paths are relative to it
+        :param counter_names: {list} - the counters of each record, in order
+        :param record_format: {str} - 'jsonl' or 'csv'
+        '''
+
+        self._outfile = kwargs['outfile']
+        self._indir = kwargs['indir']
+        self._counter_names = list(kwargs['counter_names'])
+        self._record_format = kwargs.get('record_format', DEFAULT_RECORD_FORMAT)
+
+        self._fh = None
+        self._csv_writer = None
+        self._record_ctr = 0
+
+        # directory => counters of the files directly in it
+        self._dir_totals = {}
+        self._package_dir_set = set()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.write_rollups()
+        self.close()
+
+    def open(self) -> None:
+        '''Open the records file and write the CSV header if needed
+        '''
+        # Line buffered so each record reaches consumers right away
+        self._fh = open(self._outfile, 'w', buffering=1, newline='')
+
+        if self._record_format == 'csv':
+            self._csv_writer = csv.writer(self._fh, lineterminator='\n')
+            self._csv_writer.writerow(['record_type', 'path'] + self._counter_names)
+
+    def close(self) -> None:
+        '''Close the records file
+        '''
+        if self._fh is not None:
+            self._fh.close()
+            print("Wrote '{}' records to file '{}'".format(self._record_ctr, self._outfile))
+            logging.info("Wrote '{}' records to file '{}'".format(self._record_ctr, self._outfile))
+        self._fh = None
+
+    def write_record(self, record_type: str = None, path: str = None, counters: dict = None) -> None:
+        '''Write a single record.
+        :param record_type: {str}
+        :param path: {str}
+        :param counters: {dict}
+        '''
+        self._record_ctr += 1
+        if self._csv_writer is not None:
+            self._csv_writer.writerow([record_type, path] + [counters[name] for name in self._counter_names])
+        else:
+            record = {'record_type': record_type, 'path': path}
+            for name in self._counter_names:
+                record[name] = counters[name]
+            self._fh.write(json.dumps(record) + '\n')
+
+    def add_file(self, file: str = None, counters: dict = None) -> None:
+        '''Write the record of an analyzed file and add it to its directory.
+        :param file: {str}
+        :param counters: {dict}
+        '''
+        self.write_record('file', file, counters)
+
+        dirname = os.path.dirname(file)
+        if os.path.basename(file) == '__init__.py':
+            self._package_dir_set.add(dirname)
+
+        dir_totals = self._dir_totals.get(dirname)
+        if dir_totals is None:
+            self._dir_totals[dirname] = dict(counters)
+            return
+        for name in self._counter_names:
+            dir_totals[name] += counters[name]
+
+    def write_rollups(self) -> None:
+        '''Write the cumulative counters of every directory and package
+        '''
+        root = os.path.abspath(self._indir)
+
+        cumulative = {}
+        for dirname, dir_totals in self._dir_totals.items():
+            # Add the counters to the directory and every ancestor up to the root
+            current = os.path.abspath(dirname)
+            while True:
+                totals = cumulative.get(current)
+                if totals is None:
+                    totals = dict.fromkeys(self._counter_names, 0)
+                    cumulative[current] = totals
+                for name in self._counter_names:
+                    totals[name] += dir_totals[name]
+                parent = os.path.dirname(current)
+                if current == root or parent == current:
+                    break
+                current = parent
+
+        package_dir_set = set(os.path.abspath(dirname) for dirname in self._package_dir_set)
+
+        for dirname in sorted(cumulative):
+            self.write_record('directory', os.path.relpath(dirname, root), cumulative[dirname])
+
+        for dirname in sorted(package_dir_set):
+            self.write_record('package', self.get_package_name(dirname, package_dir_set), cumulative[dirname])
+
+    def get_package_name(self, dirname: str = None, package_dir_set: set = None) -> str:
+        '''Derive the dotted package name of a package directory.
+        :param dirname: {str}
+        :param package_dir_set: {set} - all directories holding an __init__.py
+        :returns package_name: {str}
+        '''
+        parts = [os.path.basename(dirname)]
+        parent = os.path.dirname(dirname)
+        while parent in package_dir_set:
+            parts.append(os.path.basename(parent))
+            dirname = parent
+            parent = os.path.dirname(parent)
+        return '.'.join(reversed(parts))
@@ -0,0 +1,365 @@
+import os
+import stat
+import time
+import errno
+import ctypes
+import ctypes.util
+import select
+import struct
+import logging
+import threading
+import socketserver
+
+from file_walker import walk_files, is_walked
+
+
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Changes that arrive within this many seconds of each other are handled together
+SETTLE_SECONDS = 0.05
+
+# Upper bound on how long a stream of changes is batched up before it is handled
+MAX_SETTLE_SECONDS = 1.0
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW
+
+# struct inotify_event: wd, mask, cookie, len, followed by len bytes of name
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class _Watcher():
+    '''Common part of the watchers.
+    scan() walks a directory once and yields its files; wait() blocks
+    until something changed and returns the changed paths.  A returned
+    path that is an existing directory must be scanned again, anything
+    else that no longer exists has been deleted.
+    '''
+
+    def __init__(self, **kwargs):
+        '''Class constructor
+        :param indir: {str} - the watched directory
+        :param include_list: {list} - globs a file must match
+        :param exclude_list: {list} - additional globs of files and directories to skip
+        :param use_gitignore: {bool} - whether to honor .gitignore files
+        '''
+
+        self._indir = kwargs['indir']
+        self._include_list = kwargs.get('include_list') or []
+        self._exclude_list = kwargs.get('exclude_list') or []
+        self._use_gitignore = kwargs.get('use_gitignore', False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        '''Release the operating system resources
+        '''
+        pass
+
+    def is_walked(self, path: str = None, is_dir: bool = False) -> bool:
+        '''Check whether a path below the watched directory is analyzed at all
+        :param path: {str}
+        :param is_dir: {bool}
+        :returns walked: {bool}
+        '''
+        if path == self._indir:
+            return True
+        relpath = os.path.relpath(path, self._indir).replace(os.sep, '/')
+        if relpath.startswith('../'):
+            return False
+        return is_walked(self._indir, relpath, self._include_list, self._exclude_list, self._use_gitignore, is_dir)
+
+    def scan(self, dirpath: str = None):
+        '''Walk the directory, starting to watch it, and yield its files
+        :param dirpath: {str} - the watched directory or one below it
+        :returns generator of file paths: {str}
+        '''
+        if dirpath != self._indir and not self.is_walked(dirpath, True):
+            return
+
+        for file in walk_files(dirpath, self._include_list, self._exclude_list, self._use_gitignore, self._watch_dir):
+            # Rules relative to the watched directory can differ from those relative to dirpath
+            if dirpath == self._indir or self.is_walked(file):
+                self._watch_file(file)
+                yield file
+
+    def _watch_dir(self, dirpath: str = None) -> None:
+        pass
+
+    def _watch_file(self, file: str = None) -> None:
+        pass
+
+
+class PollingWatcher(_Watcher):
+    '''Finds changes by walking the tree at a fixed interval and
+    comparing the modification time and size of every file.
+    Works everywhere, at the cost of one stat() per file per interval.
+    '''
+
+    def __init__(self, **kwargs):
+        '''Class constructor
+        :param poll_interval: {float} - seconds between two walks
+        See _Watcher for the other parameters.
+        '''
+        super().__init__(**kwargs)
+
+        self._poll_interval = kwargs.get('poll_interval') or DEFAULT_POLL_INTERVAL
+
+        # file => (mtime in ns, size)
+        self._stat_lookup = {}
+
+    def _watch_file(self, file: str = None) -> None:
+        self._stat_lookup[file] = self._get_stat(file)
+
+    def _get_stat(self, file: str = None) -> tuple:
+        try:
+            st = os.stat(file)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def wait(self) -> set:
+        '''Block until at least one file was added, changed or deleted
+        :returns path_set: {set}
+        '''
+        while True:
+            time.sleep(self._poll_interval)
+
+            stat_lookup = {}
+            path_set = set()
+            for file in walk_files(self._indir, self._include_list, self._exclude_list, self._use_gitignore):
+                stat = self._get_stat(file)
+                if stat is None:
+                    continue
+                stat_lookup[file] = stat
+                if self._stat_lookup.get(file) != stat:
+                    path_set.add(file)
+
+            path_set.update(file for file in self._stat_lookup if file not in stat_lookup)
+            self._stat_lookup = stat_lookup
+
+            if path_set:
+                return path_set
+
+
+class InotifyWatcher(_Watcher):
+    '''Receives the changes from the Linux inotify API through ctypes,
+    so nothing is walked after the initial scan.  Every directory
+    needs its own watch, see /proc/sys/fs/inotify/max_user_watches.
+    '''
+
+    def __init__(self, **kwargs):
+        '''Class constructor
+        See _Watcher for the parameters.
+        :raises OSError: if inotify is not available
+        '''
+        super().__init__(**kwargs)
+
+        library = ctypes.util.find_library('c')
+        if library is None:
+            raise OSError("the C library was not found")
+
+        self._libc = ctypes.CDLL(library, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError("the C library does not provide inotify")
+
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+        # watch descriptor => directory
+        self._dir_lookup = {}
+
+    def close(self) -> None:
+        '''Close the inotify file descriptor, dropping all watches
+        '''
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _watch_dir(self, dirpath: str = None) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dirpath), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(error, "Could not watch directory '{}': the inotify watch limit was reached".format(dirpath))
+            logging.error("Could not watch directory '{}': {}".format(dirpath, os.strerror(error)))
+            return
+        self._dir_lookup[wd] = dirpath
+
+    def _unwatch_tree(self, dirpath: str = None) -> None:
+        prefix = dirpath + os.sep
+        for wd, path in list(self._dir_lookup.items()):
+            if path == dirpath or path.startswith(prefix):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._dir_lookup[wd]
+
+    def _read_events(self, path_set: set = None) -> None:
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                logging.warning("inotify queue overflowed - going to rescan '{}'".format(self._indir))
+                path_set.add(self._indir)
+                continue
+
+            if mask & IN_IGNORED:
+                self._dir_lookup.pop(wd, None)
+                continue
+
+            dirpath = self._dir_lookup.get(wd)
+            if dirpath is None or not name:
+                continue
+
+            path = os.path.join(dirpath, name)
+
+            if mask & IN_ISDIR and mask & (IN_MOVED_FROM | IN_DELETE):
+                # Watches of a directory moved elsewhere would report under the old path
+                self._unwatch_tree(path)
+
+            path_set.add(path)
+
+    def wait(self) -> set:
+        '''Block until at least one change arrived, then keep collecting
+        changes until none arrived for SETTLE_SECONDS
+        :returns path_set: {set}
+        '''
+        path_set = set()
+
+        while not path_set:
+            select.select([self._fd], [], [])
+            self._read_events(path_set)
+
+        deadline = time.monotonic() + MAX_SETTLE_SECONDS
+        while time.monotonic() < deadline:
+            readable, _, _ = select.select([self._fd], [], [], SETTLE_SECONDS)
+            if not readable:
+                break
+            self._read_events(path_set)
+
+        return path_set
+
+
+def get_watcher(indir: str = None, include_list: list = None, exclude_list: list = None, use_gitignore: bool = False, poll_interval: float = None):
+    """Get an inotify watcher, or a polling one where inotify is not
+    available or polling was asked for.
+    :param indir: {str}
+    :param include_list: {list} - globs a file must match
+    :param exclude_list: {list} - additional globs of files and directories to skip
+    :param use_gitignore: {bool} - whether to honor .gitignore files
+    :param poll_interval: {float} - poll every this many seconds instead of using inotify
+    :returns watcher: {InotifyWatcher|PollingWatcher}
+    """
+    if poll_interval is None:
+        try:
+            return InotifyWatcher(indir=indir, include_list=include_list, exclude_list=exclude_list, use_gitignore=use_gitignore)
+        except OSError as e:
+            logging.warning("inotify is not available - going to poll instead: {}".format(e))
+            print("inotify is not available - going to poll every '{}' seconds instead".format(DEFAULT_POLL_INTERVAL))
+
+    return PollingWatcher(indir=indir, include_list=include_list, exclude_list=exclude_list, use_gitignore=use_gitignore, poll_interval=poll_interval)
+
+
+def remove_socket(socket_path: str = None) -> None:
+    """Remove the Unix domain socket, e.g.: one left behind by a killed
+    run, but never a file or directory that happens to be at the path.
+    :param socket_path: {str}
+    :raises FileExistsError: if something other than a socket is at the path
+    """
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(errno.EEXIST, "Not a socket - refusing to replace it", socket_path)
+
+    os.unlink(socket_path)
+
+
+class _ReportRequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        self.request.sendall(self.server.report.encode())
+
+
+class ReportServer():
+    '''Serves the latest summary report on a Unix domain socket.
+    Each client that connects receives the report and the connection
+    is closed, e.g.: socat - UNIX-CONNECT:/path/to/socket
+    '''
+
+    def __init__(self, **kwargs):
+        '''Class constructor
+        :param socket_path: {str} - the Unix domain socket, replaced if a socket exists there
+        '''
+
+        self._socket_path = kwargs['socket_path']
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self) -> None:
+        '''Bind the socket and serve from a background thread
+        '''
+        remove_socket(self._socket_path)
+
+        self._server = socketserver.ThreadingUnixStreamServer(self._socket_path, _ReportRequestHandler)
+        self._server.daemon_threads = True
+        self._server.report = ''
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+        logging.info("Serving the summary report on socket '{}'".format(self._socket_path))
+
+    def close(self) -> None:
+        '''Stop serving and remove the socket
+        '''
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            remove_socket(self._socket_path)
+
+    def set_report(self, report: str = None) -> None:
+        '''Replace the report sent to the next clients
+        :param report: {str}
+        '''
+        # A single attribute assignment, so handlers see the old or the new report
+        self._server.report = report
@@ -0,0 +1,133 @@
+import io
+import logging
+import tarfile
+import posixpath
+import zipfile
+
+from file_walker import DEFAULT_EXCLUDE_LIST, matches_any
+
+
+# Wheels, eggs and jars are zip files, sdists are compressed tar files
+ZIP_EXTENSION_LIST = ('.zip', '.whl', '.egg', '.jar')
+
+TAR_EXTENSION_LIST = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+ARCHIVE_EXTENSION_LIST = ZIP_EXTENSION_LIST + TAR_EXTENSION_LIST
+
+ARCHIVE_GLOB_LIST = ['*' + extension for extension in ARCHIVE_EXTENSION_LIST]
+
+# Archives nested deeper than this are counted as plain files
+MAX_NESTING = 8
+
+
+def is_archive(name: str = None) -> bool:
+    """Check whether the file name has an archive extension.
+    :param name: {str}
+    :returns is_archive: {bool}
+    """
+    return name.lower().endswith(ARCHIVE_EXTENSION_LIST)
+
+
+def is_member_walked(relpath: str = None, include_list: list = None, exclude_list: list = None) -> bool:
+    """Check whether walk_files() would yield the member if the archive
+    were extracted.  There are no .gitignore files to honor here.
+    :param relpath: {str} - '/' separated path of the member in the archive
+    :param include_list: {list}
+    :param exclude_list: {list} - in addition to file_walker.DEFAULT_EXCLUDE_LIST
+    :returns walked: {bool}
+    """
+    exclude_list = list(DEFAULT_EXCLUDE_LIST) + list(exclude_list or [])
+
+    parts = relpath.split('/')
+    for i, name in enumerate(parts):
+        if matches_any(name, '/'.join(parts[:i + 1]), exclude_list):
+            return False
+
+    return not include_list or matches_any(parts[-1], relpath, include_list)
+
+
+def iter_zip_members(fh=None):
+    """Yield the regular files of a zip archive.
+    :param fh: {seekable binary file object}
+    :returns generator of (name, size, member file object): {tuple} - size is the uncompressed size in bytes
+    """
+    with zipfile.ZipFile(fh) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            with zf.open(info) as member_fh:
+                yield info.filename, info.file_size, member_fh
+
+
+def iter_tar_members(fh=None):
+    """Yield the regular files of a tar archive, compressed or not.
+    The members are read in archive order, without seeking back.
+    :param fh: {binary file object}
+    :returns generator of (name, size, member file object): {tuple} - size is in bytes
+    """
+    with tarfile.open(fileobj=fh, mode='r:*') as tf:
+        for member in tf:
+            # Directories, links and devices hold no content of their own
+            if not member.isfile():
+                continue
+            member_fh = tf.extractfile(member)
+            with member_fh:
+                yield member.name, member.size, member_fh
+
+
+def iter_archive_members(name: str = None, fh=None, include_list: list = None, exclude_list: list = None, nesting: int = 0):
+    """Stream the files of an archive without extracting them.
+    Members are filtered as if the archive were extracted and walked.
+    Archives inside the archive are opened in memory and their files
+    are yielded in place of them, below the name of the inner archive.
+    :param name: {str} - the archive file name, e.g.: pkg-1.0-py3-none-any.whl
+    :param fh: {seekable binary file object} - optional, the archive is opened by name if None
+    :param include_list: {list} - globs a member must match
+    :param exclude_list: {list} - additional globs of members and directories to skip
+    :param nesting: {int} - for inner archives
+    :returns generator of (relpath, size, member file object): {tuple} - each file object is only valid until the next member
+    :raises ValueError: if the archive cannot be read
+    """
+    if fh is None:
+        with open(name, 'rb') as fh:
+            yield from iter_archive_members(name, fh, include_list, exclude_list, nesting)
+        return
+
+    if name.lower().endswith(ZIP_EXTENSION_LIST):
+        member_iter = iter_zip_members(fh)
+    else:
+        member_iter = iter_tar_members(fh)
+
+    try:
+        for relpath, size, member_fh in member_iter:
+            relpath = posixpath.normpath(relpath.lstrip('/'))
+            if relpath.startswith('../'):
+                logging.warning("Ignoring archive member '{}' of '{}' outside of the archive".format(relpath, name))
+                continue
+
+            if not is_member_walked(relpath, None, exclude_list):
+                logging.info("Ignoring archive member '{}' of '{}'".format(relpath, name))
+                continue
+
+            if is_archive(relpath) and nesting < MAX_NESTING:
+                inner_fh = io.BytesIO(member_fh.read())
+                inner_ctr = 0
+                try:
+                    for inner_relpath, inner_size, inner_member_fh in iter_archive_members(relpath, inner_fh, include_list, exclude_list, nesting + 1):
+                        inner_ctr += 1
+                        yield relpath + '/' + inner_relpath, inner_size, inner_member_fh
+                    continue
+                except ValueError as e:
+                    if inner_ctr > 0:
+                        raise
+                    # Counted like any other file, as it would be if the outer archive were extracted
+                    logging.warning("Could not read inner archive '{}' of '{}' - going to count it as a file: {}".format(relpath, name, e))
+                    inner_fh.seek(0)
+                    member_fh = inner_fh
+
+            if include_list and not matches_any(relpath.rsplit('/', 1)[-1], relpath, include_list):
+                continue
+
+            yield relpath, size, member_fh
+    except (tarfile.TarError, zipfile.BadZipFile, zipfile.LargeZipFile, EOFError) as e:
+        raise ValueError("Could not read archive '{}': {}".format(name, e))
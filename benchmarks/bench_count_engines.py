@@ -0,0 +1,111 @@
+"""Benchmark of the 'text' and 'bytes' counting engines of code_base_analyzer.
+
+Generates large synthetic source files, analyzes each of them with both
+engines, verifies that the counters are identical and reports MB/sec
+and lines/sec for each engine.
+
+Usage:
+    python benchmarks/bench_count_engines.py --size-mb 200
+"""
+import os
+import sys
+import time
+import click
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_base_analyzer  # noqa: E402
+
+
+DEFAULT_SIZE_MB = 100
+
+DEFAULT_REPEAT = 3
+
+# One block of generated code; repeated until the file reaches the requested size
+SOURCE_BLOCK = '''import os
+from datetime import datetime
+
+
+# TODO: this block was generated
+class Generated{n}(object):
+    """Docstring mentioning class and def"""
+
+    def method_{n}(self, value: int = 0) -> int:
+        # add one
+        return value + 1
+
+
+def function_{n}(infile: str = None) -> None:
+    data = {{'key': 'value', 'number': {n}}}
+    return None
+'''
+
+
+def write_synthetic_file(outfile: str = None, size_mb: int = DEFAULT_SIZE_MB) -> int:
+    """Write a generated Python file of roughly the requested size.
+    :param outfile: {str}
+    :param size_mb: {int}
+    :returns size: {int} - the size in bytes
+    """
+    target = size_mb * 1024 * 1024
+    size = 0
+    n = 0
+    with open(outfile, 'w') as fh:
+        while size < target:
+            block = SOURCE_BLOCK.format(n=n)
+            fh.write(block)
+            size += len(block)
+            n += 1
+    return os.path.getsize(outfile)
+
+
+def time_engine(file: str = None, engine: str = None, repeat: int = DEFAULT_REPEAT) -> tuple:
+    """Analyze the file repeatedly and keep the best time.
+    :param file: {str}
+    :param engine: {str}
+    :param repeat: {int}
+    :returns (counters, seconds): {tuple}
+    """
+    best = None
+    counters = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        counters = code_base_analyzer.analyze_file(file, engine)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return counters, best
+
+
+@click.command()
+@click.option('--size-mb', type=int, default=DEFAULT_SIZE_MB, help='Size of the synthetic file in MB - default is {}'.format(DEFAULT_SIZE_MB))
+@click.option('--repeat', type=int, default=DEFAULT_REPEAT, help='Number of timed runs per engine - default is {}'.format(DEFAULT_REPEAT))
+def main(size_mb, repeat):
+    """Benchmark the text and bytes counting engines on a large synthetic file
+    """
+    tmpdir = tempfile.mkdtemp()
+    try:
+        file = os.path.join(tmpdir, 'generated.py')
+        size = write_synthetic_file(file, size_mb)
+
+        results = {}
+        for engine in code_base_analyzer.ENGINE_LIST:
+            results[engine] = time_engine(file, engine, repeat)
+
+        text_counters, text_seconds = results['text']
+        for engine, (counters, seconds) in results.items():
+            if counters != text_counters:
+                print("Counter mismatch for engine '{}': expected {} got {}".format(engine, text_counters, counters))
+                sys.exit(1)
+
+        print("file size: {:,.1f} MB, lines: {:,}".format(size / 1024 / 1024, text_counters['lines']))
+        for engine, (counters, seconds) in results.items():
+            print("{:<6} {:8,.1f} MB/sec {:12,.0f} lines/sec  ({:.2f}x)".format(engine, size / 1024 / 1024 / seconds, counters['lines'] / seconds, text_seconds / seconds))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Import-time budget of the pycodgen entry point.
+
+Runs a pycodgen subcommand in a fresh interpreter with -X importtime,
+sums the cumulative time of the top-level imports and reports the
+slowest of them.  Exits with status 1 when the best run is over
+--budget-ms or imported a module that the subcommand must not need,
+e.g.: prompt_toolkit for 'pycodgen function --infile'.
+
+Usage:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --budget-ms 80 --repeat 10
+"""
+import os
+import sys
+import click
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic_inputs  # noqa: E402
+
+
+PYCODGEN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pycodgen.py')
+
+DEFAULT_BUDGET_MS = 100.0
+
+DEFAULT_REPEAT = 5
+
+DEFAULT_TOP_N = 10
+
+# Modules the non-interactive function generator must not import
+DEFAULT_FORBIDDEN_LIST = ['prompt_toolkit']
+
+
+def parse_importtime(stderr: str = None) -> list:
+    """Parse the -X importtime report into its top-level imports.
+    :param stderr: {str}
+    :returns import_list: {list} - of (module, cumulative microseconds, all modules below it)
+    """
+    import_list = []
+    nested_list = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        module = name.strip()
+        nested_list.append(module)
+        # A top-level import is indented by exactly one space and reported after its own imports
+        if not name.startswith('  '):
+            import_list.append((module, int(cumulative_us), nested_list))
+            nested_list = []
+    return import_list
+
+
+def time_imports(args: list = None) -> list:
+    """Run pycodgen once with -X importtime.
+    :param args: {list} - the pycodgen arguments
+    :returns import_list: {list} - see parse_importtime()
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', PYCODGEN] + args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit(1)
+    return parse_importtime(result.stderr)
+
+
+@click.command()
+@click.option('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, help='The largest allowed total import time in milliseconds - default is {}'.format(DEFAULT_BUDGET_MS))
+@click.option('--repeat', type=int, default=DEFAULT_REPEAT, help='Number of runs, the fastest one is kept - default is {}'.format(DEFAULT_REPEAT))
+@click.option('--top', type=int, default=DEFAULT_TOP_N, help='Number of slowest top-level imports to list - default is {}'.format(DEFAULT_TOP_N))
+@click.option('--forbid', multiple=True, help='A module that must not be imported - may be repeated - default is {}'.format(DEFAULT_FORBIDDEN_LIST))
+def main(budget_ms, repeat, top, forbid):
+    """Gate the import time of 'pycodgen function --infile' on a budget
+    """
+    tmpdir = tempfile.mkdtemp()
+    try:
+        infile = os.path.join(tmpdir, 'spec.txt')
+        synthetic_inputs.write_function_spec(infile, 10)
+        args = ['function', '--infile', infile, '--outdir', tmpdir]
+
+        # The first run also writes the .pyc files, which would skew it
+        time_imports(args)
+
+        best_total = None
+        best_import_list = None
+        for _ in range(repeat):
+            import_list = time_imports(args)
+            total = sum(cumulative_us for _, cumulative_us, _ in import_list)
+            if best_total is None or total < best_total:
+                best_total = total
+                best_import_list = import_list
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print("Slowest top-level imports of 'pycodgen {}':".format(' '.join(args[:2] + ['SPEC'])))
+    for module, cumulative_us, _ in sorted(best_import_list, key=lambda item: -item[1])[:top]:
+        print("  {:<32} {:8.1f} ms".format(module, cumulative_us / 1000))
+    print("{:<34} {:8.1f} ms (budget {:.1f} ms)".format('total', best_total / 1000, budget_ms))
+
+    failure_ctr = 0
+
+    imported_set = {module for _, _, nested_list in best_import_list for module in nested_list}
+    for module in forbid or DEFAULT_FORBIDDEN_LIST:
+        if module in imported_set:
+            print("Module '{}' was imported but must not be".format(module))
+            failure_ctr += 1
+
+    if best_total / 1000 > budget_ms:
+        print("Import time '{:.1f}' ms is over the budget of '{:.1f}' ms".format(best_total / 1000, budget_ms))
+        failure_ctr += 1
+
+    if failure_ctr > 0:
+        sys.exit(1)
+
+    print("Import time is within the budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Micro-benchmark for the line classifier used by code_base_analyzer.
+
+Compares the original per-line chain of re.match calls with
+classify_line() on the same lines, verifies that both produce the
+same counters and reports the lines/sec for each.
+
+Usage:
+    python benchmarks/bench_line_classifier.py --indir /path/to/code
+"""
+import os
+import re
+import sys
+import time
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_base_analyzer  # noqa: E402
+
+
+DEFAULT_REPEAT = 5
+
+# Lines that exercise the edges of each category
+EDGE_CASE_LINES = [
+    '', '   ', '\t\n', '  ',
+    'class Foo:', '    class Foo(Bar):', 'classification = 1', 'klass = 1',
+    '#', '# comment', '#TODO fix', '#   TODO: fix', '# TODO', '# not a TODO', '## TODO',
+    'def foo():', '    def foo(self):', 'def\tfoo():', 'def', 'def(', 'deferred = 1', 'async def foo():',
+    'import os', '    import os', 'importlib.reload(os)', 'from os import path', 'fromage = 1',
+    'x = 1', '"""class docstring"""', '#\u00a0TODO', '\u3000def\u00a0foo():',
+]
+
+
+def legacy_count_lines(lines, counters: dict = None) -> dict:
+    """The original re.match chain from analyze_code, kept as the reference.
+    :param lines: {iterable}
+    :param counters: {dict}
+    :returns counters: {dict}
+    """
+    for line in lines:
+        counters['lines'] += 1
+        line = line.strip()
+        if re.match(r'^\s*$', line):
+            counters['blank_lines'] += 1
+            continue
+
+        if re.match(r'^\s*class', line):
+            counters['classes'] += 1
+
+        if re.match(r'^\s*#\s*TODO', line):
+            counters['todos'] += 1
+
+        if re.match(r'^\s*def\s+', line):
+            counters['functions'] += 1
+
+        if re.match(r'^import', line):
+            counters['imports'] += 1
+
+        if re.match(r'^from', line):
+            counters['from_imports'] += 1
+
+        if re.match(r'^\s*#', line):
+            counters['comments'] += 1
+
+    return counters
+
+
+def load_lines(indir: str = None) -> list:
+    """Read every line of every readable .py file below indir.
+    :param indir: {str}
+    :returns lines: {list}
+    """
+    lines = list(EDGE_CASE_LINES)
+    if indir is None:
+        return lines * 10000
+
+    for path, subdirs, files in os.walk(indir):
+        for name in files:
+            if not name.endswith('.py'):
+                continue
+            try:
+                with open(os.path.join(path, name), 'r') as fh:
+                    lines.extend(fh.readlines())
+            except (OSError, UnicodeDecodeError):
+                continue
+    return lines
+
+
+def time_engine(count_func, lines: list = None, repeat: int = DEFAULT_REPEAT) -> tuple:
+    """Run the counting function repeatedly and keep the best time.
+    :param count_func: {callable}
+    :param lines: {list}
+    :param repeat: {int}
+    :returns (counters, seconds): {tuple}
+    """
+    best = None
+    counters = None
+    for _ in range(repeat):
+        counters = code_base_analyzer.new_counters()
+        start = time.perf_counter()
+        count_func(lines, counters)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return counters, best
+
+
+@click.command()
+@click.option('--indir', help='Directory with .py files to read the lines from - default is a synthetic set of lines')
+@click.option('--repeat', type=int, default=DEFAULT_REPEAT, help='Number of timed runs per engine - default is {}'.format(DEFAULT_REPEAT))
+def main(indir, repeat):
+    """Benchmark the line classifier against the original re.match chain
+    """
+    for line in EDGE_CASE_LINES:
+        expected = legacy_count_lines([line], code_base_analyzer.new_counters())
+        actual = code_base_analyzer.count_lines([line], code_base_analyzer.new_counters())
+        if expected != actual:
+            print("Counter mismatch for line {!r}: expected {} got {}".format(line, expected, actual))
+            sys.exit(1)
+
+    lines = load_lines(indir)
+
+    legacy_counters, legacy_seconds = time_engine(legacy_count_lines, lines, repeat)
+    counters, seconds = time_engine(code_base_analyzer.count_lines, lines, repeat)
+
+    if legacy_counters != counters:
+        print("Counter mismatch: expected {} got {}".format(legacy_counters, counters))
+        sys.exit(1)
+
+    print("lines: {}".format(len(lines)))
+    print("re.match chain: {:,.0f} lines/sec".format(len(lines) / legacy_seconds))
+    print("classify_line:  {:,.0f} lines/sec".format(len(lines) / seconds))
+    print("speedup: {:.2f}x".format(legacy_seconds / seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark of the read-ahead of code_base_analyzer on a slow filesystem.
+
+Generates a synthetic source tree and simulates network filesystem
+latency by delaying every open() of a file in the tree.  Analyzes the
+tree without read-ahead and with several read-ahead depths, verifies
+that the counters are identical and reports files/sec and the speedup.
+
+Usage:
+    python benchmarks/bench_prefetch.py --files 500 --latency-ms 5 --depth 4 --depth 16
+"""
+import os
+import sys
+import time
+import click
+import shutil
+import logging
+import builtins
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import code_base_analyzer  # noqa: E402
+import synthetic_inputs  # noqa: E402
+
+
+DEFAULT_FILES = 500
+
+DEFAULT_LATENCY_MS = 5.0
+
+DEFAULT_DEPTH_LIST = [4, 16, 64]
+
+
+@contextlib.contextmanager
+def added_latency(indir: str = None, latency: float = None):
+    """Delay each open() of a file below the directory, like a round trip to a file server.
+    :param indir: {str}
+    :param latency: {float} - seconds
+    """
+    original_open = builtins.open
+
+    def slow_open(file, *args, **kwargs):
+        if isinstance(file, str) and file.startswith(indir):
+            time.sleep(latency)
+        return original_open(file, *args, **kwargs)
+
+    builtins.open = slow_open
+    try:
+        yield
+    finally:
+        builtins.open = original_open
+
+
+def time_analysis(file_list: list = None, prefetch_options: dict = None) -> tuple:
+    """Analyze the files once in this process.
+    :param file_list: {list}
+    :param prefetch_options: {dict}
+    :returns (totals, seconds): {tuple}
+    """
+    start = time.perf_counter()
+    totals = code_base_analyzer.analyze_file_list(file_list, 1, None, None, None, prefetch_options)
+    return totals, time.perf_counter() - start
+
+
+@click.command()
+@click.option('--files', type=int, default=DEFAULT_FILES, help='The number of generated modules - default is {}'.format(DEFAULT_FILES))
+@click.option('--latency-ms', type=float, default=DEFAULT_LATENCY_MS, help='The delay added to each open() in milliseconds - default is {}'.format(DEFAULT_LATENCY_MS))
+@click.option('--depth', type=int, multiple=True, help='A read-ahead depth to measure - may be repeated - default is {}'.format(DEFAULT_DEPTH_LIST))
+def main(files, latency_ms, depth):
+    """Benchmark the analyzer read-ahead with artificial I/O latency
+    """
+    logging.disable(logging.INFO)
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        indir = os.path.join(tmpdir, 'tree')
+        synthetic_inputs.write_source_tree(indir, files)
+        file_list = code_base_analyzer.get_file_list(indir)
+
+        with added_latency(indir, latency_ms / 1000):
+            base_totals, base_seconds = time_analysis(file_list)
+            print("{:<14} {:10,.1f} files/sec".format('no read-ahead', len(file_list) / base_seconds))
+
+            for prefetch_depth in depth or DEFAULT_DEPTH_LIST:
+                totals, seconds = time_analysis(file_list, {'depth': prefetch_depth})
+                if totals != base_totals:
+                    print("Counter mismatch with depth '{}': expected {} got {}".format(prefetch_depth, base_totals, totals))
+                    sys.exit(1)
+                print("{:<14} {:10,.1f} files/sec  ({:.2f}x)".format('depth {}'.format(prefetch_depth), len(file_list) / seconds, base_seconds / seconds))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
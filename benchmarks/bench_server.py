@@ -0,0 +1,131 @@
+"""Benchmark of the generation server against one process per call.
+
+Starts generation_server.py on a scratch socket, then times generating
+one function spec with a fresh function_generator.py process, with a
+fresh generation_client.py process and with a request sent over an
+open socket, and reports the median latency of each.  Finally sends
+requests from several threads at once and reports requests/sec.
+
+Usage:
+    python benchmarks/bench_server.py
+    python benchmarks/bench_server.py --calls 50 --threads 8 --requests 500
+"""
+import os
+import sys
+import time
+import click
+import shutil
+import tempfile
+import statistics
+import subprocess
+import concurrent.futures
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generation_client  # noqa: E402
+import synthetic_inputs  # noqa: E402
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CALLS = 20
+
+DEFAULT_THREADS = 4
+
+DEFAULT_REQUESTS = 200
+
+DEFAULT_PARAMS = 20
+
+# How long to wait for the server to listen
+STARTUP_TIMEOUT = 10.0
+
+
+def time_median(func=None, calls: int = DEFAULT_CALLS) -> float:
+    """Call the function repeatedly and keep the median time.
+    :param func: {callable}
+    :param calls: {int}
+    :returns seconds: {float}
+    """
+    seconds_list = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        func()
+        seconds_list.append(time.perf_counter() - start)
+    return statistics.median(seconds_list)
+
+
+def run_quietly(args: list = None, cwd: str = None) -> None:
+    """Run a command and fail on a non-zero exit status.
+    :param args: {list}
+    :param cwd: {str}
+    """
+    subprocess.run(args, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+
+def wait_for_server(socket_file: str = None) -> None:
+    """Wait until the server answers a ping.
+    :param socket_file: {str}
+    """
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while True:
+        try:
+            generation_client.send_request(socket_file, {'command': 'ping'})
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+@click.command()
+@click.option('--calls', type=int, default=DEFAULT_CALLS, help='Number of timed calls per way of generating - default is {}'.format(DEFAULT_CALLS))
+@click.option('--threads', type=int, default=DEFAULT_THREADS, help='Number of threads sending requests at once - default is {}'.format(DEFAULT_THREADS))
+@click.option('--requests', type=int, default=DEFAULT_REQUESTS, help='Number of requests sent by the threads - default is {}'.format(DEFAULT_REQUESTS))
+@click.option('--params', type=int, default=DEFAULT_PARAMS, help='Number of parameters of the function spec - default is {}'.format(DEFAULT_PARAMS))
+def main(calls, threads, requests, params):
+    """Compare the per-call latency of the generation server with a process per call
+    """
+    workdir = tempfile.mkdtemp()
+    socket_file = os.path.join(workdir, 'server.sock')
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT_DIR, 'generation_server.py'), '--socket', socket_file, '--outdir', workdir],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(socket_file)
+
+        infile = os.path.join(workdir, 'spec.txt')
+        synthetic_inputs.write_function_spec(infile, params)
+        outfile = os.path.join(workdir, 'function.py')
+        with open(infile, 'r') as fh:
+            request = {'command': 'function', 'name': infile, 'spec': fh.read()}
+
+        cli_seconds = time_median(lambda: run_quietly([sys.executable, os.path.join(ROOT_DIR, 'function_generator.py'), '--infile', infile, '--outfile', outfile, '--outdir', workdir]), calls)
+        client_seconds = time_median(lambda: run_quietly([sys.executable, os.path.join(ROOT_DIR, 'generation_client.py'), '--socket', socket_file, 'function', '--infile', infile, '--outfile', outfile]), calls)
+        request_seconds = time_median(lambda: generation_client.send_request(socket_file, request), calls)
+
+        print("Median latency of generating a function of '{}' parameters:".format(params))
+        print("  {:<32} {:8.2f} ms".format('function_generator.py process', cli_seconds * 1000))
+        print("  {:<32} {:8.2f} ms ({:.1f}x faster)".format('generation_client.py process', client_seconds * 1000, cli_seconds / client_seconds))
+        print("  {:<32} {:8.2f} ms ({:.1f}x faster)".format('request on the socket', request_seconds * 1000, cli_seconds / request_seconds))
+
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            response_list = list(executor.map(lambda _: generation_client.send_request(socket_file, request), range(requests)))
+        seconds = time.perf_counter() - start
+
+        failed_ctr = sum(1 for response in response_list if not response.get('ok'))
+        print("Served '{}' requests from '{}' threads in '{:.3f}' seconds - '{:.0f}' requests/sec - '{}' failed".format(requests, threads, seconds, requests / seconds, failed_ctr))
+
+        generation_client.send_request(socket_file, {'command': 'shutdown'})
+        server.wait(timeout=STARTUP_TIMEOUT)
+    finally:
+        if server.poll() is None:
+            server.kill()
+        shutil.rmtree(workdir)
+
+    if failed_ctr > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Timed benchmarks of every entry point with a baseline regression gate.
+
+Generates synthetic inputs of several sizes (see synthetic_inputs.py),
+times analyze_code, the function generator modes, convert and the
+in-memory code_generator API on each of them and reports the
+throughput.  With --save-baseline the results are stored as JSON; with
+--baseline they are compared against a stored run and the script exits
+with status 1 when the throughput of any benchmark dropped by more than
+--threshold.
+
+Baselines are only comparable on the same machine and Python version.
+
+Usage:
+    python benchmarks/bench_suite.py --save-baseline /tmp/baseline.json
+    python benchmarks/bench_suite.py --baseline /tmp/baseline.json --threshold 0.2
+    python benchmarks/bench_suite.py --benchmark convert --size large
+"""
+import io
+import os
+import sys
+import json
+import time
+import click
+import shutil
+import logging
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import code_base_analyzer  # noqa: E402
+import code_generator  # noqa: E402
+import function_generator  # noqa: E402
+import umlet_class_diagram_to_python_api  # noqa: E402
+import synthetic_inputs  # noqa: E402
+
+
+DEFAULT_REPEAT = 3
+
+DEFAULT_THRESHOLD = 0.2
+
+SIZE_LIST = ['small', 'medium', 'large']
+
+DEFAULT_SIZE_LIST = ['small', 'medium']
+
+# benchmark => size => number of generated files, parameters or panels
+BENCHMARK_SIZES = {
+    'analyze_code': {'small': 200, 'medium': 1000, 'large': 5000},
+    'function_spec': {'small': 500, 'medium': 5000, 'large': 50000},
+    'function_batch': {'small': 200, 'medium': 2000, 'large': 20000},
+    'function_jsonl': {'small': 200, 'medium': 2000, 'large': 20000},
+    'convert': {'small': 50, 'medium': 500, 'large': 2000},
+    'function_api': {'small': 200, 'medium': 2000, 'large': 20000},
+    'class_api': {'small': 50, 'medium': 500, 'large': 2000},
+}
+
+BENCHMARK_LIST = list(BENCHMARK_SIZES)
+
+# The parameters of each spec of the function_batch benchmark
+BATCH_SPEC_PARAMS = 20
+
+
+def time_best(func=None, repeat: int = DEFAULT_REPEAT, setup=None) -> float:
+    """Call the function repeatedly with its output silenced and keep the best time.
+    :param func: {callable}
+    :param repeat: {int}
+    :param setup: {callable} - optional, called untimed before each run
+    :returns seconds: {float}
+    """
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_analyze_code(workdir: str = None, size: int = None, repeat: int = DEFAULT_REPEAT, workers: int = 1) -> tuple:
+    """Time analyze_code on a generated source tree.
+    :param workdir: {str}
+    :param size: {int} - the number of modules
+    :param repeat: {int}
+    :param workers: {int}
+    :returns (unit, count, seconds): {tuple}
+    """
+    indir = os.path.join(workdir, 'tree')
+    line_count = synthetic_inputs.write_source_tree(indir, size)
+    outfile = os.path.join(workdir, 'report.txt')
+
+    seconds = time_best(lambda: code_base_analyzer.analyze_code(indir, workdir, outfile, workers), repeat)
+    return 'lines', line_count, seconds
+
+
+def bench_function_spec(workdir: str = None, size: int = None, repeat: int = DEFAULT_REPEAT, workers: int = 1) -> tuple:
+    """Time generate_function_code_from_file on a generated function spec.
+    Each run writes to a fresh directory, so no run only finds the
+    output of the previous one unchanged.
+    :param workdir: {str}
+    :param size: {int} - the number of parameters
+    :param repeat: {int}
+    :param workers: {int} - unused, the generator is single-threaded
+    :returns (unit, count, seconds): {tuple}
+    """
+    infile = os.path.join(workdir, 'spec.txt')
+    synthetic_inputs.write_function_spec(infile, size)
+    outfile_list = []
+
+    def setup():
+        outfile_list.append(os.path.join(tempfile.mkdtemp(dir=workdir), 'function.py'))
+
+    seconds = time_best(lambda: function_generator.generate_function_code_from_file(infile, outfile_list[-1]), repeat, setup)
+    return 'params', size, seconds
+
+
+def bench_function_batch(workdir: str = None, size: int = None, repeat: int = DEFAULT_REPEAT, workers: int = 1) -> tuple:
+    """Time generate_function_code_batch on a multi-document spec file.
+    Each run writes to a fresh directory, as in bench_function_spec().
+    :param workdir: {str}
+    :param size: {int} - the number of specs, of BATCH_SPEC_PARAMS parameters each
+    :param repeat: {int}
+    :param workers: {int}
+    :returns (unit, count, seconds): {tuple}
+    """
+    infile = os.path.join(workdir, 'specs.txt')
+    synthetic_inputs.write_function_spec(infile, BATCH_SPEC_PARAMS, size)
+    outdir_list = []
+
+    def setup():
+        outdir_list.append(tempfile.mkdtemp(dir=workdir))
+
+    seconds = time_best(lambda: function_generator.generate_function_code_batch(infile, outdir_list[-1], workers), repeat, setup)
+    return 'specs', size, seconds
+
+
+def bench_function_jsonl(workdir: str = None, size: int = None, repeat: int = DEFAULT_REPEAT, workers: int = 1) -> tuple:
+    """Time generate_function_code_jsonl streaming JSONL records to a file.
+    :param workdir: {str}
+    :param size: {int} - the number of records, of BATCH_SPEC_PARAMS parameters each
+    :param repeat: {int}
+    :param workers: {int} - unused, the stream is rendered in order in one process
+    :returns (unit, count, seconds): {tuple}
+    """
+    infile = os.path.join(workdir, 'specs.jsonl')
+    synthetic_inputs.write_function_jsonl(infile, BATCH_SPEC_PARAMS, size)
+    outfile = os.path.join(workdir, 'functions.py')
+
+    def run():
+        with open(infile, 'rb') as infh, open(outfile, 'w') as outfh:
+            function_generator.generate_function_code_jsonl(infh, outfh)
+
+    seconds = time_best(run, repeat)
+    return 'specs', size, seconds
+
+
+def bench_convert(workdir: str = None, size: int = None, repeat: int = DEFAULT_REPEAT, workers: int = 1) -> tuple:
+    """Time convert on a generated Umlet diagram.
+    convert() writes below the current directory, which is a fresh
+    directory for each run so no .bak files are made.
+    :param workdir: {str}
+    :param size: {int} - the number of class panels
+    :param repeat: {int}
+    :param workers: {int}
+    :returns (unit, count, seconds): {tuple}
+    """
+    infile = os.path.join(workdir, 'diagram.uxf')
+    synthetic_inputs.write_uxf(infile, size)
+    outdir = os.path.join(workdir, 'out')
+
+    def setup():
+        shutil.rmtree(outdir, ignore_errors=True)
+        os.mkdir(outdir)
+        os.chdir(outdir)
+
+    cwd = os.getcwd()
+    try:
+        seconds = time_best(lambda: umlet_class_diagram_to_python_api.convert(infile, None, workers=workers), repeat, setup)
+    finally:
+        os.chdir(cwd)
+    return 'panels', size, seconds
+
+
+def bench_function_api(workdir: str = None, size: int = None, repeat: int = DEFAULT_REPEAT, workers: int = 1) -> tuple:
+    """Time code_generator.generate_functions into a dict, with no filesystem I/O.
+    :param workdir: {str}
+    :param size: {int} - the number of specs, of BATCH_SPEC_PARAMS parameters each
+    :param repeat: {int}
+    :param workers: {int} - unused, the library renders in the calling thread
+    :returns (unit, count, seconds): {tuple}
+    """
+    infile = os.path.join(workdir, 'specs.jsonl')
+    synthetic_inputs.write_function_jsonl(infile, BATCH_SPEC_PARAMS, size)
+    with open(infile, 'r') as fh:
+        spec_list = [code_generator.FunctionSpec.from_record(json.loads(line)) for line in fh]
+
+    seconds = time_best(lambda: code_generator.generate_functions(spec_list), repeat)
+    return 'specs', size, seconds
+
+
+def bench_class_api(workdir: str = None, size: int = None, repeat: int = DEFAULT_REPEAT, workers: int = 1) -> tuple:
+    """Time code_generator.generate_diagram of an in-memory diagram into a dict, with no filesystem I/O.
+    :param workdir: {str}
+    :param size: {int} - the number of class panels
+    :param repeat: {int}
+    :param workers: {int} - unused, the library renders in the calling thread
+    :returns (unit, count, seconds): {tuple}
+    """
+    infile = os.path.join(workdir, 'diagram.uxf')
+    synthetic_inputs.write_uxf(infile, size)
+    with open(infile, 'rb') as fh:
+        uxf = fh.read()
+
+    seconds = time_best(lambda: code_generator.generate_diagram(io.BytesIO(uxf)), repeat)
+    return 'panels', size, seconds
+
+
+BENCHMARK_FUNCTIONS = {
+    'analyze_code': bench_analyze_code,
+    'function_spec': bench_function_spec,
+    'function_batch': bench_function_batch,
+    'function_jsonl': bench_function_jsonl,
+    'convert': bench_convert,
+    'function_api': bench_function_api,
+    'class_api': bench_class_api,
+}
+
+
+def run_benchmarks(benchmark_list: list = None, size_list: list = None, repeat: int = DEFAULT_REPEAT, workers: int = 1) -> dict:
+    """Run each benchmark at each size in a scratch directory.
+    :param benchmark_list: {list}
+    :param size_list: {list}
+    :param repeat: {int}
+    :param workers: {int} - worker processes for analyze_code, function_batch and convert
+    :returns results: {dict} - 'benchmark/size' => result
+    """
+    results = {}
+    for benchmark in benchmark_list:
+        for size_name in size_list:
+            size = BENCHMARK_SIZES[benchmark][size_name]
+            workdir = tempfile.mkdtemp()
+            try:
+                unit, count, seconds = BENCHMARK_FUNCTIONS[benchmark](workdir, size, repeat, workers)
+            finally:
+                shutil.rmtree(workdir)
+
+            key = '{}/{}'.format(benchmark, size_name)
+            results[key] = {'unit': unit, 'count': count, 'seconds': round(seconds, 6), 'per_sec': round(count / seconds, 3)}
+            print("{:<26} {:>10,} {:<7} {:9.3f} sec {:14,.0f} {}/sec".format(key, count, unit, seconds, count / seconds, unit))
+    return results
+
+
+def compare_results(results: dict = None, baseline: dict = None, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """Compare the throughput against the baseline.
+    :param results: {dict}
+    :param baseline: {dict}
+    :param threshold: {float} - e.g.: 0.2 allows a 20% drop
+    :returns regression_list: {list} - of messages, empty if there is none
+    """
+    regression_list = []
+    for key, result in results.items():
+        if key not in baseline:
+            print("{:<26} no baseline".format(key))
+            continue
+        base_per_sec = baseline[key]['per_sec']
+        change = result['per_sec'] / base_per_sec - 1
+        print("{:<26} {:+7.1%} versus baseline".format(key, change))
+        if change < -threshold:
+            regression_list.append("'{}' dropped from '{:,.0f}' to '{:,.0f}' {}/sec ({:+.1%})".format(key, base_per_sec, result['per_sec'], result['unit'], change))
+    return regression_list
+
+
+@click.command()
+@click.option('--benchmark', multiple=True, type=click.Choice(BENCHMARK_LIST), help='Only run this benchmark - may be repeated - default is all')
+@click.option('--size', multiple=True, type=click.Choice(SIZE_LIST), help='Only run this input size - may be repeated - default is {}'.format(' and '.join(DEFAULT_SIZE_LIST)))
+@click.option('--repeat', type=int, default=DEFAULT_REPEAT, help='Number of timed runs per benchmark - default is {}'.format(DEFAULT_REPEAT))
+@click.option('--workers', type=int, default=1, help='Number of worker processes for analyze_code, function_batch and convert - default is 1')
+@click.option('--baseline', help='Compare against the results stored in this JSON file')
+@click.option('--threshold', type=float, default=DEFAULT_THRESHOLD, help='The largest allowed drop in throughput versus --baseline - default is {}'.format(DEFAULT_THRESHOLD))
+@click.option('--save-baseline', help='Store the results in this JSON file')
+def main(benchmark, size, repeat, workers, baseline, threshold, save_baseline):
+    """Benchmark all entry points on synthetic inputs and gate on a baseline
+    """
+    # The entry points log every line they parse; keep that out of the timings
+    logging.disable(logging.INFO)
+
+    results = run_benchmarks(list(benchmark) or BENCHMARK_LIST, list(size) or DEFAULT_SIZE_LIST, repeat, workers)
+
+    if save_baseline is not None:
+        with open(save_baseline, 'w') as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+        print("Wrote baseline file '{}'".format(save_baseline))
+
+    if baseline is not None:
+        with open(baseline, 'r') as fh:
+            regression_list = compare_results(results, json.load(fh), threshold)
+        if regression_list:
+            print("Throughput regressed by more than {:.0%}:".format(threshold))
+            for message in regression_list:
+                print("  " + message)
+            sys.exit(1)
+        print("No benchmark regressed by more than {:.0%}".format(threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Benchmark of the compiled code templates.
+
+Times how long it takes to get the render function of each template
+when it is compiled from its source, loaded from the disk cache and
+found in the per-process cache, then renders a large batch of
+functions and classes through function_generator.py and
+umlet_class_diagram_to_python_api.py and reports renders/sec.
+
+Usage:
+    python benchmarks/bench_templates.py
+    python benchmarks/bench_templates.py --renders 50000 --params 20
+"""
+import os
+import sys
+import time
+import click
+import shutil
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_templates  # noqa: E402
+import function_generator  # noqa: E402
+import umlet_class_diagram_to_python_api  # noqa: E402
+
+
+DEFAULT_RENDERS = 20000
+
+DEFAULT_PARAMS = 10
+
+DEFAULT_REPEAT = 5
+
+TEMPLATE_LIST = ['function', 'class']
+
+
+def time_best(func=None, repeat: int = DEFAULT_REPEAT) -> float:
+    """Call the function repeatedly and keep the best time.
+    :param func: {callable}
+    :param repeat: {int}
+    :returns seconds: {float}
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def get_function_args(params: int = DEFAULT_PARAMS) -> tuple:
+    """Get the render_function() arguments of a function with the given number of parameters.
+    :param params: {int}
+    :returns args: {tuple}
+    """
+    parameter_list = []
+    parameter_lookup = {}
+    for n in range(params):
+        parameter_name = 'infile_{}'.format(n) if n % 5 == 0 else 'param_{}'.format(n)
+        parameter_list.append(parameter_name)
+        parameter_lookup[parameter_name] = {'datatype': 'str', 'default': 'None', 'description': 'parameter number {}'.format(n)}
+    return 'generated_function', 'function', parameter_list, parameter_lookup, 'int'
+
+
+def get_class_args(params: int = DEFAULT_PARAMS) -> tuple:
+    """Get the render_class_definition() arguments of a singleton class with the given number of attributes and methods.
+    :param params: {int}
+    :returns args: {tuple}
+    """
+    attribute_list = ['attribute_{}'.format(n) for n in range(params)]
+    method_list = ['method_{}(infile: str = None, value: int = {}) -> None'.format(n, n) for n in range(params)]
+    import_list = ['import os', 'import sys', 'import logging']
+    return 'GeneratedClass', 'A generated class', 'some.package.Base', import_list, attribute_list, method_list, True
+
+
+@click.command()
+@click.option('--renders', type=int, default=DEFAULT_RENDERS, help='Number of functions and of classes to render - default is {}'.format(DEFAULT_RENDERS))
+@click.option('--params', type=int, default=DEFAULT_PARAMS, help='Parameters per function and attributes and methods per class - default is {}'.format(DEFAULT_PARAMS))
+@click.option('--repeat', type=int, default=DEFAULT_REPEAT, help='Number of runs, the fastest one is kept - default is {}'.format(DEFAULT_REPEAT))
+def main(renders, params, repeat):
+    """Benchmark loading and rendering the compiled code templates
+    """
+    # render_class_definition() logs every attribute
+    logging.disable(logging.INFO)
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        print("{:<10} {:>12} {:>12} {:>12}".format('template', 'compile ms', 'disk ms', 'process us'))
+        for name in TEMPLATE_LIST:
+            compile_seconds = time_best(lambda: code_templates.compile_template(name, cache_dir=None), repeat)
+            # Fill the disk cache once, then time loading from it
+            code_templates.compile_template(name, cache_dir=cache_dir)
+            disk_seconds = time_best(lambda: code_templates.compile_template(name, cache_dir=cache_dir), repeat)
+            code_templates.get_template(name)
+            process_seconds = time_best(lambda: code_templates.get_template(name), repeat)
+            print("{:<10} {:>12.3f} {:>12.3f} {:>12.3f}".format(name, compile_seconds * 1000, disk_seconds * 1000, process_seconds * 1000000))
+    finally:
+        shutil.rmtree(cache_dir)
+
+    function_args = get_function_args(params)
+    class_args = get_class_args(params)
+
+    print("")
+    for label, render, args in [
+        ('function', function_generator.render_function, function_args),
+        ('class', umlet_class_diagram_to_python_api.render_class_definition, class_args),
+    ]:
+        seconds = time_best(lambda: [render(*args) for _ in range(renders)], repeat)
+        size = len(render(*args))
+        print("Rendered '{}' {} templates of '{}' characters in '{:.3f}' seconds - '{:.0f}' renders/sec".format(renders, label, size, seconds, renders / seconds))
+
+
+if __name__ == "__main__":
+    main()
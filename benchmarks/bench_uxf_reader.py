@@ -0,0 +1,88 @@
+"""Benchmark of the streaming .uxf reader of code_generator.
+
+Writes synthetic Umlet diagrams of several sizes (see synthetic_inputs.py)
+and reads the panel_attributes of each one in a fresh process, once by
+loading the whole tree with ElementTree.parse and once with
+code_generator.iter_panel_attributes, then reports the time and the
+peak resident set size of each.  The streaming reader should stay at
+about the same peak RSS however large the diagram is.
+
+Usage:
+    python benchmarks/bench_uxf_reader.py
+    python benchmarks/bench_uxf_reader.py --panels 1000 --panels 100000
+"""
+import os
+import sys
+import json
+import time
+import click
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic_inputs  # noqa: E402
+
+
+DEFAULT_PANELS = [1000, 10000, 50000]
+
+READER_LIST = ['tree', 'stream']
+
+
+def read_panels(infile: str = None, reader: str = None) -> dict:
+    """Read the panel_attributes of the diagram and measure this process.
+    :param infile: {str}
+    :param reader: {str} - one of READER_LIST
+    :returns result: {dict}
+    """
+    import resource
+    import xml.etree.ElementTree as ET
+    import code_generator
+    from run_metrics import get_peak_rss
+
+    start = time.perf_counter()
+    if reader == 'tree':
+        panel_ctr = sum(1 for _ in ET.parse(infile).getroot().iter('panel_attributes'))
+    else:
+        panel_ctr = sum(1 for _ in code_generator.iter_panel_attributes(infile))
+    seconds = time.perf_counter() - start
+
+    return {'panels': panel_ctr, 'seconds': seconds, 'peak_rss': get_peak_rss(resource.RUSAGE_SELF)}
+
+
+@click.command()
+@click.option('--panels', type=int, multiple=True, help='Number of panels of a diagram, repeatable - default is {}'.format(DEFAULT_PANELS))
+@click.option('--measure', type=click.Choice(READER_LIST), hidden=True, help='Read --infile in this process and print the result as JSON')
+@click.option('--infile', hidden=True)
+def main(panels, measure, infile):
+    """Compare the peak memory of loading whole .uxf diagrams with streaming their panels
+    """
+    if measure is not None:
+        print(json.dumps(read_panels(infile, measure)))
+        return
+
+    if not panels:
+        panels = DEFAULT_PANELS
+
+    workdir = tempfile.mkdtemp()
+    try:
+        print("{:>8} {:>10} {:<8} {:>10} {:>14}".format('panels', 'MB', 'reader', 'seconds', 'peak RSS MB'))
+        for panel_count in panels:
+            uxf_file = os.path.join(workdir, 'diagram-{}.uxf'.format(panel_count))
+            synthetic_inputs.write_uxf(uxf_file, panel_count)
+            size = os.path.getsize(uxf_file)
+
+            for reader in READER_LIST:
+                output = subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', reader, '--infile', uxf_file],
+                                        stdout=subprocess.PIPE, check=True).stdout
+                result = json.loads(output)
+                assert result['panels'] == panel_count
+                print("{:>8} {:>10.1f} {:<8} {:>10.3f} {:>14.1f}".format(panel_count, size / 1e6, reader, result['seconds'], result['peak_rss'] / 1e6))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
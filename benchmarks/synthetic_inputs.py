@@ -0,0 +1,244 @@
+"""Generators of synthetic inputs for the benchmarks.
+
+Writes source trees for code_base_analyzer, function-spec and JSONL
+function-spec files for function_generator and Umlet .uxf diagrams for
+umlet_class_diagram_to_python_api of any size.  The output only
+depends on the arguments, so runs with the same sizes are comparable.
+
+Usage:
+    python benchmarks/synthetic_inputs.py tree --outdir /tmp/tree --files 5000 --depth 3 --fanout 8
+    python benchmarks/synthetic_inputs.py spec --outfile /tmp/spec.txt --params 5000
+    python benchmarks/synthetic_inputs.py jsonl --outfile /tmp/specs.jsonl --records 100000
+    python benchmarks/synthetic_inputs.py uxf --outfile /tmp/diagram.uxf --panels 2000
+"""
+import os
+import json
+import click
+import pathlib
+
+from xml.sax.saxutils import escape
+
+
+DEFAULT_LINES_PER_FILE = 200
+
+DEFAULT_DEPTH = 3
+
+DEFAULT_FANOUT = 4
+
+DEFAULT_ATTRIBUTES_PER_PANEL = 5
+
+DEFAULT_METHODS_PER_PANEL = 5
+
+# Repeated until a file has the requested number of lines; covers every line class the analyzer counts
+SOURCE_BLOCK = '''import os
+from datetime import datetime
+
+
+# TODO: generated block {n}
+class Generated{n}(object):
+    """Docstring mentioning class and def"""
+
+    def method_{n}(self, value: int = 0) -> int:
+        # add one
+        return value + 1
+
+
+def function_{n}(infile: str = None) -> None:
+    data = {{'key': 'value', 'number': {n}}}
+    return None
+'''
+
+SOURCE_BLOCK_LINES = SOURCE_BLOCK.count('\n')
+
+DATATYPE_LIST = ['bool', 'dict', 'float', 'int', 'list', 'str']
+
+
+def get_source(lines: int = DEFAULT_LINES_PER_FILE, seed: int = 0) -> str:
+    """Get the content of one generated Python file.
+    :param lines: {int} - the number of lines, rounded up to whole blocks
+    :param seed: {int} - makes the names of each file distinct
+    :returns source: {str}
+    """
+    block_count = max(1, -(-lines // SOURCE_BLOCK_LINES))
+    return ''.join(SOURCE_BLOCK.format(n=seed * block_count + n) for n in range(block_count))
+
+
+def get_tree_dirs(depth: int = DEFAULT_DEPTH, fanout: int = DEFAULT_FANOUT) -> list:
+    """Get the relative directories of a tree of the given shape.
+    :param depth: {int} - the number of directory levels below the root
+    :param fanout: {int} - the number of subdirectories of each directory
+    :returns dir_list: {list} - starting with the root ''
+    """
+    dir_list = ['']
+    level = ['']
+    for _ in range(depth):
+        level = [os.path.join(parent, 'pkg{}'.format(i)) for parent in level for i in range(fanout)]
+        dir_list.extend(level)
+    return dir_list
+
+
+def write_source_tree(outdir: str = None, files: int = 1000, depth: int = DEFAULT_DEPTH, fanout: int = DEFAULT_FANOUT, lines: int = DEFAULT_LINES_PER_FILE) -> int:
+    """Write a tree of generated Python packages.
+    The files are spread round-robin over all directories of the tree
+    and every directory gets an __init__.py.
+    :param outdir: {str}
+    :param files: {int} - the number of generated modules
+    :param depth: {int} - the number of directory levels below outdir
+    :param fanout: {int} - the number of subdirectories of each directory
+    :param lines: {int} - the number of lines of each module
+    :returns line_count: {int} - the total number of lines written
+    """
+    dir_list = get_tree_dirs(depth, fanout)
+    for dirname in dir_list:
+        pathlib.Path(outdir, dirname).mkdir(parents=True, exist_ok=True)
+        pathlib.Path(outdir, dirname, '__init__.py').touch()
+
+    line_count = 0
+    for n in range(files):
+        source = get_source(lines, n)
+        with open(os.path.join(outdir, dir_list[n % len(dir_list)], 'module{}.py'.format(n)), 'w') as fh:
+            fh.write(source)
+        line_count += source.count('\n')
+
+    return line_count
+
+
+def write_function_spec(outfile: str = None, params: int = 1000, specs: int = 1) -> None:
+    """Write a function-spec file for function_generator with many parameters.
+    :param outfile: {str}
+    :param params: {int} - the number of param: entries per spec
+    :param specs: {int} - more than one writes a multi-document file of distinct functions
+    """
+    with open(outfile, 'w') as fh:
+        for i in range(specs):
+            if i > 0:
+                fh.write('---\n')
+            fh.write('# generated function spec\n')
+            fh.write('function_name:generated_function{}\n'.format(i if specs > 1 else ''))
+            fh.write('function_type:function\n')
+            fh.write('return_type:bool\n')
+            for n in range(params):
+                # Every fourth parameter is an input file so the generated checks are exercised too
+                name = 'infile{}'.format(n) if n % 4 == 0 else 'param{}'.format(n)
+                fh.write('param:{}:{}:None:generated parameter {}\n'.format(name, DATATYPE_LIST[n % len(DATATYPE_LIST)], n))
+
+
+def write_function_jsonl(outfile: str = None, params: int = 20, records: int = 1000) -> None:
+    """Write a JSONL file of function spec records for function_generator --jsonl.
+    :param outfile: {str}
+    :param params: {int} - the number of parameters per record
+    :param records: {int}
+    """
+    with open(outfile, 'w') as fh:
+        for i in range(records):
+            parameters = []
+            for n in range(params):
+                # Every fourth parameter is an input file so the generated checks are exercised too
+                name = 'infile{}'.format(n) if n % 4 == 0 else 'param{}'.format(n)
+                parameters.append({'name': name, 'datatype': DATATYPE_LIST[n % len(DATATYPE_LIST)], 'default': 'None', 'description': 'generated parameter {}'.format(n)})
+            fh.write(json.dumps({'function_name': 'generated_function{}'.format(i), 'function_type': 'function', 'return_type': 'bool', 'parameters': parameters}) + '\n')
+
+
+def get_panel_attributes(n: int = 0, attributes: int = DEFAULT_ATTRIBUTES_PER_PANEL, methods: int = DEFAULT_METHODS_PER_PANEL) -> str:
+    """Get the text of one class panel.
+    :param n: {int} - makes the package and class names distinct
+    :param attributes: {int}
+    :param methods: {int} - at least one, convert() needs a method with parameters
+    :returns panel_attributes: {str}
+    """
+    content = []
+    content.append('generated.pkg{}.module{}.Generated{}'.format(n % 10, n, n))
+    content.append('//desc:Generated class {}'.format(n))
+    content.append('//import logging')
+    content.append('//import os')
+    if n % 3 == 0:
+        content.append('//singleton')
+    if n % 2 == 0:
+        content.append('//inherits:generated.base.module.Base')
+    content.append('--')
+    for i in range(attributes):
+        content.append('attribute{}'.format(i))
+    content.append('--')
+    for i in range(max(1, methods)):
+        content.append('method{}(infile:str=None,count:int=0)-> bool:'.format(i))
+    return '\n'.join(content) + '\n'
+
+
+def write_uxf(outfile: str = None, panels: int = 100, attributes: int = DEFAULT_ATTRIBUTES_PER_PANEL, methods: int = DEFAULT_METHODS_PER_PANEL) -> None:
+    """Write an Umlet .uxf diagram with many class panels.
+    :param outfile: {str}
+    :param panels: {int} - the number of panel_attributes elements
+    :param attributes: {int} - attributes per panel
+    :param methods: {int} - methods per panel
+    """
+    with open(outfile, 'w') as fh:
+        fh.write('<?xml version="1.0" encoding="UTF-8"?><diagram program="umlet" version="13.3">\n')
+        fh.write('  <zoom_level>10</zoom_level>\n')
+        for n in range(panels):
+            fh.write('  <element>\n')
+            fh.write('    <id>UMLClass</id>\n')
+            fh.write('    <coordinates>\n')
+            fh.write('      <x>{}</x>\n      <y>{}</y>\n      <w>360</w>\n      <h>140</h>\n'.format(40 + (n % 20) * 400, 40 + (n // 20) * 200))
+            fh.write('    </coordinates>\n')
+            fh.write('    <panel_attributes>{}</panel_attributes>\n'.format(escape(get_panel_attributes(n, attributes, methods))))
+            fh.write('    <additional_attributes/>\n')
+            fh.write('  </element>\n')
+        fh.write('</diagram>\n')
+
+
+@click.group()
+def main():
+    """Write synthetic benchmark inputs
+    """
+    pass
+
+
+@main.command()
+@click.option('--outdir', required=True, help='The root of the generated tree')
+@click.option('--files', type=int, default=1000, help='The number of generated modules - default is 1000')
+@click.option('--depth', type=int, default=DEFAULT_DEPTH, help='The number of directory levels - default is {}'.format(DEFAULT_DEPTH))
+@click.option('--fanout', type=int, default=DEFAULT_FANOUT, help='The number of subdirectories per directory - default is {}'.format(DEFAULT_FANOUT))
+@click.option('--lines', type=int, default=DEFAULT_LINES_PER_FILE, help='The number of lines per module - default is {}'.format(DEFAULT_LINES_PER_FILE))
+def tree(outdir, files, depth, fanout, lines):
+    """Write a source tree for code_base_analyzer
+    """
+    line_count = write_source_tree(outdir, files, depth, fanout, lines)
+    print("Wrote '{}' files with '{}' lines to directory '{}'".format(files, line_count, outdir))
+
+
+@main.command()
+@click.option('--outfile', required=True, help='The function-spec file')
+@click.option('--params', type=int, default=1000, help='The number of parameters per spec - default is 1000')
+@click.option('--specs', type=int, default=1, help="The number of specs, separated by '---' lines - default is 1")
+def spec(outfile, params, specs):
+    """Write a function-spec file for function_generator
+    """
+    write_function_spec(outfile, params, specs)
+    print("Wrote '{}' function specs with '{}' parameters to file '{}'".format(specs, params, outfile))
+
+
+@main.command()
+@click.option('--outfile', required=True, help='The JSONL file')
+@click.option('--params', type=int, default=20, help='The number of parameters per record - default is 20')
+@click.option('--records', type=int, default=1000, help='The number of function spec records - default is 1000')
+def jsonl(outfile, params, records):
+    """Write a JSONL function-spec file for function_generator --jsonl
+    """
+    write_function_jsonl(outfile, params, records)
+    print("Wrote '{}' function spec records with '{}' parameters to file '{}'".format(records, params, outfile))
+
+
+@main.command()
+@click.option('--outfile', required=True, help='The .uxf file')
+@click.option('--panels', type=int, default=100, help='The number of class panels - default is 100')
+@click.option('--attributes', type=int, default=DEFAULT_ATTRIBUTES_PER_PANEL, help='The number of attributes per panel - default is {}'.format(DEFAULT_ATTRIBUTES_PER_PANEL))
+@click.option('--methods', type=int, default=DEFAULT_METHODS_PER_PANEL, help='The number of methods per panel - default is {}'.format(DEFAULT_METHODS_PER_PANEL))
+def uxf(outfile, panels, attributes, methods):
+    """Write an Umlet diagram for umlet_class_diagram_to_python_api
+    """
+    write_uxf(outfile, panels, attributes, methods)
+    print("Wrote diagram with '{}' panels to file '{}'".format(panels, outfile))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,32 @@
-import re
+import io
 import os
+import re
+import ast
 import sys
+import json
+import signal
+import stat
+import operator
+import itertools
+import tokenize
+import subprocess
+import contextlib
+import collections
 import click
 import pathlib
 import logging
-import calendar
 import time
 
+from concurrent.futures import ProcessPoolExecutor
 from colorama import Fore, Style
+from file_walker import walk_files, is_walked
+from git_changes import get_changed_files, iter_blobs, STATUS_ADDED, STATUS_DELETED
+from analysis_records import RecordWriter, RECORD_FORMAT_LIST, DEFAULT_RECORD_FORMAT
+from run_metrics import RunMetrics, get_metrics_file, time_phase, time_iter
+from file_prefetch import iter_prefetched, DEFAULT_BYTE_BUDGET
+from archive_reader import is_archive, iter_archive_members, ARCHIVE_GLOB_LIST
+from file_filter import get_skip_reason, read_head, SKIP_BINARY, SKIP_GENERATED, SKIP_LARGE
 from datetime import datetime
-from datetime import date
 
 
 DEFAULT_VERBOSE = False
@@ -24,113 +41,1277 @@ LOGGING_FORMAT = "%(levelname)s : %(asctime)s : %(pathname)s : %(lineno)d : %(me
 
 LOG_LEVEL = logging.INFO
 
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Number of files handed to a worker process at a time
+BATCH_SIZE = 64
+
+ENGINE_LIST = ['text', 'bytes']
+
+DEFAULT_ENGINE = 'text'
+
+MODE_LIST = ['regex', 'ast']
+
+DEFAULT_MODE = 'regex'
+
+# Files the ast mode parses; all other files go through the line classifier
+PYTHON_EXTENSION_LIST = ('.py', '.pyw')
+
+# The bytes engine reads files this many bytes at a time
+BYTES_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Bump whenever the counting rules change so stale cache entries are discarded
+CACHE_VERSION = '3'
+
+# The order in which the counters are written to the summary report
+COUNTER_NAMES = [
+    'code_files',
+    'init_files',
+    'comments',
+    'classes',
+    'todos',
+    'functions',
+    'async_functions',
+    'methods',
+    'imports',
+    'from_imports',
+    'lines',
+    'blank_lines',
+    'skipped_binary',
+    'skipped_generated',
+    'skipped_large',
+]
+
+# The counters only the ast mode fills in
+AST_ONLY_COUNTER_NAMES = ['async_functions', 'methods']
+
+# The counters of the files the skip filters left out, by get_skip_reason() result
+SKIP_COUNTER_NAMES = {
+    SKIP_BINARY: 'skipped_binary',
+    SKIP_GENERATED: 'skipped_generated',
+    SKIP_LARGE: 'skipped_large',
+}
+
+REGEX_COUNTER_NAMES = [name for name in COUNTER_NAMES if name not in AST_ONLY_COUNTER_NAMES]
+
+# The label of each counter in the summary report, in report order
+REPORT_LABEL_LIST = [
+    ('code_files', "code files: "),
+    ('init_files', "__init__.py files: "),
+    ('comments', "comments "),
+    ('classes', "classes: "),
+    ('todos', "TODOs: "),
+    ('functions', "functions: "),
+    ('async_functions', "async functions: "),
+    ('methods', "methods: "),
+    ('imports', "imports: "),
+    ('from_imports', "from imports: "),
+    ('lines', "lines: "),
+    ('blank_lines', "blank lines: "),
+    ('skipped_binary', "skipped binary files: "),
+    ('skipped_generated', "skipped generated files: "),
+    ('skipped_large', "skipped large files: "),
+]
+
+# Results of classify_line() - shared so no tuple is built per line
+_NONE = ()
+_BLANK = ('blank_lines',)
+_COMMENT = ('comments',)
+_TODO_COMMENT = ('todos', 'comments')
+_FUNCTION = ('functions',)
+
+_FUNCTION_NODE_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+# The statement lists of a node that may hold nested classes, functions and imports
+_STATEMENT_LIST_FIELDS = ('body', 'orelse', 'finalbody', 'handlers', 'cases')
+
+# Matches string literals (skipped) and comments (group 1) of Python source
+_STRING_OR_COMMENT_RE = re.compile(r"""
+    \"\"\"(?:[^"\\]|\\.|"(?!""))*(?:\"\"\"|$)
+  | '''(?:[^'\\]|\\.|'(?!''))*(?:'''|$)
+  | "(?:[^"\\\n]|\\.)*(?:"|$)
+  | '(?:[^'\\\n]|\\.)*(?:'|$)
+  | (\#[^\n]*)
+""", re.VERBOSE | re.DOTALL)
+
+# First character of a line => (required prefix, counters) for the
+# categories that only need a plain prefix check
+_PREFIX_DISPATCH = {
+    'c': ('class', ('classes',)),
+    'i': ('import', ('imports',)),
+    'f': ('from', ('from_imports',)),
+}
 
-def get_file_list(indir: str = None) -> list:
+# Bytes engine: ASCII control bytes that str.strip() treats as
+# whitespace but bytes.strip() does not
+_UNICODE_ONLY_ASCII_BYTES = [b'\x1c', b'\x1d', b'\x1e', b'\x1f']
+
+# Bytes engine: a stripped 'def' line is a function when whitespace follows
+_DEF_PREFIX_LIST = [b'\ndef ', b'\ndef\t', b'\ndef\x0b', b'\ndef\x0c']
+
+
+def iter_file_list(indir: str = None, include_list: list = None, exclude_list: list = None, use_gitignore: bool = False):
+    """Lazily yield the files in the specified directory.
+    The venv, .git and similar directories are pruned without being
+    descended into - see file_walker.DEFAULT_EXCLUDE_LIST.
+    :param indir: {str}
+    :param include_list: {list} - globs a file must match
+    :param exclude_list: {list} - additional globs of files and directories to skip
+    :param use_gitignore: {bool} - whether to honor .gitignore files
+    :returns generator of file paths: {str}
+    """
+    file_ctr = 0
+    for file_path in walk_files(indir, include_list, exclude_list, use_gitignore):
+        file_ctr += 1
+        yield file_path
+
+    print("Processed '{}' files in directory '{}'".format(file_ctr, indir))
+
+
+def get_file_list(indir: str = None, include_list: list = None, exclude_list: list = None, use_gitignore: bool = False) -> list:
     """Get the list of files in the specified directory.
     Ignore any files in the venv directory.
     :param indir: {str}
+    :param include_list: {list} - globs a file must match
+    :param exclude_list: {list} - additional globs of files and directories to skip
+    :param use_gitignore: {bool} - whether to honor .gitignore files
     :returns file_list: {list}
     """
-    file_ctr = 0
+    return list(iter_file_list(indir, include_list, exclude_list, use_gitignore))
+
+
+def get_counter_names(mode: str = DEFAULT_MODE, skip_filters: bool = False) -> list:
+    """Get the counters that apply to a run, in report order.
+    :param mode: {str} - the ast mode fills in async functions and methods too
+    :param skip_filters: {bool} - whether any skip filter is on
+    :returns counter_names: {list}
+    """
+    counter_names = COUNTER_NAMES if mode == 'ast' else REGEX_COUNTER_NAMES
+    if skip_filters:
+        return list(counter_names)
+    return [name for name in counter_names if name not in SKIP_COUNTER_NAMES.values()]
+
+
+def new_counters() -> dict:
+    """Create a fresh set of counters, all set to zero.
+    :returns counters: {dict}
+    """
+    return dict.fromkeys(COUNTER_NAMES, 0)
+
+
+def merge_counters(totals: dict = None, counters: dict = None) -> dict:
+    """Add the per-file counters to the running totals.
+    :param totals: {dict}
+    :param counters: {dict}
+    :returns totals: {dict}
+    """
+    for name in COUNTER_NAMES:
+        totals[name] += counters[name]
+    return totals
+
+
+def subtract_counters(totals: dict = None, counters: dict = None) -> dict:
+    """Take the per-file counters back out of the running totals.
+    :param totals: {dict}
+    :param counters: {dict}
+    :returns totals: {dict}
+    """
+    for name in COUNTER_NAMES:
+        totals[name] -= counters[name]
+    return totals
+
+
+def classify_line(line: str = None) -> tuple:
+    """Decide all the categories of a stripped line in one pass.
+    The first character selects the only categories that could apply
+    so every line is inspected at most once per category, e.g.:
+    a line starting with '#' is a comment and maybe a TODO, a line
+    starting with 'c' may be a class and so on.
+    :param line: {str} - the line with leading/trailing whitespace removed
+    :returns names: {tuple} - the names of the counters to increment
+    """
+    if not line:
+        return _BLANK
+
+    first = line[0]
+
+    if first == '#':
+        if line[1:].lstrip().startswith('TODO'):
+            return _TODO_COMMENT
+        return _COMMENT
+
+    if first == 'd':
+        if line.startswith('def') and len(line) > 3 and line[3].isspace():
+            return _FUNCTION
+        return _NONE
+
+    if first in _PREFIX_DISPATCH:
+        prefix, names = _PREFIX_DISPATCH[first]
+        if line.startswith(prefix):
+            return names
+
+    return _NONE
+
+
+def count_lines(lines=None, counters: dict = None) -> dict:
+    """Classify each line and increment the matching counters.
+    :param lines: {iterable} - e.g.: an open file handle
+    :param counters: {dict}
+    :returns counters: {dict}
+    """
+    for line in lines:
+        counters['lines'] += 1
+        for name in classify_line(line.strip()):
+            counters[name] += 1
+
+    return counters
+
+
+def count_byte_lines(lines: list = None, counters: dict = None, ascii_only: bool = False) -> dict:
+    """Classify a list of raw lines with bulk operations.
+    The lines are stripped with a C-level map() and joined back into one
+    buffer in which every line starts right after a newline, so each
+    category is a single bytes.count() of e.g. b'\\nclass'.  Lines with
+    non-ASCII bytes are decoded and passed to classify_line(), so the
+    counters are the same as for the text engine.
+    :param lines: {list} - the lines as bytes without their newlines
+    :param counters: {dict}
+    :param ascii_only: {bool} - whether the caller already knows all lines are ASCII
+    :returns counters: {dict}
+    """
+    counters['lines'] += len(lines)
+
+    stripped = list(map(bytes.strip, lines))
+
+    ascii_flags = None if ascii_only else list(map(bytes.isascii, stripped))
+    if ascii_flags is not None and not all(ascii_flags):
+        for line in itertools.compress(stripped, map(operator.not_, ascii_flags)):
+            for name in classify_line(line.decode('utf-8', errors='replace').strip()):
+                counters[name] += 1
+        stripped = list(itertools.compress(stripped, ascii_flags))
+
+    counters['blank_lines'] += stripped.count(b'')
+
+    buf = b'\n' + b'\n'.join(stripped)
+
+    counters['classes'] += buf.count(b'\nclass')
+    counters['imports'] += buf.count(b'\nimport')
+    counters['from_imports'] += buf.count(b'\nfrom')
+    counters['comments'] += buf.count(b'\n#')
+
+    for prefix in _DEF_PREFIX_LIST:
+        counters['functions'] += buf.count(prefix)
+
+    # 'TODO' is rare, so look back from each occurrence instead of scanning every comment
+    pos = buf.find(b'TODO')
+    while pos != -1:
+        line_start = buf.rfind(b'\n', 0, pos) + 1
+        if buf.startswith(b'#', line_start) and not buf[line_start + 1:pos].strip():
+            counters['todos'] += 1
+        pos = buf.find(b'TODO', pos + 4)
+
+    return counters
+
+
+def count_stream_bytes(fh=None, counters: dict = None) -> dict:
+    """Count the lines of a binary stream with the bytes engine.
+    The stream is bulk-read in chunks of BYTES_CHUNK_SIZE so memory stays
+    bounded for very large files.  Carriage returns are normalized the
+    same way text mode would, and content that is not valid UTF-8 is
+    counted rather than raising UnicodeDecodeError.
+    :param fh: {binary file object}
+    :param counters: {dict}
+    :returns counters: {dict}
+    """
+    carry = b''
+    while True:
+        chunk = fh.read(BYTES_CHUNK_SIZE)
+        if not chunk:
+            break
+
+        # Never split a \r\n pair across two chunks
+        while chunk.endswith(b'\r'):
+            extra = fh.read(1)
+            if not extra:
+                break
+            chunk += extra
+
+        if b'\r' in chunk:
+            chunk = chunk.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+        data = carry + chunk
+        lines = data.split(b'\n')
+        carry = lines.pop()
+
+        if any(byte in data for byte in _UNICODE_ONLY_ASCII_BYTES):
+            count_lines([line.decode('utf-8', errors='replace') for line in lines], counters)
+        else:
+            count_byte_lines(lines, counters, data.isascii())
+
+    if carry:
+        count_lines([carry.decode('utf-8', errors='replace')], counters)
+
+    return counters
+
+
+def count_source_ast(source: str = None, counters: dict = None) -> dict:
+    """Count the Python source from a single ast parse.
+    Unlike the line classifier this ignores 'class' and 'def' inside
+    strings and docstrings, finds indented imports and counts inline
+    comments too.  Only the statement lists of the tree are visited,
+    since classes, functions and imports are always statements.
+    Comments, which the tree does not hold, come from one C-level scan
+    of the source that skips over string literals the way the tokenizer
+    does - much faster than the pure-Python tokenize module.
+    :param source: {str}
+    :param counters: {dict}
+    :returns counters: {dict}
+    :raises SyntaxError or ValueError: if the source does not parse
+    """
+    tree = ast.parse(source)
+
+    stack = list(tree.body)
+    while stack:
+        node = stack.pop()
+        node_type = type(node)
+        if node_type is ast.ClassDef:
+            counters['classes'] += 1
+            for child in node.body:
+                if type(child) in _FUNCTION_NODE_TYPES:
+                    counters['methods'] += 1
+        elif node_type is ast.FunctionDef:
+            counters['functions'] += 1
+        elif node_type is ast.AsyncFunctionDef:
+            counters['async_functions'] += 1
+        elif node_type is ast.Import:
+            counters['imports'] += 1
+            continue
+        elif node_type is ast.ImportFrom:
+            counters['from_imports'] += 1
+            continue
+
+        for field in _STATEMENT_LIST_FIELDS:
+            children = getattr(node, field, None)
+            if children:
+                stack.extend(children)
+
+    for match in _STRING_OR_COMMENT_RE.finditer(source):
+        comment = match.group(1)
+        if comment is not None:
+            counters['comments'] += 1
+            if comment[1:].lstrip().startswith('TODO'):
+                counters['todos'] += 1
+
+    lines = source.split('\n')
+    if lines[-1] == '':
+        # The empty piece after the final newline is not a line
+        lines.pop()
+
+    counters['lines'] += len(lines)
+    counters['blank_lines'] += list(map(str.strip, lines)).count('')
+
+    return counters
+
+
+def count_stream_text(fh=None, counters: dict = None) -> dict:
+    """Count the lines of a binary stream with the text engine.
+    The stream is decoded exactly like a file opened with open(file, 'r').
+    :param fh: {binary file object}
+    :param counters: {dict}
+    :returns counters: {dict}
+    """
+    text_fh = io.TextIOWrapper(fh)
+    try:
+        return count_lines(text_fh, counters)
+    finally:
+        # Leave the binary stream open for the caller
+        text_fh.detach()
+
+
+def count_stream_ast(name: str = None, fh=None, counters: dict = None, engine: str = DEFAULT_ENGINE) -> dict:
+    """Count a Python source stream with count_source_ast().
+    The source is decoded the way the interpreter would (PEP 263).
+    Streams that are not Python source or that do not parse fall back
+    to the line classifier of the engine.
+    :param name: {str} - the file name, used to tell Python source apart
+    :param fh: {seekable binary file object}
+    :param counters: {dict}
+    :param engine: {str} - used for the fallback
+    :returns counters: {dict}
+    """
+    if name.endswith(PYTHON_EXTENSION_LIST):
+        try:
+            encoding, _ = tokenize.detect_encoding(fh.readline)
+            fh.seek(0)
+            text_fh = io.TextIOWrapper(fh, encoding)
+            try:
+                source = text_fh.read()
+            finally:
+                text_fh.detach()
+            # Count into a copy so a parse error leaves no partial counts behind
+            return count_source_ast(source, dict(counters))
+        except (SyntaxError, ValueError, UnicodeDecodeError) as e:
+            logging.warning("Could not parse file '{}' - falling back to the line classifier: {}".format(name, e))
+            fh.seek(0)
+
+    if engine == 'bytes':
+        return count_stream_bytes(fh, counters)
+
+    return count_stream_text(fh, counters)
+
+
+def get_skipped_counters(name: str = None, reason: str = None) -> dict:
+    """Count a file the skip filters left out.
+    :param name: {str}
+    :param reason: {str} - see get_skip_reason()
+    :returns counters: {dict} - the counters for this one file
+    """
+    logging.info("Skipping {} file '{}'".format(reason, name))
+    counters = new_counters()
+    counters[SKIP_COUNTER_NAMES[reason]] += 1
+    return counters
+
+
+def analyze_stream(name: str = None, fh=None, engine: str = DEFAULT_ENGINE, mode: str = DEFAULT_MODE, filter_options: dict = None, size: int = None) -> dict:
+    """Analyze the content of a single code file from a binary stream,
+    e.g.: an open file or an io.BytesIO holding content from elsewhere.
+    :param name: {str} - the file name
+    :param fh: {seekable binary file object}
+    :param engine: {str} - 'text' reads lines as str, 'bytes' counts the raw bytes
+    :param mode: {str} - 'regex' classifies lines, 'ast' parses Python files
+    :param filter_options: {dict} - optional, keyword arguments for get_skip_reason() e.g.: skip_binary, max_size
+    :param size: {int} - optional, the size of the stream in bytes for the max_size filter
+    :returns counters: {dict} - the counters for this one file
+    """
+    counters = new_counters()
+
+    if os.path.basename(name) == '__init__.py':
+        counters['init_files'] += 1
+        return counters
+
+    if filter_options is not None:
+        # Only the first block is read to tell binary and generated files apart
+        head = None
+        if filter_options.get('skip_binary') or filter_options.get('skip_generated'):
+            head = read_head(fh)
+        reason = get_skip_reason(name, size, head, **filter_options)
+        if reason is not None:
+            return get_skipped_counters(name, reason)
+
+    counters['code_files'] += 1
+
+    if mode == 'ast':
+        return count_stream_ast(name, fh, counters, engine)
+
+    if engine == 'bytes':
+        return count_stream_bytes(fh, counters)
+
+    return count_stream_text(fh, counters)
+
+
+def needs_reading(file: str = None) -> bool:
+    """Check whether analyze_file() reads the file at all.
+    :param file: {str}
+    :returns needs_reading: {bool} - False for __init__.py files, they are counted without being opened
+    """
+    return os.path.basename(file) != '__init__.py'
+
+
+def iter_archive_counters(archive: str = None, engine: str = DEFAULT_ENGINE, mode: str = DEFAULT_MODE, content: bytes = None, archive_options: dict = None, filter_options: dict = None):
+    """Analyze the files in an archive without extracting it.
+    :param archive: {str}
+    :param engine: {str} - see analyze_file()
+    :param mode: {str} - see analyze_file()
+    :param content: {bytes} - optional, the archive already read, else the archive file is read
+    :param archive_options: {dict} - optional, keyword arguments for iter_archive_members() e.g.: include_list, exclude_list
+    :param filter_options: {dict} - optional, see analyze_stream(); applied to each member
+    :returns generator of (path, counters): {tuple} - the path of a member is below the archive path
+    :raises ValueError: if the archive cannot be read
+    """
+    fh = io.BytesIO(content) if content is not None else None
+
+    for relpath, size, member_fh in iter_archive_members(archive, fh, **(archive_options or {})):
+        if mode == 'ast' and not member_fh.seekable():
+            member_fh = io.BytesIO(member_fh.read())
+        yield os.path.join(archive, relpath), analyze_stream(relpath, member_fh, engine, mode, filter_options, size)
+
+
+def analyze_file(file: str = None, engine: str = DEFAULT_ENGINE, mode: str = DEFAULT_MODE, content: bytes = None, archive_options: dict = None, filter_options: dict = None) -> dict:
+    """Analyze a single code file.
+    :param file: {str}
+    :param engine: {str} - 'text' reads lines as str, 'bytes' counts the raw bytes
+    :param mode: {str} - 'regex' classifies lines, 'ast' parses Python files
+    :param content: {bytes} - optional, the content already read ahead, else the file is read
+    :param archive_options: {dict} - when given, archives are analyzed member by member, see iter_archive_counters()
+    :param filter_options: {dict} - when given, binary, generated and large files are skipped, see analyze_stream()
+    :returns counters: {dict} - the counters for this one file
+    """
+    logging.info("Going to analyze file '{}'".format(file))
+
+    if not needs_reading(file):
+        return analyze_stream(file, None, engine, mode)
+
+    if archive_options is not None and is_archive(file):
+        counters = new_counters()
+        for _, member_counters in iter_archive_counters(file, engine, mode, content, archive_options, filter_options):
+            merge_counters(counters, member_counters)
+        return counters
+
+    # Files skipped by name alone are not even opened
+    if filter_options is not None:
+        reason = get_skip_reason(file, **filter_options)
+        if reason is not None:
+            return get_skipped_counters(file, reason)
+
+    if content is not None:
+        return analyze_stream(file, io.BytesIO(content), engine, mode, filter_options, len(content))
+
+    with open(file, 'rb') as fh:
+        size = os.fstat(fh.fileno()).st_size if filter_options is not None else None
+        return analyze_stream(file, fh, engine, mode, filter_options, size)
+
+
+def analyze_file_timed(file: str = None, content: bytes = None, **file_options) -> tuple:
+    """Analyze a single code file and measure how long it took.
+    :param file: {str}
+    :param content: {bytes} - optional, the content already read ahead
+    :param file_options: keyword arguments for analyze_file()
+    :returns (counters, seconds, size): {tuple} - size is in bytes
+    """
+    start = time.perf_counter()
+    counters = analyze_file(file, content=content, **file_options)
+    seconds = time.perf_counter() - start
+    return counters, seconds, os.path.getsize(file)
+
+
+def iter_file_contents(files=None, prefetch_options: dict = None, filter_options: dict = None):
+    """Pair each file with its content when it is read ahead.
+    Files the skip filters leave out by name or size are not read ahead.
+    :param files: {iterable}
+    :param prefetch_options: {dict} - keyword arguments for iter_prefetched(); no read-ahead if None or depth is 0
+    :param filter_options: {dict} - optional, see analyze_file()
+    :returns generator of (file, content): {tuple} - content is None when the file was not read ahead
+    """
+    if not prefetch_options or not prefetch_options.get('depth'):
+        return ((file, None) for file in files)
+
+    if filter_options is None:
+        return iter_prefetched(files, read_filter=needs_reading, **prefetch_options)
+
+    def read_filter(file):
+        return needs_reading(file) and get_skip_reason(file, **filter_options) is None
+
+    return iter_prefetched(files, read_filter=read_filter, max_size=filter_options.get('max_size'), **prefetch_options)
+
+
+def analyze_file_batch(file_list: list = None, file_options: dict = None, timed: bool = False, prefetch_options: dict = None) -> list:
+    """Analyze a batch of files in a worker process.
+    :param file_list: {list}
+    :param file_options: {dict} - keyword arguments for analyze_file()
+    :param timed: {bool} - whether to return analyze_file_timed() tuples instead
+    :param prefetch_options: {dict} - optional, keyword arguments for iter_prefetched()
+    :returns counters_list: {list}
+    """
+    file_iter = iter_file_contents(file_list, prefetch_options, file_options.get('filter_options'))
+    if timed:
+        return [analyze_file_timed(file, content, **file_options) for file, content in file_iter]
+    return [analyze_file(file, content=content, **file_options) for file, content in file_iter]
+
+
+def iter_timed_results(file_list: list = None, result_list: list = None, metrics: RunMetrics = None):
+    """Record analyze_file_timed() results and yield the counters of each file.
+    :param file_list: {list}
+    :param result_list: {list} - of (counters, seconds, size) tuples
+    :param metrics: {RunMetrics}
+    :returns generator of (file, counters): {tuple}
+    """
+    for file, (counters, seconds, size) in zip(file_list, result_list):
+        metrics.add_input(file, seconds, size, counters['lines'])
+        yield file, counters
+
+
+def iter_batches(files=None, batch_size: int = BATCH_SIZE):
+    """Group the files into lists of at most batch_size files.
+    :param files: {iterable}
+    :param batch_size: {int}
+    :returns generator of batches: {list}
+    """
+    batch = []
+    for file in files:
+        batch.append(file)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_file_counters(files=None, workers: int = DEFAULT_WORKERS, file_options: dict = None, metrics: RunMetrics = None, prefetch_options: dict = None):
+    """Analyze the files and yield the counters of each one in order.
+    When more than one worker is requested, batches of files are
+    spread across a process pool.  Only a bounded number of batches
+    is in flight, so the files may come from a lazy generator.
+    With read-ahead, upcoming files are read on a thread pool while
+    the current one is classified, in each worker process.
+    :param files: {iterable}
+    :param workers: {int} - number of worker processes
+    :param file_options: {dict} - keyword arguments for analyze_file() e.g.: engine, mode
+    :param metrics: {RunMetrics} - optional, receives the time and size of each file
+    :param prefetch_options: {dict} - optional, keyword arguments for iter_prefetched() e.g.: depth, byte_budget
+    :returns generator of (file, counters): {tuple}
+    """
+    file_options = file_options or {}
+    timed = metrics is not None
+
+    if workers is None or workers <= 1:
+        for file, content in iter_file_contents(files, prefetch_options, file_options.get('filter_options')):
+            if timed:
+                yield from iter_timed_results([file], [analyze_file_timed(file, content, **file_options)], metrics)
+            else:
+                yield file, analyze_file(file, content=content, **file_options)
+        return
+
+    logging.info("Going to analyze files with '{}' workers".format(workers))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for batch in iter_batches(files):
+            pending.append((batch, executor.submit(analyze_file_batch, batch, file_options, timed, prefetch_options)))
+            if len(pending) >= workers * 2:
+                batch, future = pending.popleft()
+                yield from iter_timed_results(batch, future.result(), metrics) if timed else zip(batch, future.result())
+
+        while pending:
+            batch, future = pending.popleft()
+            yield from iter_timed_results(batch, future.result(), metrics) if timed else zip(batch, future.result())
+
+
+def analyze_file_list(file_list: list = None, workers: int = DEFAULT_WORKERS, file_options: dict = None, record_writer: RecordWriter = None, metrics: RunMetrics = None, prefetch_options: dict = None) -> dict:
+    """Analyze the files and sum up their counters.
+    :param file_list: {iterable}
+    :param workers: {int} - number of worker processes
+    :param file_options: {dict} - keyword arguments for analyze_file()
+    :param record_writer: {RecordWriter} - optional, receives each file as soon as it is analyzed
+    :param metrics: {RunMetrics} - optional, receives the time and size of each file
+    :param prefetch_options: {dict} - optional, keyword arguments for iter_prefetched()
+    :returns totals: {dict}
+    """
+    totals = new_counters()
+
+    for file, counters in iter_file_counters(file_list, workers, file_options, metrics, prefetch_options):
+        merge_counters(totals, counters)
+        if record_writer is not None:
+            record_writer.add_file(file, counters)
+
+    return totals
+
+
+def analyze_file_list_cached(file_list: list = None, workers: int = DEFAULT_WORKERS, cache_file: str = None, use_hash: bool = False, file_options: dict = None, record_writer: RecordWriter = None, metrics: RunMetrics = None, prefetch_options: dict = None) -> dict:
+    """Analyze only the new or changed files and rebuild the totals
+    from the per-file counters stored in the cache file.
+    :param file_list: {list}
+    :param workers: {int} - number of worker processes
+    :param cache_file: {str} - the SQLite cache file
+    :param use_hash: {bool} - whether to also key the entries on a content hash
+    :param file_options: {dict} - keyword arguments for analyze_file()
+    :param record_writer: {RecordWriter} - optional, receives every file once the cache is up to date
+    :param metrics: {RunMetrics} - optional, receives the time and size of each analyzed file
+    :param prefetch_options: {dict} - optional, keyword arguments for iter_prefetched()
+    :returns totals: {dict}
+    """
+    # sqlite3 is only imported by the runs that use a cache
+    from analysis_cache import AnalysisCache
+
+    file_options = file_options or {}
+    totals = new_counters()
+
+    # Counters from different modes are not interchangeable
+    version = '{}:{}'.format(CACHE_VERSION, file_options.get('mode', DEFAULT_MODE))
+
+    # Nor are the counters of archives analyzed with other member filters
+    if file_options.get('archive_options') is not None:
+        version += ':archives:' + json.dumps(file_options['archive_options'], sort_keys=True)
+
+    # Nor the counters of files skipped or not skipped by other filters
+    if file_options.get('filter_options') is not None:
+        version += ':skip:' + json.dumps(file_options['filter_options'], sort_keys=True)
+
+    with AnalysisCache(cache_file=cache_file, version=version, use_hash=use_hash) as cache:
+        stale_list = cache.get_stale_files(file_list)
+
+        for file, counters in iter_file_counters(stale_list, workers, file_options, metrics, prefetch_options):
+            cache.update(file, counters)
+
+        deleted_ctr = cache.commit()
+
+        removed_ctr = 0
+        for file in file_list:
+            counters = cache.get_counters(file)
+            if counters is None:
+                # Removed between the walk and the cache check
+                removed_ctr += 1
+                continue
+            merge_counters(totals, counters)
+            if record_writer is not None:
+                record_writer.add_file(file, counters)
+
+    reused_ctr = len(file_list) - len(stale_list) - removed_ctr
+    print("Analyzed '{}' new or changed files, reused '{}' cached results and dropped '{}' deleted files".format(len(stale_list), reused_ctr, deleted_ctr))
+    logging.info("Analyzed '{}' new or changed files, reused '{}' cached results and dropped '{}' deleted files".format(len(stale_list), reused_ctr, deleted_ctr))
+
+    return totals
+
+
+def format_report(totals: dict = None, indir=None, mode: str = DEFAULT_MODE) -> str:
+    """Format the summary report.
+    :param totals: {dict}
+    :param indir: {str|list} - a list of all roots for the consolidated report of a batch run
+    :param mode: {str} - the ast mode reports async functions and methods too
+    :returns report: {str}
+    """
+    content = []
+    content.append("## method-created: '{}'\n".format(os.path.abspath(__file__)))
+    content.append("## date-created: '{}'\n".format(DATE))
+    for root in (indir if isinstance(indir, list) else [indir]):
+        content.append("## indir: '{}'\n".format(root))
+    for name, label in REPORT_LABEL_LIST:
+        if name in AST_ONLY_COUNTER_NAMES and mode != 'ast':
+            continue
+        # Skipped files are only reported when there are any, so reports without skip filters are unchanged
+        if name in SKIP_COUNTER_NAMES.values() and totals[name] == 0:
+            continue
+        content.append("{}'{}'\n".format(label, totals[name]))
+
+    return ''.join(content)
+
+
+def write_report(totals: dict = None, indir=None, outfile: str = None, mode: str = DEFAULT_MODE) -> None:
+    """Write the summary report file.
+    The report is written next to the file and then renamed over it,
+    so a reader never sees a partially written report.
+    :param totals: {dict}
+    :param indir: {str|list} - see format_report()
+    :param outfile: {str}
+    :param mode: {str} - the ast mode reports async functions and methods too
+    """
+    tmpfile = outfile + '.tmp'
+    with open(tmpfile, 'w') as fh:
+        fh.write(format_report(totals, indir, mode))
+    os.replace(tmpfile, outfile)
+
+    print("Wrote summary report file '{}'".format(outfile))
+    logging.info("Wrote summary report file '{}'".format(outfile))
+
+
+def read_report(infile: str = None, mode: str = DEFAULT_MODE) -> dict:
+    """Read the totals back from a summary report file.
+    :param infile: {str}
+    :param mode: {str} - the mode the report must have been written in
+    :returns totals: {dict}
+    :raises ValueError: if a counter of the mode is missing from the report
+    """
+    totals = new_counters()
+    found_set = set()
+
+    with open(infile, 'r') as fh:
+        for line in fh:
+            line = line.rstrip('\n')
+            for name, label in REPORT_LABEL_LIST:
+                if line.startswith(label):
+                    totals[name] = int(line[len(label):].strip("'"))
+                    found_set.add(name)
+                    break
+
+    counter_names = get_counter_names(mode)
+    missing_list = [name for name in counter_names if name not in found_set]
+    if missing_list:
+        raise ValueError("report file '{}' has no '{}' counters".format(infile, "', '".join(missing_list)))
+
+    return totals
+
+
+def analyze_git_delta(indir: str = None, since: str = None, base_report: str = None, workers: int = DEFAULT_WORKERS, file_options: dict = None, include_list: list = None, exclude_list: list = None, use_gitignore: bool = False, metrics: RunMetrics = None, prefetch_options: dict = None) -> dict:
+    """Derive the totals from a baseline report and only the files git
+    reports as changed since the revision the baseline was made from.
+    Each changed file's counters at the revision are subtracted and its
+    current counters added, so the cost scales with the size of the diff.
+    :param indir: {str} - a directory inside a git checkout
+    :param since: {str} - the revision the base report describes
+    :param base_report: {str} - a summary report file of the tree at that revision
+    :param workers: {int} - number of worker processes for the current files
+    :param file_options: {dict} - keyword arguments for analyze_file()
+    :param include_list: {list} - globs a file must match
+    :param exclude_list: {list} - additional globs of files and directories to skip
+    :param use_gitignore: {bool} - whether to honor .gitignore files
+    :param metrics: {RunMetrics} - optional, receives the time and size of each current file
+    :param prefetch_options: {dict} - optional, keyword arguments for iter_prefetched()
+    :returns totals: {dict}
+    """
+    file_options = file_options or {}
+
+    totals = read_report(base_report, file_options.get('mode', DEFAULT_MODE))
+
+    with time_phase(metrics, 'git_diff'):
+        change_list = get_changed_files(indir, since, use_gitignore)
+
+    old_path_list = []
+    new_path_list = []
+    for status, relpath in change_list:
+        if not is_walked(indir, relpath, include_list, exclude_list, use_gitignore):
+            logging.info("Ignoring changed file '{}'".format(relpath))
+            continue
+        if status != STATUS_ADDED:
+            old_path_list.append(relpath)
+        if status != STATUS_DELETED:
+            new_path_list.append(relpath)
+
+    for relpath, content in time_iter(metrics, 'git_blobs', iter_blobs(indir, since, old_path_list)):
+        if content is None:
+            continue
+        counters = analyze_file(relpath, content=content, **file_options)
+        subtract_counters(totals, counters)
+
+    file_list = [os.path.join(indir, relpath) for relpath in new_path_list if os.path.isfile(os.path.join(indir, relpath))]
+    with time_phase(metrics, 'analyze'):
+        for file, counters in iter_file_counters(file_list, workers, file_options, metrics, prefetch_options):
+            merge_counters(totals, counters)
+
+    print("Applied the changes of '{}' files since '{}' to base report '{}'".format(len(set(old_path_list) | set(new_path_list)), since, base_report))
+    logging.info("Applied the changes of '{}' files since '{}' to base report '{}'".format(len(set(old_path_list) | set(new_path_list)), since, base_report))
+
+    return totals
+
+
+def drop_file_counters(file_counters: dict = None, totals: dict = None, path: str = None) -> int:
+    """Take a deleted file, or every file below a deleted or rescanned
+    directory, out of the live per-file counters and the totals.
+    :param file_counters: {dict} - file => counters
+    :param totals: {dict}
+    :param path: {str} - a file or a directory
+    :returns dropped_ctr: {int}
+    """
+    if path in file_counters:
+        subtract_counters(totals, file_counters.pop(path))
+        return 1
+
+    prefix = path + os.sep
+    file_list = [file for file in file_counters if file.startswith(prefix)]
+    for file in file_list:
+        subtract_counters(totals, file_counters.pop(file))
+
+    return len(file_list)
+
+
+def apply_changes(watcher=None, path_set: set = None, file_counters: dict = None, totals: dict = None, workers: int = DEFAULT_WORKERS, file_options: dict = None) -> int:
+    """Re-analyze only the changed paths and update the live per-file
+    counters and the totals in place.
+    :param watcher: {InotifyWatcher|PollingWatcher}
+    :param path_set: {set} - changed files and directories, see watcher.wait()
+    :param file_counters: {dict} - file => counters
+    :param totals: {dict}
+    :param workers: {int} - number of worker processes for rescanned directories
+    :param file_options: {dict} - keyword arguments for analyze_file()
+    :returns changed_ctr: {int} - the number of files added, changed or deleted
+    """
+    file_options = file_options or {}
+    changed_ctr = 0
     file_list = []
-    for path, subdirs, files in os.walk(indir):
-        for name in files:
-           file_ctr += 1
-           file_path = os.path.join(path, name)
-           if 'venv' in file_path or '.git' in file_path:
-               logging.info("Ignoring file '{}'".format(file_path))
-               continue
-           file_list.append(file_path)
 
-    print("Processed '{}' files in directory '{}'".format(file_ctr, indir))
-    return file_list
+    for path in sorted(path_set):
+        if os.path.isdir(path):
+            changed_ctr += drop_file_counters(file_counters, totals, path)
+            file_list.extend(watcher.scan(path))
+        elif os.path.isfile(path) and watcher.is_walked(path):
+            file_list.append(path)
+        else:
+            changed_ctr += drop_file_counters(file_counters, totals, path)
 
-def analyze_code(indir, outdir, outfile):
-    """Analyze the code files in the specified directory
-    and then generate a summary report.
+    # A file in a rescanned directory can also be reported on its own
+    file_list = list(dict.fromkeys(file_list))
+
+    # Starting a process pool would cost more than analyzing a few files
+    if len(file_list) <= BATCH_SIZE:
+        workers = 1
+
+    for file in file_list:
+        if file in file_counters:
+            subtract_counters(totals, file_counters.pop(file))
+
+    for file, counters in iter_file_counters(file_list, workers, file_options):
+        file_counters[file] = counters
+        merge_counters(totals, counters)
+
+    return changed_ctr + len(file_list)
+
+
+def watch_code(indir: str = None, outfile: str = None, workers: int = DEFAULT_WORKERS, file_options: dict = None, include_list: list = None, exclude_list: list = None, use_gitignore: bool = False, poll_interval: float = None, socket_path: str = None) -> None:
+    """Analyze the directory once and then keep the totals live,
+    re-analyzing only the files that change and rewriting the summary
+    report after each change.  Runs until interrupted or terminated.
     :param indir: {str}
-    :param outdir: {str}
     :param outfile: {str}
+    :param workers: {int} - number of worker processes for the initial scan
+    :param file_options: {dict} - keyword arguments for analyze_file()
+    :param include_list: {list} - globs a file must match
+    :param exclude_list: {list} - additional globs of files and directories to skip
+    :param use_gitignore: {bool} - whether to honor .gitignore files
+    :param poll_interval: {float} - poll every this many seconds instead of using inotify
+    :param socket_path: {str} - optional Unix domain socket to also serve the report on
     """
-    file_list = get_file_list(indir)
+    # The watchers need ctypes, select and socketserver, which no other run does
+    from analysis_watcher import get_watcher, PollingWatcher, ReportServer
 
-    code_file_ctr = 0
-    comment_ctr = 0
-    class_ctr = 0
-    todo_ctr = 0
-    init_file_ctr = 0
-    def_ctr = 0
-    import_ctr = 0
-    from_ctr = 0
-    line_ctr = 0
-    blank_line_ctr = 0
+    file_options = file_options or {}
+    mode = file_options.get('mode', DEFAULT_MODE)
 
-    for file in file_list:
-        logging.info("Going to analyze file '{}'".format(file))
+    with contextlib.ExitStack() as stack:
+        watcher = stack.enter_context(get_watcher(indir, include_list, exclude_list, use_gitignore, poll_interval))
 
-        if os.path.basename(file) == '__init__.py':
-            init_file_ctr += 1
-            continue
+        try:
+            file_counters = dict(iter_file_counters(watcher.scan(indir), workers, file_options))
+        except OSError as e:
+            # e.g.: the inotify watch limit was reached part way through the tree
+            logging.warning("Could not watch '{}' - going to poll instead: {}".format(indir, e))
+            print("Could not watch '{}' - going to poll instead: {}".format(indir, e))
+            watcher.close()
+            watcher = stack.enter_context(PollingWatcher(indir=indir, include_list=include_list, exclude_list=exclude_list, use_gitignore=use_gitignore))
+            file_counters = dict(iter_file_counters(watcher.scan(indir), workers, file_options))
+
+        totals = new_counters()
+        for counters in file_counters.values():
+            merge_counters(totals, counters)
+
+        server = None
+        if socket_path is not None:
+            server = stack.enter_context(ReportServer(socket_path=socket_path))
+            server.set_report(format_report(totals, indir, mode))
+
+        write_report(totals, indir, outfile, mode)
+
+        # Stop as cleanly on a SIGTERM from a service manager as on Ctrl-C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+        print("Watching '{}' files in directory '{}' - press Ctrl-C to stop".format(len(file_counters), indir))
+        logging.info("Watching '{}' files in directory '{}'".format(len(file_counters), indir))
 
-        code_file_ctr += 1
-        with open(file, 'r') as fh:
-            for line in fh:
-                line_ctr += 1
-                line = line.strip()
-                if re.match(r'^\s*$', line):
-                    blank_line_ctr += 1
+        try:
+            while True:
+                path_set = watcher.wait()
+                start_time = time.monotonic()
+
+                changed_ctr = apply_changes(watcher, path_set, file_counters, totals, workers, file_options)
+                if changed_ctr == 0:
                     continue
 
-                if re.match(r'^\s*class', line):
-                    class_ctr += 1
+                if server is not None:
+                    server.set_report(format_report(totals, indir, mode))
+                write_report(totals, indir, outfile, mode)
 
-                if re.match(r'^\s*#\s*TODO', line):
-                    todo_ctr += 1
+                elapsed_ms = (time.monotonic() - start_time) * 1000
+                print("Updated summary report file '{}' for '{}' changed files in '{:.1f}' ms".format(outfile, changed_ctr, elapsed_ms))
+                logging.info("Updated summary report file '{}' for '{}' changed files in '{:.1f}' ms".format(outfile, changed_ctr, elapsed_ms))
+        except KeyboardInterrupt:
+            print("Stopped watching directory '{}'".format(indir))
+            logging.info("Stopped watching directory '{}'".format(indir))
 
-                if re.match(r'^\s*def\s+', line):
-                    def_ctr += 1
 
-                if re.match(r'^import', line):
-                    import_ctr += 1
+def analyze_archive(archive: str = None, file_options: dict = None, record_writer: RecordWriter = None) -> dict:
+    """Analyze the files in an archive and sum up their counters.
+    :param archive: {str}
+    :param file_options: {dict} - keyword arguments for analyze_file(), including archive_options
+    :param record_writer: {RecordWriter} - optional, receives each member as soon as it is analyzed
+    :returns totals: {dict}
+    :raises ValueError: if the archive cannot be read
+    """
+    totals = new_counters()
+    member_ctr = 0
 
-                if re.match(r'^from', line):
-                    from_ctr += 1
+    for path, counters in iter_archive_counters(archive, **file_options):
+        member_ctr += 1
+        merge_counters(totals, counters)
+        if record_writer is not None:
+            record_writer.add_file(path, counters)
 
-                if re.match(r'^\s*#', line):
-                    comment_ctr += 1
+    print("Processed '{}' files in archive '{}'".format(member_ctr, archive))
+    logging.info("Processed '{}' files in archive '{}'".format(member_ctr, archive))
 
+    return totals
 
-    with open(outfile, 'w') as fh:
-        fh.write("## method-created: '{}'\n".format(os.path.abspath(__file__)))
-        fh.write("## date-created: '{}'\n".format(DATE))
-        fh.write("## indir: '{}'\n".format(indir))
-        fh.write("code files: '{}'\n".format(code_file_ctr))
-        fh.write("__init__.py files: '{}'\n".format(init_file_ctr))
-        fh.write("comments '{}'\n".format(comment_ctr))
-        fh.write("classes: '{}'\n".format(class_ctr))
-        fh.write("TODOs: '{}'\n".format(todo_ctr))
-        fh.write("functions: '{}'\n".format(def_ctr))
-        fh.write("imports: '{}'\n".format(import_ctr))
-        fh.write("from imports: '{}'\n".format(from_ctr))
-        fh.write("lines: '{}'\n".format(line_ctr))
-        fh.write("blank lines: '{}'\n".format(blank_line_ctr))
 
-    print("Wrote summary report file '{}'".format(outfile))
-    logging.info("Wrote summary report file '{}'".format(outfile))
+def read_root_list(infile: str = None) -> list:
+    """Read the roots of a batch run from a file, one per line.
+    Blank lines and lines starting with '#' are ignored.
+    :param infile: {str}
+    :returns root_list: {list}
+    """
+    root_list = []
+    with open(infile, 'r') as fh:
+        for line in fh:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                root_list.append(line)
+    return root_list
+
+
+def get_root_report_files(outfile: str = None, root_list: list = None) -> list:
+    """Name the report of each root of a batch run after the root,
+    next to the consolidated report, e.g.: report.myrepo.txt for root
+    /src/myrepo and report file report.txt.  Roots with the same name
+    get a numbered suffix.
+    :param outfile: {str} - the consolidated report file
+    :param root_list: {list}
+    :returns report_file_list: {list} - in root order
+    """
+    base, extension = os.path.splitext(outfile)
+    name_ctr = collections.Counter()
+    report_file_list = []
+
+    for root in root_list:
+        name = os.path.basename(os.path.normpath(root))
+        name_ctr[name] += 1
+        if name_ctr[name] > 1:
+            name = '{}-{}'.format(name, name_ctr[name])
+        report_file_list.append('{}.{}{}'.format(base, name, extension))
+
+    return report_file_list
+
+
+def analyze_roots(root_list: list = None, outfile: str = None, workers: int = DEFAULT_WORKERS, file_options: dict = None, include_list: list = None, exclude_list: list = None, use_gitignore: bool = False, metrics: RunMetrics = None, prefetch_options: dict = None) -> dict:
+    """Analyze many roots in one run with a single worker pool, writing
+    the report of each root as soon as it is done.
+    The files of all roots go through the same stream of batches, so a
+    huge root is spread across all the workers like any other, rather
+    than one process grinding through it while the others sit idle.
+    :param root_list: {list} - directories, or archives when file_options has archive_options
+    :param outfile: {str} - the consolidated report file, see get_root_report_files() for the others
+    :param workers: {int} - number of worker processes shared by all roots
+    :param file_options: {dict} - keyword arguments for analyze_file()
+    :param include_list: {list} - globs a file must match
+    :param exclude_list: {list} - additional globs of files and directories to skip
+    :param use_gitignore: {bool} - whether to honor .gitignore files
+    :param metrics: {RunMetrics} - optional, receives the time and size of each file
+    :param prefetch_options: {dict} - optional, keyword arguments for iter_prefetched()
+    :returns totals: {dict} - of all roots
+    """
+    file_options = file_options or {}
+    mode = file_options.get('mode', DEFAULT_MODE)
+    report_file_list = get_root_report_files(outfile, root_list)
+    root_totals_list = [new_counters() for _ in root_list]
+
+    # The root of each file handed out, in the order the results come back
+    root_index_queue = collections.deque()
+
+    def iter_root_files():
+        for i, root in enumerate(root_list):
+            # An archive root is analyzed as a whole by one worker
+            file_iter = iter_file_list(root, include_list, exclude_list, use_gitignore) if os.path.isdir(root) else [root]
+            for file in file_iter:
+                root_index_queue.append(i)
+                yield file
+
+    done_ctr = 0
+
+    def write_root_reports(end_index):
+        nonlocal done_ctr
+        while done_ctr < end_index:
+            with time_phase(metrics, 'write_report'):
+                write_report(root_totals_list[done_ctr], root_list[done_ctr], report_file_list[done_ctr], mode)
+            done_ctr += 1
+
+    with time_phase(metrics, 'analyze'):
+        file_iter = time_iter(metrics, 'walk', iter_root_files())
+        for file, counters in iter_file_counters(file_iter, workers, file_options, metrics, prefetch_options):
+            i = root_index_queue.popleft()
+            merge_counters(root_totals_list[i], counters)
+            # The roots are walked one after the other, so every root before this one is done
+            write_root_reports(i)
+
+    write_root_reports(len(root_list))
+
+    totals = new_counters()
+    for root_totals in root_totals_list:
+        merge_counters(totals, root_totals)
+
+    print("Analyzed '{}' roots".format(len(root_list)))
+    logging.info("Analyzed '{}' roots".format(len(root_list)))
+
+    return totals
+
+
+def analyze_code(indir, outdir, outfile, workers=DEFAULT_WORKERS, cache_file=None, use_hash=False, include_list=None, exclude_list=None, use_gitignore=False, engine=DEFAULT_ENGINE, mode=DEFAULT_MODE, records_file=None, record_format=DEFAULT_RECORD_FORMAT, since=None, base_report=None, watch=False, poll_interval=None, socket_path=None, metrics=None, prefetch_options=None, archives=False, filter_options=None):
+    """Analyze the code files in the specified directory
+    and then generate a summary report.
+    :param indir: {str|list} - a list of roots for a batch run, see analyze_roots()
+    :param outdir: {str}
+    :param outfile: {str}
+    :param workers: {int} - number of worker processes
+    :param cache_file: {str} - optional SQLite cache of per-file counters
+    :param use_hash: {bool} - whether to also key the cache on a content hash
+    :param include_list: {list} - globs a file must match
+    :param exclude_list: {list} - additional globs of files and directories to skip
+    :param use_gitignore: {bool} - whether to honor .gitignore files
+    :param engine: {str} - 'text' or 'bytes', see analyze_file()
+    :param mode: {str} - 'regex' or 'ast', see analyze_file()
+    :param records_file: {str} - optional file to stream per-file records and rollups to
+    :param record_format: {str} - 'jsonl' or 'csv'
+    :param since: {str} - optional revision; with base_report only the files changed since are analyzed
+    :param base_report: {str} - the summary report of the tree at the since revision
+    :param watch: {bool} - whether to keep the report up to date until interrupted
+    :param poll_interval: {float} - with watch, poll every this many seconds instead of using inotify
+    :param socket_path: {str} - with watch, also serve the report on this Unix domain socket
+    :param metrics: {RunMetrics} - optional, receives the phase timings and the time and size of each file
+    :param prefetch_options: {dict} - optional, keyword arguments for iter_prefetched() e.g.: depth, byte_budget
+    :param archives: {bool} - whether to analyze the files inside archives instead of the archives; implied when indir is an archive
+    :param filter_options: {dict} - optional, keyword arguments for file_filter.get_skip_reason() e.g.: skip_binary, skip_generated, max_size
+    """
+    file_options = {'engine': engine, 'mode': mode}
+
+    if filter_options is not None:
+        file_options['filter_options'] = filter_options
+
+    root_list = indir if isinstance(indir, list) else [indir]
+
+    if archives or any(os.path.isfile(root) for root in root_list):
+        file_options['archive_options'] = {'include_list': include_list, 'exclude_list': exclude_list}
+        if include_list:
+            # The archives must be found even when the globs only match their members
+            include_list = list(include_list) + ARCHIVE_GLOB_LIST
+
+    if isinstance(indir, list):
+        totals = analyze_roots(root_list, outfile, workers, file_options, include_list, exclude_list, use_gitignore, metrics, prefetch_options)
+        with time_phase(metrics, 'write_report'):
+            write_report(totals, root_list, outfile, mode)
+        return
+
+    if watch:
+        watch_code(indir, outfile, workers, file_options, include_list, exclude_list, use_gitignore, poll_interval, socket_path)
+        return
+
+    if since is not None:
+        totals = analyze_git_delta(indir, since, base_report, workers, file_options, include_list, exclude_list, use_gitignore, metrics, prefetch_options)
+        with time_phase(metrics, 'write_report'):
+            write_report(totals, indir, outfile, mode)
+        return
+
+    with contextlib.ExitStack() as stack:
+        record_writer = None
+        if records_file is not None:
+            counter_names = get_counter_names(mode, filter_options is not None)
+            record_writer = stack.enter_context(RecordWriter(outfile=records_file, indir=indir, counter_names=counter_names, record_format=record_format))
+
+        if os.path.isfile(indir):
+            with time_phase(metrics, 'analyze'):
+                totals = analyze_archive(indir, file_options, record_writer)
+        elif cache_file is not None:
+            with time_phase(metrics, 'walk'):
+                file_list = get_file_list(indir, include_list, exclude_list, use_gitignore)
+            with time_phase(metrics, 'analyze'):
+                totals = analyze_file_list_cached(file_list, workers, cache_file, use_hash, file_options, record_writer, metrics, prefetch_options)
+        else:
+            # Analysis starts while the directory tree is still being walked
+            with time_phase(metrics, 'analyze'):
+                file_iter = time_iter(metrics, 'walk', iter_file_list(indir, include_list, exclude_list, use_gitignore))
+                totals = analyze_file_list(file_iter, workers, file_options, record_writer, metrics, prefetch_options)
+
+    with time_phase(metrics, 'write_report'):
+        write_report(totals, indir, outfile, mode)
 
 
 @click.command()
 @click.option('--outdir', help='The output directory - default is {}'.format(DEFAULT_OUTDIR))
 @click.option('--outfile', help='The output file - if not specified a default will be assigned')
-@click.option('--indir', help="'The input directory - default is the current working directory {}".format(DEFAULT_INDIR))
+@click.option('--indir', multiple=True, help="'The input directory - default is the current working directory {} - may be repeated to analyze many roots in one run".format(DEFAULT_INDIR))
+@click.option('--indir-list', help="A file listing input directories or archives to analyze in one run, one per line")
 @click.option('--logfile', help="The log file - if not is specified a default will be assigned")
 @click.option('--verbose', is_flag=True, help="Whether to execute in verbose mode - default is {}".format(DEFAULT_VERBOSE))
-def main(outdir, outfile, indir, logfile, verbose):
+@click.option('--workers', type=int, help="The number of worker processes - default is the CPU count {}".format(DEFAULT_WORKERS))
+@click.option('--cache', help="The SQLite cache file of per-file counters - only new or changed files are analyzed when specified")
+@click.option('--cache-hash', is_flag=True, help="Whether to also key the cache entries on a SHA-256 content hash")
+@click.option('--include', multiple=True, help="Only analyze files matching this glob e.g.: '*.py' - may be repeated")
+@click.option('--exclude', multiple=True, help="Skip files and directories matching this glob - may be repeated; .git, venv, node_modules and the like are always skipped")
+@click.option('--gitignore', is_flag=True, help="Whether to skip the files ignored by .gitignore files")
+@click.option('--engine', type=click.Choice(ENGINE_LIST), help="The counting engine - 'bytes' bulk-reads each file and tolerates non-UTF-8 content - default is {}".format(DEFAULT_ENGINE))
+@click.option('--mode', type=click.Choice(MODE_LIST), help="The analysis mode - 'ast' parses each Python file for exact counts - default is {}".format(DEFAULT_MODE))
+@click.option('--records', help="Stream one record per file, then rollups by directory and package, to this file")
+@click.option('--records-format', type=click.Choice(RECORD_FORMAT_LIST), help="The format of the --records file - default is {}".format(DEFAULT_RECORD_FORMAT))
+@click.option('--since', help="A git revision - only the files changed since are analyzed and applied to --base-report")
+@click.option('--base-report', help="The summary report of the tree at the --since revision")
+@click.option('--watch', is_flag=True, help="Keep running and rewrite the report within moments of any file change")
+@click.option('--poll-interval', type=float, help="With --watch, poll for changes every this many seconds instead of using inotify")
+@click.option('--serve', help="With --watch, also serve the report on this Unix domain socket")
+@click.option('--metrics', '--profile', 'metrics', is_flag=True, help="Whether to write the phase timings, throughput, peak memory and slowest files to a .metrics.json file next to the report")
+@click.option('--prefetch', type=int, help="Read this many upcoming files ahead on a thread pool, e.g.: on network filesystems - default is 0, no read-ahead")
+@click.option('--prefetch-mb', type=int, help="The most megabytes read ahead at any time with --prefetch - default is {}".format(DEFAULT_BYTE_BUDGET // (1024 * 1024)))
+@click.option('--archives', is_flag=True, help="Whether to analyze the files inside .zip, .whl, .tar.gz and other archives instead of the archive files - implied when --indir is an archive")
+@click.option('--skip-binary', is_flag=True, help="Whether to skip images, compiled files and other binary files, by extension or a NUL byte in their first block")
+@click.option('--skip-generated', is_flag=True, help="Whether to skip lockfiles, minified files and files marked '@generated' or 'DO NOT EDIT'")
+@click.option('--max-file-mb', type=float, help="Skip files larger than this many megabytes - default is no limit")
+def main(outdir, outfile, indir, indir_list, logfile, verbose, workers, cache, cache_hash, include, exclude, gitignore, engine, mode, records, records_format, since, base_report, watch, poll_interval, serve, metrics, prefetch, prefetch_mb, archives, skip_binary, skip_generated, max_file_mb):
     """Analyze the code-base in the specified directory and generate a summary report
     """
 
     error_ctr = 0
 
+    if since is not None and base_report is None:
+        print(Fore.RED + "--base-report must be specified with --since")
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if base_report is not None and since is None:
+        print(Fore.RED + "--since must be specified with --base-report")
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if since is not None and (cache is not None or records is not None):
+        print(Fore.RED + "--since cannot be combined with --cache or --records")
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if watch and (since is not None or cache is not None or records is not None or metrics):
+        print(Fore.RED + "--watch cannot be combined with --since, --cache, --records or --metrics")
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if not watch and (poll_interval is not None or serve is not None):
+        print(Fore.RED + "--poll-interval and --serve can only be specified with --watch")
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if serve is not None and os.path.lexists(serve) and not stat.S_ISSOCK(os.lstat(serve).st_mode):
+        print(Fore.RED + "--serve '{}' exists and is not a socket".format(serve))
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if prefetch_mb is not None and prefetch is None:
+        print(Fore.RED + "--prefetch-mb can only be specified with --prefetch")
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if prefetch is not None and prefetch < 0:
+        print(Fore.RED + "--prefetch must be at least 0 but was '{}'".format(prefetch))
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if prefetch_mb is not None and prefetch_mb < 1:
+        print(Fore.RED + "--prefetch-mb must be at least 1 but was '{}'".format(prefetch_mb))
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if max_file_mb is not None and max_file_mb <= 0:
+        print(Fore.RED + "--max-file-mb must be greater than 0 but was '{}'".format(max_file_mb))
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if poll_interval is not None and poll_interval <= 0:
+        print(Fore.RED + "--poll-interval must be greater than 0 but was '{}'".format(poll_interval))
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if base_report is not None and not os.path.exists(base_report):
+        print(Fore.RED + "base report '{}' does not exist".format(base_report))
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
     if error_ctr > 0:
         print(Fore.RED + "Required command-line arguments were not specified")
         print(Style.RESET_ALL + '', end='')
@@ -171,18 +1352,112 @@ def main(outdir, outfile, indir, logfile, verbose):
 
     assert isinstance(outfile, str)
 
-    if indir is None:
+    root_list = list(indir)
+    if indir_list is not None:
+        if not os.path.isfile(indir_list):
+            print(Fore.RED + "--indir-list '{}' does not exist".format(indir_list))
+            print(Style.RESET_ALL + '', end='')
+            sys.exit(1)
+        root_list.extend(read_root_list(indir_list))
+
+    if not root_list:
         indir = DEFAULT_INDIR
         print(Fore.YELLOW + "--indir was not specified and therefore was set to default '{}'".format(indir))
         print(Style.RESET_ALL + '', end='')
+    elif len(root_list) == 1:
+        indir = root_list[0]
+    else:
+        indir = root_list
+        error_ctr = 0
+        for root in root_list:
+            if not os.path.isdir(root) and not (os.path.isfile(root) and is_archive(root)):
+                print(Fore.RED + "root '{}' is neither a directory nor a known archive".format(root))
+                print(Style.RESET_ALL + '', end='')
+                error_ctr += 1
+        if since is not None or watch or cache is not None or records is not None:
+            print(Fore.RED + "--since, --watch, --cache and --records cannot be used with more than one root")
+            print(Style.RESET_ALL + '', end='')
+            error_ctr += 1
+        if error_ctr > 0:
+            sys.exit(1)
+
+    if isinstance(indir, str) and os.path.isfile(indir):
+        if not is_archive(indir):
+            print(Fore.RED + "--indir '{}' is a file but not a known archive".format(indir))
+            print(Style.RESET_ALL + '', end='')
+            sys.exit(1)
+        if since is not None or watch or cache is not None:
+            print(Fore.RED + "--since, --watch and --cache cannot be used when --indir is an archive")
+            print(Style.RESET_ALL + '', end='')
+            sys.exit(1)
+
+    if workers is None:
+        workers = DEFAULT_WORKERS
+        print(Fore.YELLOW + "--workers was not specified and therefore was set to default '{}'".format(workers))
+        print(Style.RESET_ALL + '', end='')
 
-    assert isinstance(indir, str)
+    assert isinstance(workers, int)
+
+    if engine is None:
+        engine = DEFAULT_ENGINE
+        print(Fore.YELLOW + "--engine was not specified and therefore was set to default '{}'".format(engine))
+        print(Style.RESET_ALL + '', end='')
+
+    assert isinstance(engine, str)
+
+    if mode is None:
+        mode = DEFAULT_MODE
+        print(Fore.YELLOW + "--mode was not specified and therefore was set to default '{}'".format(mode))
+        print(Style.RESET_ALL + '', end='')
+
+    assert isinstance(mode, str)
+
+    if records is not None and records_format is None:
+        records_format = DEFAULT_RECORD_FORMAT
+        print(Fore.YELLOW + "--records-format was not specified and therefore was set to default '{}'".format(records_format))
+        print(Style.RESET_ALL + '', end='')
+
+    if workers < 1:
+        print(Fore.RED + "--workers must be at least 1 but was '{}'".format(workers))
+        print(Style.RESET_ALL + '', end='')
+        sys.exit(1)
 
     logging.basicConfig(filename=logfile,
                     format=LOGGING_FORMAT,
                     level=LOG_LEVEL)
 
-    analyze_code(indir, outdir, outfile)
+    prefetch_options = None
+    if prefetch:
+        if prefetch_mb is None:
+            prefetch_mb = DEFAULT_BYTE_BUDGET // (1024 * 1024)
+            print(Fore.YELLOW + "--prefetch-mb was not specified and therefore was set to default '{}'".format(prefetch_mb))
+            print(Style.RESET_ALL + '', end='')
+        prefetch_options = {'depth': prefetch, 'byte_budget': prefetch_mb * 1024 * 1024}
+
+    filter_options = None
+    if skip_binary or skip_generated or max_file_mb is not None:
+        max_size = int(max_file_mb * 1024 * 1024) if max_file_mb is not None else None
+        filter_options = {'skip_binary': skip_binary, 'skip_generated': skip_generated, 'max_size': max_size}
+
+    run_metrics = None
+    if metrics:
+        run_metrics = RunMetrics(tool=infile_basename)
+
+    try:
+        analyze_code(indir, outdir, outfile, workers, cache, cache_hash, list(include), list(exclude), gitignore, engine, mode, records, records_format, since, base_report, watch, poll_interval, serve, run_metrics, prefetch_options, archives, filter_options)
+    except subprocess.CalledProcessError as e:
+        logging.error("git failed: {}".format(e.stderr.decode(errors='replace').strip()))
+        print(Fore.RED + "git failed: {}".format(e.stderr.decode(errors='replace').strip()))
+        print(Style.RESET_ALL + '', end='')
+        sys.exit(1)
+    except ValueError as e:
+        logging.error(str(e))
+        print(Fore.RED + str(e))
+        print(Style.RESET_ALL + '', end='')
+        sys.exit(1)
+
+    if run_metrics is not None:
+        run_metrics.write(get_metrics_file(outfile))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,512 @@
+import os
+import logging
+import xml.etree.ElementTree as ET
+
+from code_templates import render_template
+
+
+class FunctionSpec():
+    '''The spec of one function or method: its name, type, parameters
+    and return type.  generate_function() renders it into source in
+    memory, e.g.:
+        spec = FunctionSpec(function_name='convert')
+        spec.add_parameter('infile', 'str', 'None', 'the input file')
+        source = generate_function(spec)
+    '''
+
+    def __init__(self, **kwargs):
+        '''Class constructor
+        :param function_name: {str}
+        :param function_type: {str} - 'function' or 'method' - default is 'function'
+        :param return_type: {str} - default is 'None'
+        :param parameters: {list} - optional, of dicts with name, datatype, default and description
+        '''
+
+        self.function_name = kwargs['function_name']
+        self.function_type = kwargs.get('function_type', 'function')
+        self.return_type = kwargs.get('return_type', 'None')
+        self.parameter_list = []
+        self.parameter_lookup = {}
+
+        for parameter in kwargs.get('parameters', []):
+            self.add_parameter(parameter['name'], parameter['datatype'], parameter.get('default', 'None'), parameter.get('description', ''))
+
+    @classmethod
+    def from_lines(cls, lines=None, name: str = None):
+        '''Parse a spec in the function_name:/param: line format
+        :param lines: {iterable} - e.g.: an open file handle
+        :param name: {str} - the name of the spec, for messages
+        :returns spec: {FunctionSpec}
+        :raises ValueError: if the spec has no function_name or a malformed param line
+        '''
+        function_name, function_type, parameter_list, parameter_lookup, return_type, _ = parse_function_spec(lines, name)
+        if not function_name:
+            raise ValueError("spec '{}' has no function_name".format(name))
+
+        spec = cls(function_name=function_name, function_type=function_type, return_type=return_type)
+        spec.parameter_list = parameter_list
+        spec.parameter_lookup = parameter_lookup
+        return spec
+
+    @classmethod
+    def from_record(cls, record: dict = None):
+        '''Parse a JSON function spec record, see parse_function_record()
+        :param record: {dict}
+        :returns spec: {FunctionSpec}
+        :raises ValueError: if the record is not a function spec
+        '''
+        function_name, function_type, parameter_list, parameter_lookup, return_type = parse_function_record(record)
+
+        spec = cls(function_name=function_name, function_type=function_type, return_type=return_type)
+        spec.parameter_list = parameter_list
+        spec.parameter_lookup = parameter_lookup
+        return spec
+
+    def add_parameter(self, name: str = None, datatype: str = None, default: str = 'None', description: str = '') -> None:
+        '''Add a parameter; one that was already added is ignored, like a repeated param: line
+        :param name: {str}
+        :param datatype: {str}
+        :param default: {str}
+        :param description: {str}
+        '''
+        if name in self.parameter_lookup:
+            logging.warning("parameter '{}' was already encountered - going to ignore it now".format(name))
+            return
+
+        self.parameter_list.append(name)
+        self.parameter_lookup[name] = {'datatype': datatype, 'default': default, 'description': description}
+
+
+class ClassSpec():
+    '''The spec of one class: the package path of the class, its
+    description, base class, imports, attributes and method signatures.
+    generate_class() renders it into the source of its module in memory.
+    '''
+
+    def __init__(self, **kwargs):
+        '''Class constructor
+        :param package_name: {str} - e.g.: some.package.module.ClassName
+        :param class_desc: {str} - default is 'INSERT CLASS DESCRIPTION HERE'
+        :param inherits_from_class: {str} - optional, e.g.: some.package.namespace.Converter
+        :param import_list: {list} - optional, e.g.: ['import os']
+        :param attribute_list: {list} - optional
+        :param method_list: {list} - optional, e.g.: ['convert(infile: str = None) -> None']
+        :param is_singleton: {bool} - default is False
+        '''
+
+        self.package_name = kwargs['package_name']
+        self.class_desc = kwargs.get('class_desc', 'INSERT CLASS DESCRIPTION HERE')
+        self.inherits_from_class = kwargs.get('inherits_from_class')
+        self.import_list = kwargs.get('import_list', [])
+        self.attribute_list = kwargs.get('attribute_list', [])
+        self.method_list = kwargs.get('method_list', [])
+        self.is_singleton = kwargs.get('is_singleton', False)
+
+    @classmethod
+    def from_panel(cls, content: str = None):
+        '''Parse the text of an Umlet class panel
+        :param content: {str} - the panel_attributes text
+        :returns spec: {ClassSpec}
+        '''
+        package_name, class_desc, inherits_from_class, import_list, attribute_list, method_list, is_singleton, _ = parse_panel(content)
+        return cls(package_name=package_name, class_desc=class_desc, inherits_from_class=inherits_from_class,
+                   import_list=import_list, attribute_list=attribute_list, method_list=method_list, is_singleton=is_singleton)
+
+    def get_outfile(self) -> str:
+        '''Get the module file of the class, relative to the directory the packages are created in
+        :returns outfile: {str} - e.g.: some/package/module.py
+        '''
+        return get_class_outfile(self.package_name)[1]
+
+
+def parse_function_spec(lines=None, infile: str = None) -> tuple:
+    """Parse the lines of one function spec
+    :param lines: {iterable} - e.g.: an open file handle
+    :param infile: {str} - the name of the spec, for messages
+    :returns (function_name, function_type, parameter_list, parameter_lookup, return_type, line_ctr): {tuple}
+    :raises ValueError: if the function_name is not an identifier or a param line has fewer than four fields
+    """
+    function_name = None
+    function_type = None
+    return_type = None
+    parameter_list = []
+    parameter_lookup = {}
+
+    line_ctr = 0
+
+    for line in lines:
+
+        line_ctr += 1
+
+        line = line.strip()
+
+        if line.startswith('#'):
+            continue
+        if line.startswith('function_name:'):
+            function_name = line.replace('function_name:', '')
+            # The name becomes <function_name>.py in the output directory, so it must not be a path
+            if function_name != '' and not function_name.isidentifier():
+                raise ValueError("function_name '{}' at line '{}' of '{}' is not a Python identifier".format(function_name, line_ctr, infile))
+            continue
+        if line.startswith('function_type:'):
+            function_type = line.replace('function_type:', '')
+            continue
+        if line.startswith('return_type:'):
+            return_type = line.replace('return_type:', '')
+            continue
+        if line.startswith('param:'):
+            logging.info("Found param line '{}'".format(line))
+            param = line.replace('param:', '')
+            parts = param.split(':')
+            if len(parts) < 4:
+                raise ValueError("param line '{}' of '{}' is not name:datatype:default:description".format(line_ctr, infile))
+            param_name = parts[0]
+            datatype = parts[1]
+            default = parts[2]
+            desc = parts[3]
+            logging.info("Found param '{}' datatype '{}' default '{}' description '{}'".format(param_name, datatype, default, desc))
+            if param_name in parameter_lookup:
+                logging.warning("parameter '{}' was already encountered - going to ignore it now".format(param_name))
+                print("parameter '{}' was already encountered - going to ignore it now".format(param_name))
+                continue
+            else:
+                parameter_lookup[param_name] = {}
+                parameter_list.append(param_name)
+            parameter_lookup[param_name]['datatype'] = datatype
+            parameter_lookup[param_name]['default'] = default
+            parameter_lookup[param_name]['description'] = desc
+
+    return function_name, function_type, parameter_list, parameter_lookup, return_type, line_ctr
+
+
+def parse_function_record(record: dict = None) -> tuple:
+    """Parse one JSONL function spec record, e.g.:
+    {"function_name": "convert", "function_type": "function", "return_type": "None",
+     "parameters": [{"name": "infile", "datatype": "str", "default": "None", "description": "the input file"}]}
+    function_type defaults to 'function', return_type to 'None', and the
+    default and description of a parameter to 'None' and ''.
+    :param record: {dict} - the decoded JSON line
+    :returns (function_name, function_type, parameter_list, parameter_lookup, return_type): {tuple}
+    :raises ValueError: if the record is not a function spec
+    """
+    if not isinstance(record, dict):
+        raise ValueError("record is a JSON {} and not an object".format(type(record).__name__))
+
+    function_name = record.get('function_name')
+    if not isinstance(function_name, str) or function_name == '':
+        raise ValueError("record has no function_name")
+    if not function_name.isidentifier():
+        raise ValueError("function_name '{}' is not a Python identifier".format(function_name))
+
+    parameters = record.get('parameters', [])
+    if not isinstance(parameters, list):
+        raise ValueError("parameters of function '{}' is not a list".format(function_name))
+
+    parameter_list = []
+    parameter_lookup = {}
+
+    for n, parameter in enumerate(parameters, 1):
+        if not isinstance(parameter, dict) or not parameter.get('name') or not parameter.get('datatype'):
+            raise ValueError("parameter '{}' of function '{}' has no name or datatype".format(n, function_name))
+
+        param_name = str(parameter['name'])
+        if param_name in parameter_lookup:
+            logging.warning("parameter '{}' was already encountered - going to ignore it now".format(param_name))
+            continue
+
+        parameter_list.append(param_name)
+        parameter_lookup[param_name] = {
+            'datatype': str(parameter['datatype']),
+            'default': str(parameter.get('default', 'None')),
+            'description': str(parameter.get('description', '')),
+        }
+
+    return function_name, str(record.get('function_type', 'function')), parameter_list, parameter_lookup, str(record.get('return_type', 'None'))
+
+
+def render_function(function_name, function_type, parameter_list, parameter_lookup, return_type) -> str:
+    """Render the function code with the compiled 'function' template
+    :param function_name: {str}
+    :param function_type: {str}
+    :param parameter_list: {list}
+    :param parameter_lookup: {dict}
+    :param return_type: {str}
+    :returns content: {str}
+    """
+    formatted_params = ", ".join('{}: {} = {}'.format(parameter_name, parameter_lookup[parameter_name]['datatype'], parameter_lookup[parameter_name]['default']) for parameter_name in parameter_list)
+
+    return render_template('function', {
+        'function_name': function_name,
+        'function_type': function_type,
+        'formatted_params': formatted_params,
+        'parameter_list': parameter_list,
+        'parameter_lookup': parameter_lookup,
+        'return_type': return_type,
+    })
+
+
+def iter_panel_attributes(infile=None):
+    """Stream the text of the panel_attributes elements of the class panels.
+    Each text is yielded as soon as its element is parsed, and every
+    top-level element of the diagram is dropped once it is complete, so
+    memory stays flat however large the diagram is.
+    :param infile: {str|file} - the .uxf file or an open file object of its XML
+    :returns generator of {str} - in document order
+    """
+    context = iter(ET.iterparse(infile, events=('start', 'end')))
+    _, root = next(context)
+    depth = 1
+
+    for event, element in context:
+        if event == 'start':
+            depth += 1
+            continue
+
+        depth -= 1
+        if element.tag == 'panel_attributes':
+            yield element.text
+
+        if depth == 1:
+            # The element directly below <diagram> is complete
+            root.clear()
+
+
+def parse_panel(content: str = None) -> tuple:
+    """Parse the text of one class panel
+    :param content: {str} - the panel_attributes text
+    :returns (package_name, class_desc, inherits_from_class, import_list, attribute_list, method_list, is_singleton, line_ctr): {tuple}
+    """
+    package_name = None
+    class_desc = 'INSERT CLASS DESCRIPTION HERE'
+    import_list = []
+    attribute_list = []
+    method_list = []
+    inherits_from_class = None
+    is_singleton = False
+    
+    in_attribute_section = False
+    in_method_section = False
+
+    line_ctr = 0
+
+    for line in content.split("\n"):
+        line_ctr += 1
+        line = line.strip()
+        if line_ctr == 1:
+            package_name = line
+            logging.info("Found package name '{}'".format(package_name))
+            continue
+        if line.startswith('//singleton'):
+            is_singleton = True
+            logging.info("Found indication that this class is a singleton")
+            continue
+        if line.startswith('//desc:'):
+            class_desc = line.replace('//desc:', '')
+            logging.info("Found class description '{}'".format(class_desc))
+            continue
+        if line.startswith('//inherits:'):
+            inherits_from_class = line.replace('//inherits:', '')
+            logging.info("Found inherits '{}'".format(inherits_from_class))
+            continue
+        if line.startswith('//import') or line.startswith('//from'):
+            line = line.replace('//', '')
+            logging.info("Found import '{}'".format(line))
+            import_list.append(line)
+            continue
+        if line.startswith('--'):
+            if in_attribute_section:
+                logging.info("Found method section")
+                in_method_section = True
+                in_attribute_section = False
+            else:
+                logging.info("Found attribute section")
+                in_attribute_section = True
+                in_method_section = False
+            continue
+        if in_attribute_section:
+            attribute_list.append(line)
+            logging.info("Found attribute '{}'".format(line))
+            continue
+        elif in_method_section:
+            if len(line) > 5:
+                method_list.append(line)
+                logging.info("Found method '{}'".format(line))
+            else:
+                logging.info("Going to ignore method line '{}' at line number '{}'".format(line, line_ctr))
+            continue
+        else:
+            logging.error("Don't know what to do with '{}' at line number '{}'".format(line, line_ctr))
+            continue
+
+    return package_name, class_desc, inherits_from_class, import_list, attribute_list, method_list, is_singleton, line_ctr
+
+
+def get_class_outfile(package_name: str = None) -> tuple:
+    """Derive the class name and the module file from the package name
+    :param package_name: {str} - e.g.: some.package.module.ClassName
+    :returns (class_name, outfile): {tuple} - e.g.: ('ClassName', 'some/package/module.py')
+    """
+    path = package_name.split('.')
+    class_name = path[-1]
+
+    logging.info("class name '{}'".format(class_name))
+    filename = path[-2]
+    
+    logging.info("filename '{}'".format(filename))
+
+    count = len(path)
+    dirname_list = []
+    for i, dir in enumerate(path):
+        if i < count - 2:
+            dirname_list.append(dir)
+    dirname = '/'.join(dirname_list)
+    
+    logging.info("dirname '{}'".format(dirname))
+
+    return class_name, os.path.join(dirname, filename + '.py')
+
+
+def render_class_definition(class_name, class_desc, inherits_from_class, import_list, attribute_list, method_list, is_singleton) -> str:
+    """Render the class code with the compiled 'class' template
+    :param class_name: {str}
+    :param class_desc: {str}
+    :param inherits_from_class: {str} - e.g.: some.package.namespace.Converter
+    :param import_list: {list}
+    :param attribute_list: {list}
+    :param method_list: {list}
+    :param is_singleton: {bool}
+    :returns content: {str}
+    """
+    base_class_name = None
+    inherits_import = None
+
+    if inherits_from_class is not None:
+        # E.g.: inherits_from_class = some.package.namespace.Converter
+
+        inherits_parts = inherits_from_class.split('.')
+        # e.g.: inherits_parts will be ['some', 'package', 'namespace', 'Converter']
+
+        base_class_name = inherits_parts[-1] 
+        # e.g.: base_class_name will be Converter
+        
+        inherits_import = inherits_from_class.replace('.' + base_class_name, '')  
+        # e.g.: inherits_import will be some.package.namespace
+
+    for attribute in attribute_list:
+        logging.info("Process attribute '{}'".format(attribute))
+
+    method_desc_list = [get_param_desc_list(method) for method in method_list]
+
+    # _check_infile_status() checks the last parameter of the last method
+    check_param_name = 'infile'
+    if method_desc_list and method_desc_list[-1][4]:
+        check_param_name = method_desc_list[-1][4][-1]
+
+    return render_template('class', {
+        'class_name': class_name,
+        'class_desc': class_desc,
+        'base_class_name': base_class_name,
+        'inherits_import': inherits_import,
+        'import_list': import_list,
+        'attribute_list': attribute_list,
+        'method_list': method_desc_list,
+        'is_singleton': is_singleton,
+        'check_param_name': check_param_name,
+    })
+
+
+def get_param_desc_list(line):
+    """
+    """
+    logging.info("Going to derive parameter details from method definition '{}'".format(line))
+    split1 = line.split('(')
+    split2 = split1[1].split(')')
+    split3 = split2[0].split(',')
+    
+    param_details_list = []
+    params = []
+    params_name_list = []
+    for param_details in split3:
+        param_name, type_default = param_details.split(':')
+        param_name = param_name.strip()
+        params_name_list.append(param_name)
+        datatype, default = type_default.split('=')
+        datatype = datatype.strip()
+        default = default.strip()
+        param_details_list.append({'param_name': param_name, 'datatype': datatype, 'default': default})
+        params.append('{}: {} = {}'.format(param_name, datatype, default))
+
+    formatted_params = ', '.join(params)
+    method_name = split1[0].strip()
+    return_type = split2[1].strip()
+    if return_type.startswith('->'):
+        return_type =  return_type.replace('->', '')
+    if return_type.endswith(':'):
+        return_type =  return_type.replace(':', '')
+    
+    return method_name, formatted_params, param_details_list, return_type, params_name_list
+
+
+def generate_function(spec: FunctionSpec = None) -> str:
+    """Generate the source of one function
+    :param spec: {FunctionSpec}
+    :returns source: {str}
+    """
+    return render_function(spec.function_name, spec.function_type, spec.parameter_list, spec.parameter_lookup, spec.return_type)
+
+
+def generate_class(spec: ClassSpec = None) -> str:
+    """Generate the source of the module of one class
+    :param spec: {ClassSpec}
+    :returns source: {str}
+    """
+    class_name, _ = get_class_outfile(spec.package_name)
+    return render_class_definition(class_name, spec.class_desc, spec.inherits_from_class, spec.import_list, spec.attribute_list, spec.method_list, spec.is_singleton)
+
+
+def write_sources(source_iter=None, out=None):
+    """Put each generated source into the buffer or mapping.
+    :param source_iter: {iterable} - of (key, source)
+    :param out: {dict|file} - a mapping gets out[key] = source; a buffer,
+        i.e.: anything with a write() method, gets the sources two blank
+        lines apart; None for a new dict
+    :returns out: {dict|file}
+    """
+    if out is None:
+        out = {}
+
+    if hasattr(out, 'write'):
+        for n, (_, source) in enumerate(source_iter):
+            out.write(source if n == 0 else '\n\n' + source)
+    else:
+        for key, source in source_iter:
+            out[key] = source
+
+    return out
+
+
+def generate_functions(spec_list=None, out=None):
+    """Generate the source of many functions
+    :param spec_list: {iterable} - of FunctionSpec
+    :param out: {dict|file} - see write_sources(), a mapping is keyed on the function name
+    :returns out: {dict|file}
+    """
+    return write_sources(((spec.function_name, generate_function(spec)) for spec in spec_list), out)
+
+
+def generate_classes(spec_list=None, out=None):
+    """Generate the source of the modules of many classes
+    :param spec_list: {iterable} - of ClassSpec
+    :param out: {dict|file} - see write_sources(), a mapping is keyed on the module file, e.g.: some/package/module.py
+    :returns out: {dict|file}
+    """
+    return write_sources(((spec.get_outfile(), generate_class(spec)) for spec in spec_list), out)
+
+
+def generate_diagram(infile=None, out=None):
+    """Generate the source of the module of every class panel of an Umlet diagram
+    :param infile: {str|file} - the .uxf file or an open file object of its XML
+    :param out: {dict|file} - see generate_classes()
+    :returns out: {dict|file}
+    """
+    return generate_classes((ClassSpec.from_panel(content) for content in iter_panel_attributes(infile)), out)
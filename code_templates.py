@@ -0,0 +1,221 @@
+import os
+import re
+import sys
+import ast
+import marshal
+import hashlib
+import logging
+import builtins
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+TEMPLATE_EXTENSION = '.tmpl'
+
+# Compiled templates are kept here across runs, one file per template source and Python version
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'pycodgen', 'templates')
+
+# {{ expression }}, {% statement %} and {# comment #}
+_TAG_RE = re.compile(r'(\{\{.*?\}\}|\{%.*?%\}|\{#.*?#\})', re.DOTALL)
+
+# A line holding nothing but statements and comments leaves no trace in the output, not even its newline
+_BLOCK_LINE_RE = re.compile(r'^[ \t]*((?:\{%(?:(?!%\}).)*%\}|\{#(?:(?!#\}).)*#\})+)[ \t]*(?:\n|\Z)', re.MULTILINE)
+
+_INCLUDE_RE = re.compile(r"""\{%\s*include\s+['"]([\w.]+)['"]\s*%\}""")
+
+_BUILTIN_NAMES = set(dir(builtins))
+
+# Bump when translate_template() changes, so the disk cache does not serve code it would no longer generate
+COMPILER_VERSION = '1'
+
+# name => render function, so each template is compiled or loaded at most once per process
+_render_cache = {}
+
+
+def read_template_source(name: str = None, template_dir: str = TEMPLATE_DIR, include_stack: tuple = ()) -> str:
+    """Read a template and inline the templates it includes.
+    :param name: {str} - e.g.: 'function' for templates/function.tmpl
+    :param template_dir: {str}
+    :param include_stack: {tuple} - the templates being included, to catch cycles
+    :returns source: {str}
+    :raises ValueError: if the template includes itself
+    """
+    if name in include_stack:
+        raise ValueError("template '{}' includes itself via '{}'".format(name, "' -> '".join(include_stack)))
+
+    with open(os.path.join(template_dir, name + TEMPLATE_EXTENSION), 'r') as fh:
+        source = fh.read()
+
+    def include(match):
+        included = read_template_source(match.group(1), template_dir, include_stack + (name,))
+        # The newline of the include line itself ends the included text
+        return included[:-1] if included.endswith('\n') else included
+
+    return _INCLUDE_RE.sub(include, source)
+
+
+def get_free_names(expression: str = None, bound_set: set = None) -> list:
+    """Get the variables an expression reads that the template does not bind itself.
+    :param expression: {str}
+    :param bound_set: {set} - the loop variables in scope
+    :returns name_list: {list}
+    """
+    node_list = [node for node in ast.walk(ast.parse(expression.strip(), mode='eval')) if isinstance(node, ast.Name)]
+    # The variables of comprehensions are bound by the expression itself
+    stored_set = {node.id for node in node_list if isinstance(node.ctx, ast.Store)}
+    return [node.id for node in node_list
+            if node.id not in bound_set and node.id not in stored_set and node.id not in _BUILTIN_NAMES]
+
+
+def translate_template(name: str = None, source: str = None) -> str:
+    """Translate a template into the Python source of a render function.
+    Text and {{ expressions }} are appended to one list that is joined
+    at the end; {% for %}, {% if %}, {% elif %} and {% else %} become
+    the Python statements of the same name, closed by {% endfor %} and
+    {% endif %}.  The variables the template reads are taken from the
+    context dict once, up front.
+    :param name: {str} - for messages
+    :param source: {str} - with the includes inlined
+    :returns python_source: {str}
+    :raises ValueError: if the blocks are not balanced or a tag is not understood
+    """
+    source = _BLOCK_LINE_RE.sub(r'\1', source)
+
+    body = []
+    block_stack = []
+    bound_stack = [set()]
+    free_name_set = set()
+
+    def emit(line):
+        body.append('    ' * (len(block_stack) + 1) + line)
+
+    for token in _TAG_RE.split(source):
+        if not token or token.startswith('{#'):
+            continue
+
+        if token.startswith('{{'):
+            expression = token[2:-2].strip()
+            free_name_set.update(get_free_names(expression, bound_stack[-1]))
+            emit('_append(str({}))'.format(expression))
+            continue
+
+        if not token.startswith('{%'):
+            emit('_append({!r})'.format(token))
+            continue
+
+        statement = token[2:-2].strip()
+        keyword = statement.split(None, 1)[0]
+
+        if keyword == 'for':
+            match = re.match(r'for\s+(.+?)\s+in\s+(.+)$', statement, re.DOTALL)
+            if match is None:
+                raise ValueError("template '{}' has a malformed tag '{}'".format(name, token))
+            target, iterable = match.groups()
+            free_name_set.update(get_free_names(iterable, bound_stack[-1]))
+            emit('for {} in {}:'.format(target, iterable))
+            block_stack.append('for')
+            bound_stack.append(bound_stack[-1] | {node.id for node in ast.walk(ast.parse(target, mode='eval')) if isinstance(node, ast.Name)})
+        elif keyword == 'if':
+            free_name_set.update(get_free_names(statement[2:], bound_stack[-1]))
+            emit(statement + ':')
+            block_stack.append('if')
+            bound_stack.append(bound_stack[-1])
+        elif keyword in ('elif', 'else'):
+            if not block_stack or block_stack[-1] != 'if':
+                raise ValueError("template '{}' has '{}' outside of an if block".format(name, token))
+            if keyword == 'elif':
+                free_name_set.update(get_free_names(statement[4:], bound_stack[-1]))
+            body.append('    ' * len(block_stack) + statement + ':')
+        elif keyword in ('endfor', 'endif'):
+            if not block_stack or block_stack[-1] != keyword[3:]:
+                raise ValueError("template '{}' has an unexpected '{}'".format(name, token))
+            # Keep empty blocks valid Python
+            emit('pass')
+            block_stack.pop()
+            bound_stack.pop()
+        else:
+            raise ValueError("template '{}' has an unknown tag '{}'".format(name, token))
+
+    if block_stack:
+        raise ValueError("template '{}' has an unclosed '{}' block".format(name, block_stack[-1]))
+
+    python_source = ['def render(_context):']
+    for free_name in sorted(free_name_set):
+        python_source.append('    {} = _context[{!r}]'.format(free_name, free_name))
+    python_source.append('    _out = []')
+    python_source.append('    _append = _out.append')
+    python_source.extend(body)
+    python_source.append("    return ''.join(_out)")
+
+    return '\n'.join(python_source) + '\n'
+
+
+def get_cache_file(name: str = None, source: str = None, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """Name the cache file of a template after a hash of its source and of
+    COMPILER_VERSION, so an edited template never loads stale code, and
+    after the Python version, since marshalled code only loads into the
+    version that wrote it.
+    :param name: {str}
+    :param source: {str}
+    :param cache_dir: {str}
+    :returns cache_file: {str}
+    """
+    digest = hashlib.sha256((COMPILER_VERSION + '\0' + source).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, '{}-{}.{}.marshal'.format(name, digest, sys.implementation.cache_tag))
+
+
+def compile_template(name: str = None, template_dir: str = TEMPLATE_DIR, cache_dir: str = DEFAULT_CACHE_DIR):
+    """Compile a template, or load it compiled from the disk cache.
+    :param name: {str}
+    :param template_dir: {str}
+    :param cache_dir: {str} - None to neither read nor write the disk cache
+    :returns render: {callable} - takes the context dict and returns the rendered text
+    """
+    source = read_template_source(name, template_dir)
+
+    code = None
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = get_cache_file(name, source, cache_dir)
+        try:
+            with open(cache_file, 'rb') as fh:
+                code = marshal.load(fh)
+        except (OSError, EOFError, ValueError, TypeError):
+            code = None
+
+    if code is None:
+        code = compile(translate_template(name, source), '<template {}>'.format(name), 'exec')
+        if cache_file is not None:
+            try:
+                os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+                tmpfile = '{}.{}.tmp'.format(cache_file, os.getpid())
+                with open(tmpfile, 'wb') as fh:
+                    marshal.dump(code, fh)
+                os.replace(tmpfile, cache_file)
+            except OSError as e:
+                logging.warning("Could not cache compiled template '{}' in '{}': {}".format(name, cache_dir, e))
+
+    namespace = {}
+    exec(code, namespace)
+    return namespace['render']
+
+
+def get_template(name: str = None):
+    """Get the render function of a template, compiling it or loading it
+    from the disk cache the first time it is asked for in the process.
+    :param name: {str} - e.g.: 'function' for templates/function.tmpl
+    :returns render: {callable} - takes the context dict and returns the rendered text
+    """
+    render = _render_cache.get(name)
+    if render is None:
+        render = _render_cache[name] = compile_template(name)
+    return render
+
+
+def render_template(name: str = None, context: dict = None) -> str:
+    """Render a template into a string in one pass.
+    :param name: {str} - e.g.: 'function' for templates/function.tmpl
+    :param context: {dict} - the variables the template reads
+    :returns text: {str}
+    """
+    return get_template(name)(context)
@@ -0,0 +1,143 @@
+import io
+import os
+import re
+
+
+SKIP_BINARY = 'binary'
+SKIP_GENERATED = 'generated'
+SKIP_LARGE = 'large'
+
+SKIP_REASON_LIST = [SKIP_BINARY, SKIP_GENERATED, SKIP_LARGE]
+
+# Only this much of the start of a file is read to tell whether it is binary or generated
+SNIFF_SIZE = 8192
+
+# Generated files announce it in their first lines
+GENERATED_HEADER_SIZE = 1024
+
+# Files with more control characters than this share of the sniffed block are binary
+BINARY_CONTROL_RATIO = 0.3
+
+BINARY_EXTENSION_LIST = (
+    # compiled code and libraries
+    '.pyc', '.pyo', '.pyd', '.so', '.dll', '.dylib', '.exe', '.o', '.a', '.lib', '.obj', '.class', '.wasm',
+    # archives
+    '.zip', '.whl', '.egg', '.jar', '.tar', '.gz', '.tgz', '.bz2', '.tbz2', '.xz', '.txz', '.7z', '.rar', '.zst',
+    # images, fonts and media
+    '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.tif', '.tiff', '.webp', '.psd',
+    '.ttf', '.otf', '.woff', '.woff2', '.eot',
+    '.mp3', '.mp4', '.wav', '.ogg', '.flac', '.avi', '.mov', '.mkv', '.webm',
+    # documents and data
+    '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
+    '.db', '.sqlite', '.sqlite3', '.pkl', '.pickle', '.npy', '.npz', '.h5', '.hdf5', '.parquet', '.bin', '.dat',
+)
+
+# Lockfiles and other files written by tools rather than people
+GENERATED_NAME_LIST = [
+    'package-lock.json',
+    'npm-shrinkwrap.json',
+    'yarn.lock',
+    'pnpm-lock.yaml',
+    'poetry.lock',
+    'Pipfile.lock',
+    'uv.lock',
+    'Cargo.lock',
+    'composer.lock',
+    'Gemfile.lock',
+    'go.sum',
+]
+
+GENERATED_SUFFIX_LIST = (
+    '.min.js',
+    '.min.css',
+    '.map',
+    '_pb2.py',
+    '_pb2_grpc.py',
+    '.pb.go',
+)
+
+GENERATED_MARKER_RE = re.compile(rb'@generated\b|do not edit|auto-?generated|code generated by', re.IGNORECASE)
+
+# Bytes that do not occur in text: the C0 controls other than \t \n \v \f \r and ESC
+_BINARY_BYTES = bytes(set(range(32)) - {9, 10, 11, 12, 13, 27})
+
+
+def read_head(fh=None) -> bytes:
+    """Read the start of a stream, at most SNIFF_SIZE bytes, and leave
+    the stream at its start.  A buffered file is only peeked at, which
+    yields its first buffer without a seek; this matters for the members
+    of a compressed tar file, where seeking back means decompressing the
+    archive again from its start.
+    :param fh: {seekable binary file object}
+    :returns head: {bytes}
+    """
+    if isinstance(fh, io.BufferedReader):
+        return fh.peek(SNIFF_SIZE)[:SNIFF_SIZE]
+
+    head = fh.read(SNIFF_SIZE)
+    fh.seek(0)
+    return head
+
+
+def is_binary_content(head: bytes = None) -> bool:
+    """Sniff whether the start of a file is binary, the way git does:
+    any NUL byte, or a large share of other control characters.
+    UTF-16 and UTF-32 text is therefore taken as binary too.
+    :param head: {bytes}
+    :returns is_binary: {bool}
+    """
+    if not head:
+        return False
+
+    if b'\0' in head:
+        return True
+
+    control_ctr = len(head) - len(head.translate(None, _BINARY_BYTES))
+    return control_ctr / len(head) > BINARY_CONTROL_RATIO
+
+
+def is_generated(name: str = None, head: bytes = None) -> bool:
+    """Check whether a file was generated by a tool, from its name or
+    from a marker such as '@generated' or 'DO NOT EDIT' in its header.
+    :param name: {str}
+    :param head: {bytes} - optional, the start of the file
+    :returns is_generated: {bool}
+    """
+    basename = os.path.basename(name)
+    if basename in GENERATED_NAME_LIST or basename.endswith(GENERATED_SUFFIX_LIST):
+        return True
+
+    return head is not None and GENERATED_MARKER_RE.search(head, 0, GENERATED_HEADER_SIZE) is not None
+
+
+def get_skip_reason(name: str = None, size: int = None, head: bytes = None, skip_binary: bool = False, skip_generated: bool = False, max_size: int = None) -> str:
+    """Decide whether to skip a file before it is read in full.
+    The checks that need no I/O come first: the name, then the size,
+    then the content of the first SNIFF_SIZE bytes if it was given.
+    :param name: {str}
+    :param size: {int} - optional, in bytes
+    :param head: {bytes} - optional, the first SNIFF_SIZE bytes
+    :param skip_binary: {bool}
+    :param skip_generated: {bool}
+    :param max_size: {int} - skip files larger than this many bytes, no limit if None
+    :returns reason: {str} - one of SKIP_REASON_LIST, None to analyze the file
+    """
+    if skip_binary and name.lower().endswith(BINARY_EXTENSION_LIST):
+        return SKIP_BINARY
+
+    if skip_generated and is_generated(name):
+        return SKIP_GENERATED
+
+    if max_size is not None and size is not None and size > max_size:
+        return SKIP_LARGE
+
+    if head is None:
+        return None
+
+    if skip_binary and is_binary_content(head):
+        return SKIP_BINARY
+
+    if skip_generated and is_generated(name, head):
+        return SKIP_GENERATED
+
+    return None
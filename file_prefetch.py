@@ -0,0 +1,153 @@
+import os
+import logging
+import threading
+import collections
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+DEFAULT_DEPTH = 16
+
+DEFAULT_BYTE_BUDGET = 64 * 1024 * 1024
+
+# Reading threads; more than this rarely helps even on high latency filesystems
+MAX_THREADS = 16
+
+
+class _ByteBudget():
+    '''Bounds the bytes read ahead but not yet handed out.
+    Reservations are granted strictly in ticket (file) order, so the
+    next file the consumer waits for can always be granted once the
+    files before it were handed out, and the readers cannot deadlock.
+    '''
+
+    def __init__(self, **kwargs):
+        '''Class constructor
+        :param byte_budget: {int}
+        '''
+
+        self._byte_budget = kwargs['byte_budget']
+        self._available = self._byte_budget
+        self._next_ticket = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def acquire(self, ticket: int = None, size: int = None) -> bool:
+        '''Wait for the turn of the ticket and reserve the bytes
+        :param ticket: {int}
+        :param size: {int}
+        :returns acquired: {bool} - False if the file is larger than the whole budget or the budget was closed
+        '''
+        with self._condition:
+            self._condition.wait_for(lambda: self._closed or self._next_ticket == ticket)
+            if self._closed:
+                return False
+
+            acquired = size <= self._byte_budget
+            if acquired:
+                self._condition.wait_for(lambda: self._closed or self._available >= size)
+                if self._closed:
+                    return False
+                self._available -= size
+
+            self._next_ticket += 1
+            self._condition.notify_all()
+            return acquired
+
+    def release(self, size: int = None) -> None:
+        '''Give reserved bytes back once the content was handed out
+        :param size: {int}
+        '''
+        with self._condition:
+            self._available += size
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        '''Wake up and turn away every reader still waiting
+        '''
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+def _read_file(file: str = None, ticket: int = None, budget: _ByteBudget = None, max_size: int = None) -> tuple:
+    """Read a whole file once the budget allows it.
+    :param file: {str}
+    :param ticket: {int}
+    :param budget: {_ByteBudget}
+    :param max_size: {int} - optional, larger files are not read
+    :returns (content, size): {tuple} - None if the file could not or should not be read ahead
+    """
+    try:
+        fh = open(file, 'rb')
+    except OSError as e:
+        logging.info("Could not read ahead file '{}': {}".format(file, e))
+        budget.acquire(ticket, 0)
+        return None
+
+    with fh:
+        try:
+            size = os.fstat(fh.fileno()).st_size
+        except OSError:
+            size = 0
+
+        if max_size is not None and size > max_size:
+            budget.acquire(ticket, 0)
+            return None
+
+        if not budget.acquire(ticket, size):
+            return None
+
+        try:
+            content = fh.read()
+        except OSError as e:
+            logging.info("Could not read ahead file '{}': {}".format(file, e))
+            budget.release(size)
+            return None
+
+    return content, size
+
+
+def iter_prefetched(files=None, depth: int = DEFAULT_DEPTH, byte_budget: int = DEFAULT_BYTE_BUDGET, read_filter=None, max_size: int = None):
+    """Read upcoming files on a thread pool while the current one is
+    being processed, and yield each file with its content in order.
+    At most depth files and byte_budget bytes are read ahead.  A file
+    larger than the whole budget or max_size, one that could not be
+    read and one rejected by read_filter is yielded with None, for the
+    consumer to handle as if there were no read-ahead.
+    :param files: {iterable}
+    :param depth: {int} - the number of files read ahead
+    :param byte_budget: {int} - the number of bytes read ahead
+    :param read_filter: {callable} - optional, files it returns False for are not read
+    :param max_size: {int} - optional, files larger than this many bytes are not read
+    :returns generator of (file, content): {tuple} - content is bytes or None
+    """
+    budget = _ByteBudget(byte_budget=byte_budget)
+    pending = collections.deque()
+    ticket = 0
+
+    def pop_pending():
+        file, future = pending.popleft()
+        result = future.result() if future is not None else None
+        if result is None:
+            return file, None
+        content, size = result
+        budget.release(size)
+        return file, content
+
+    with ThreadPoolExecutor(max_workers=max(1, min(depth, MAX_THREADS))) as executor:
+        try:
+            for file in files:
+                future = None
+                if read_filter is None or read_filter(file):
+                    future = executor.submit(_read_file, file, ticket, budget, max_size)
+                    ticket += 1
+                pending.append((file, future))
+
+                if len(pending) > depth:
+                    yield pop_pending()
+
+            while pending:
+                yield pop_pending()
+        finally:
+            budget.close()
@@ -0,0 +1,236 @@
+import os
+import re
+import fnmatch
+import logging
+
+
+# Directories that are never descended into unless explicitly included
+DEFAULT_EXCLUDE_LIST = [
+    '.git',
+    '.hg',
+    '.svn',
+    'venv',
+    '.venv',
+    'node_modules',
+    '__pycache__',
+]
+
+GITIGNORE_FILE = '.gitignore'
+
+
+def translate_gitignore_pattern(pattern: str = None) -> str:
+    """Translate a single .gitignore glob into a regular expression
+    that is matched against a '/' separated path relative to the
+    directory holding the .gitignore file.
+    :param pattern: {str} - without the leading '!' and the trailing '/'
+    :returns regex: {str}
+    """
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+
+    regex = ''
+    i = 0
+    n = len(pattern)
+    while i < n:
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == n:
+            regex += '/.*'
+            i += 3
+        elif pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        elif pattern[i] == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                regex += re.escape(pattern[i])
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                regex += '[' + body.replace('\\', '\\\\') + ']'
+                i = end + 1
+        elif pattern[i] == '\\' and i + 1 < n:
+            regex += re.escape(pattern[i + 1])
+            i += 2
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+
+    if not anchored:
+        # A pattern without a slash matches at any depth
+        regex = '(?:.*/)?' + regex
+
+    return regex
+
+
+def read_gitignore(dirpath: str = None, base: str = None) -> list:
+    """Parse the .gitignore file in the directory, if there is one.
+    :param dirpath: {str} - the directory on disk
+    :param base: {str} - the directory relative to the walk root, '' or ending in '/'
+    :returns rule_list: {list} of (base, compiled regex, negate, dir_only) tuples
+    """
+    rule_list = []
+    gitignore_file = os.path.join(dirpath, GITIGNORE_FILE)
+    if not os.path.isfile(gitignore_file):
+        return rule_list
+
+    logging.info("Going to read ignore rules from '{}'".format(gitignore_file))
+
+    with open(gitignore_file, 'r', errors='replace') as fh:
+        for line in fh:
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            line = line.rstrip(' ')
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+            rule_list.append((base, re.compile(translate_gitignore_pattern(line)), negate, dir_only))
+
+    return rule_list
+
+
+def is_gitignored(relpath: str = None, is_dir: bool = False, rule_list: list = None) -> bool:
+    """Check the path against the active .gitignore rules; the last matching rule wins.
+    :param relpath: {str} - '/' separated path relative to the walk root
+    :param is_dir: {bool}
+    :param rule_list: {list}
+    :returns ignored: {bool}
+    """
+    ignored = False
+    for base, regex, negate, dir_only in rule_list:
+        if dir_only and not is_dir:
+            continue
+        if not relpath.startswith(base):
+            continue
+        if regex.fullmatch(relpath[len(base):]):
+            ignored = not negate
+    return ignored
+
+
+def matches_any(name: str = None, relpath: str = None, pattern_list: list = None) -> bool:
+    """Check whether the base name or the relative path matches any of the globs.
+    :param name: {str}
+    :param relpath: {str}
+    :param pattern_list: {list}
+    :returns matched: {bool}
+    """
+    for pattern in pattern_list:
+        if fnmatch.fnmatchcase(name, pattern) or fnmatch.fnmatchcase(relpath, pattern):
+            return True
+    return False
+
+
+def walk_files(indir: str = None, include_list: list = None, exclude_list: list = None, use_gitignore: bool = False, dir_callback=None):
+    """Lazily yield the files below the directory.
+    Excluded directories are pruned before they are descended into,
+    so their content is never listed.  Like os.walk, the files of a
+    directory are yielded before those of its subdirectories and
+    symbolic links to directories are not followed.
+    :param indir: {str}
+    :param include_list: {list} - globs a file must match, all files if empty
+    :param exclude_list: {list} - globs of files and directories to skip
+    :param use_gitignore: {bool} - whether to honor .gitignore files
+    :param dir_callback: {callable} - optional, called with each directory that is descended into
+    :returns generator of file paths: {str}
+    """
+    include_list = list(include_list or [])
+    exclude_list = list(DEFAULT_EXCLUDE_LIST) + list(exclude_list or [])
+
+    # Each stack entry is (directory on disk, path relative to indir with a trailing '/', active ignore rules)
+    stack = [(indir, '', [])]
+
+    while stack:
+        dirpath, base, rule_list = stack.pop()
+
+        if use_gitignore:
+            rule_list = rule_list + read_gitignore(dirpath, base)
+
+        if dir_callback is not None:
+            dir_callback(dirpath)
+
+        subdir_list = []
+        try:
+            with os.scandir(dirpath) as it:
+                entry_list = list(it)
+        except OSError as e:
+            logging.error("Could not read directory '{}': {}".format(dirpath, e))
+            continue
+
+        for entry in entry_list:
+            relpath = base + entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if is_dir:
+                if matches_any(entry.name, relpath, exclude_list) or (use_gitignore and is_gitignored(relpath, True, rule_list)):
+                    logging.info("Ignoring directory '{}'".format(entry.path))
+                    continue
+                if entry.is_symlink():
+                    continue
+                subdir_list.append((entry.path, relpath + '/', rule_list))
+                continue
+
+            if matches_any(entry.name, relpath, exclude_list) or (use_gitignore and is_gitignored(relpath, False, rule_list)):
+                logging.info("Ignoring file '{}'".format(entry.path))
+                continue
+            if include_list and not matches_any(entry.name, relpath, include_list):
+                continue
+
+            yield entry.path
+
+        # Reversed so the subdirectories are popped in listing order
+        stack.extend(reversed(subdir_list))
+
+
+def is_walked(indir: str = None, relpath: str = None, include_list: list = None, exclude_list: list = None, use_gitignore: bool = False, is_dir: bool = False) -> bool:
+    """Check whether walk_files() would yield the file, or descend
+    into the directory, without walking.
+    :param indir: {str}
+    :param relpath: {str} - '/' separated path of the file relative to indir
+    :param include_list: {list}
+    :param exclude_list: {list}
+    :param use_gitignore: {bool}
+    :param is_dir: {bool} - whether relpath is a directory
+    :returns walked: {bool}
+    """
+    include_list = list(include_list or [])
+    exclude_list = list(DEFAULT_EXCLUDE_LIST) + list(exclude_list or [])
+
+    parts = relpath.split('/')
+    rule_list = []
+    base = ''
+    dirpath = indir
+
+    for i, name in enumerate(parts):
+        if use_gitignore:
+            rule_list = rule_list + read_gitignore(dirpath, base)
+
+        path = base + name
+        is_parent = i < len(parts) - 1 or is_dir
+
+        if matches_any(name, path, exclude_list) or (use_gitignore and is_gitignored(path, is_parent, rule_list)):
+            return False
+
+        if is_parent:
+            dirpath = os.path.join(dirpath, name)
+            if os.path.islink(dirpath):
+                return False
+            base = path + '/'
+
+    return is_dir or not include_list or matches_any(parts[-1], relpath, include_list)
@@ -1,16 +1,18 @@
 import os
 import sys
+import glob
+import json
+import itertools
 import click
 import pathlib
 import logging
-import calendar
 import time
-from prompt_toolkit import prompt
-from prompt_toolkit.completion import WordCompleter
 
 from colorama import Fore, Style
+from run_metrics import RunMetrics, get_metrics_file, time_phase
+from code_generator import FunctionSpec, generate_function, parse_function_spec, render_function
+from output_manifest import OutputManifest, MANIFEST_BASENAME, UNCHANGED
 from datetime import datetime
-from datetime import date
 
 
 
@@ -22,65 +24,334 @@ LOGGING_FORMAT = "%(levelname)s : %(asctime)s : %(pathname)s : %(lineno)d : %(me
 
 LOG_LEVEL = logging.INFO
 
+DEFAULT_WORKERS = os.cpu_count() or 1
 
-function_or_method_completer = WordCompleter(['function', 'method'])
-yes_or_no_completer = WordCompleter(['yes', 'no'])
-datatype_completer = WordCompleter(['bool', 'dict', 'float', 'int', 'list', 'str'])
+# Number of specs handed to a worker process at a time
+BATCH_SIZE = 64
 
+# The line between two function specs in one file
+SPEC_SEPARATOR = '---'
 
-def generate_function_code_from_file(infile: str = None, outfile: str = None) -> None:
+# An --infile with any of these that is not an existing file is a glob pattern
+SPEC_GLOB_CHARS = '*?['
+
+# The --infile of --jsonl that reads the records from stdin
+JSONL_STDIN = '-'
+
+# e.g.: functions-00000.py, functions-00001.py, ... with --shard-size
+JSONL_SHARD_FORMAT = 'functions-{:05d}.py'
+
+
+# The completions offered by the interactive prompts
+FUNCTION_OR_METHOD_WORD_LIST = ['function', 'method']
+
+YES_OR_NO_WORD_LIST = ['yes', 'no']
+
+DATATYPE_WORD_LIST = ['bool', 'dict', 'float', 'int', 'list', 'str']
+
+
+def prompt_with_completion(message: str = None, word_list: list = None) -> str:
+    """Prompt the user with tab completion of the words.
+    prompt_toolkit takes longer to import than the rest of the program
+    together, so it is only imported once the user is really prompted.
+    :param message: {str}
+    :param word_list: {list}
+    :returns answer: {str}
+    """
+    from prompt_toolkit import prompt
+    from prompt_toolkit.completion import WordCompleter
+
+    return prompt(message, completer=WordCompleter(word_list))
+
+
+def generate_function_code_from_file(infile: str = None, outfile: str = None, metrics: RunMetrics = None, manifest: OutputManifest = None) -> None:
     """Generate the function code from the input file
     :param infile: {str}
     :param outfile: {str}
+    :param metrics: {RunMetrics} - optional, receives the phase timings
+    :param manifest: {OutputManifest} - optional, records the written output
     :returns None:
     """
 
     logging.info("Going to parse input file '{}'".format(infile))
 
-    function_name = None
-    function_type = None
-    return_type = None
-    parameter_list = []
-    parameter_lookup = {}
+    start_time = time.perf_counter()
 
-    with open(infile, 'r') as fh:
+    with time_phase(metrics, 'parse'), open(infile, 'r') as fh:
+        function_name, function_type, parameter_list, parameter_lookup, return_type, line_ctr = parse_function_spec(fh, infile)
 
-        for line in fh:
+    write_function(function_name, function_type, parameter_list, parameter_lookup, return_type, outfile, metrics, manifest)
 
-            line = line.strip()
-            
-            if line.startswith('#'):
-                continue
-            if line.startswith('function_name:'):
-                function_name = line.replace('function_name:', '')
-                continue
-            if line.startswith('function_type:'):
-                function_type = line.replace('function_type:', '')
+    if metrics is not None:
+        metrics.add_input(infile, time.perf_counter() - start_time, os.path.getsize(infile), line_ctr)
+
+
+def is_spec_batch(infile: str = None) -> bool:
+    """Check whether the input holds many specs rather than one: a
+    directory, a glob pattern or a spec file with several documents.
+    :param infile: {str}
+    :returns is_batch: {bool}
+    """
+    if os.path.isdir(infile):
+        return True
+
+    if os.path.isfile(infile):
+        # Stop reading at the second document
+        return next(itertools.islice(iter_spec_documents(infile), 1, None), None) is not None
+
+    return any(c in infile for c in SPEC_GLOB_CHARS)
+
+
+def get_spec_file_list(infile: str = None) -> list:
+    """Get the spec files of a directory, a glob pattern or a single file.
+    :param infile: {str}
+    :returns spec_file_list: {list} - sorted
+    """
+    if os.path.isdir(infile):
+        return sorted(os.path.join(infile, name) for name in os.listdir(infile) if os.path.isfile(os.path.join(infile, name)))
+
+    if os.path.exists(infile):
+        return [infile]
+
+    return sorted(file for file in glob.glob(infile) if os.path.isfile(file))
+
+
+def iter_spec_documents(spec_file: str = None):
+    """Split a spec file into its documents, separated by SPEC_SEPARATOR lines.
+    The documents are read one at a time, so a caller that stops early,
+    e.g.: is_spec_batch(), does not read the rest of the file.
+    :param spec_file: {str}
+    :returns generator of (spec_name, lines): {tuple} - spec_name is the file, followed by #n if it has several documents
+    """
+    with open(spec_file, 'r') as fh:
+        # Nothing but blank lines and comments before the first or after the last separator
+        document_iter = (lines for lines in iter_separated_lines(fh) if any(line.strip() and not line.lstrip().startswith('#') for line in lines))
+
+        first_lines = next(document_iter, None)
+        if first_lines is None:
+            return
+
+        # Whether the first document gets a #1 depends on whether there is a second one
+        second_lines = next(document_iter, None)
+        if second_lines is None:
+            yield spec_file, first_lines
+            return
+
+        for n, lines in enumerate(itertools.chain([first_lines, second_lines], document_iter), 1):
+            yield '{}#{}'.format(spec_file, n), lines
+
+
+def iter_separated_lines(fh=None):
+    """Split the lines of a file at the SPEC_SEPARATOR lines
+    :param fh: {TextIOWrapper}
+    :returns generator of lines: {list} - one list per document, even an empty one
+    """
+    lines = []
+    for line in fh:
+        if line.strip() == SPEC_SEPARATOR:
+            yield lines
+            lines = []
+        else:
+            lines.append(line)
+    yield lines
+
+
+def render_spec(spec_name: str = None, lines: list = None) -> tuple:
+    """Parse and render one function spec.
+    :param spec_name: {str}
+    :param lines: {list}
+    :returns (function_name, content, error, seconds, line_ctr): {tuple} - content is None and error the reason if the spec failed for any reason
+    """
+    start_time = time.perf_counter()
+    try:
+        spec = FunctionSpec.from_lines(lines, spec_name)
+        content = generate_function(spec)
+    except ValueError as e:
+        return None, None, str(e), time.perf_counter() - start_time, len(lines)
+    except Exception as e:
+        # Any other failure of one spec must not stop the rest of the batch either
+        return None, None, '{}: {}'.format(type(e).__name__, e), time.perf_counter() - start_time, len(lines)
+
+    return spec.function_name, content, None, time.perf_counter() - start_time, len(lines)
+
+
+def render_spec_batch(spec_list: list = None) -> list:
+    """Render a batch of function specs in a worker process.
+    :param spec_list: {list} - of (spec_name, lines)
+    :returns result_list: {list} - of render_spec() results
+    """
+    return [render_spec(spec_name, lines) for spec_name, lines in spec_list]
+
+
+def iter_spec_results(spec_list: list = None, workers: int = DEFAULT_WORKERS):
+    """Render the specs, across a process pool when there is more than
+    one worker, and yield each spec with its result in order.
+    :param spec_list: {list} - of (spec_name, lines)
+    :param workers: {int}
+    :returns generator of (spec_name, lines, result): {tuple}
+    """
+    batch_list = [spec_list[i:i + BATCH_SIZE] for i in range(0, len(spec_list), BATCH_SIZE)]
+
+    if workers <= 1 or len(batch_list) <= 1:
+        result_iter = map(render_spec_batch, batch_list)
+        for batch, result_list in zip(batch_list, result_iter):
+            yield from ((spec_name, lines, result) for (spec_name, lines), result in zip(batch, result_list))
+        return
+
+    # Only batch runs need a process pool, so a single spec does not pay for importing it
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch, result_list in zip(batch_list, executor.map(render_spec_batch, batch_list)):
+            yield from ((spec_name, lines, result) for (spec_name, lines), result in zip(batch, result_list))
+
+
+def generate_function_code_batch(infile: str = None, outdir: str = None, workers: int = DEFAULT_WORKERS, metrics: RunMetrics = None, manifest: OutputManifest = None) -> int:
+    """Generate the code of many function specs in one run.
+    Each function is written to <function_name>.py in the output
+    directory unless that file already holds it.  A spec that fails
+    does not stop the others; every spec is listed with its output or
+    the reason it failed.
+    :param infile: {str} - a directory, a glob pattern or a spec file with several documents
+    :param outdir: {str}
+    :param workers: {int} - number of worker processes
+    :param metrics: {RunMetrics} - optional, receives the phase timings and each spec
+    :param manifest: {OutputManifest} - optional, records the written outputs
+    :returns failed_ctr: {int}
+    """
+    if manifest is None:
+        manifest = OutputManifest()
+
+    with time_phase(metrics, 'read'):
+        spec_list = [document for spec_file in get_spec_file_list(infile) for document in iter_spec_documents(spec_file)]
+
+    logging.info("Going to generate '{}' function specs with '{}' workers".format(len(spec_list), workers))
+
+    written_lookup = {}
+    failed_ctr = 0
+
+    with time_phase(metrics, 'render'):
+        for spec_name, lines, (function_name, content, error, seconds, line_ctr) in iter_spec_results(spec_list, workers):
+            if error is None and function_name in written_lookup:
+                error = "function '{}' was already generated from spec '{}'".format(function_name, written_lookup[function_name])
+
+            if error is not None:
+                failed_ctr += 1
+                logging.error("Could not generate spec '{}': {}".format(spec_name, error))
+                print(Fore.RED + "FAILED {}: {}".format(spec_name, error))
+                print(Style.RESET_ALL + '', end='')
                 continue
-            if line.startswith('return_type:'):
-                return_type = line.replace('return_type:', '')
+
+            outfile = os.path.join(outdir, function_name + '.py')
+            with time_phase(metrics, 'write'):
+                status = manifest.write_if_changed(outfile, content)
+            written_lookup[function_name] = spec_name
+
+            logging.info("Function definition of spec '{}' in output file '{}' is {}".format(spec_name, outfile, status))
+            print("OK     {} -> {} ({})".format(spec_name, outfile, status))
+
+            if metrics is not None:
+                metrics.add_input(spec_name, seconds, len(''.join(lines)), line_ctr)
+
+    print("\nGenerated '{}' of '{}' function specs to output directory '{}' - '{}' failed".format(len(written_lookup), len(spec_list), outdir, failed_ctr))
+    logging.info("Generated '{}' of '{}' function specs to output directory '{}' - '{}' failed".format(len(written_lookup), len(spec_list), outdir, failed_ctr))
+
+    return failed_ctr
+
+
+def iter_jsonl_functions(fh=None):
+    """Render a stream of JSONL function spec records one at a time, so
+    memory does not grow with the length of the stream.  A record that
+    cannot be decoded or rendered is yielded with its error instead.
+    :param fh: {BufferedReader} - opened in binary mode, so the byte offset of each record is known
+    :returns generator of (line_number, offset, function_name, content, error, seconds, size): {tuple} - content is None and error the reason if the record failed
+    """
+    offset = 0
+    for line_number, line in enumerate(fh, 1):
+        start_time = time.perf_counter()
+        record_offset = offset
+        offset += len(line)
+
+        if not line.strip():
+            continue
+
+        try:
+            spec = FunctionSpec.from_record(json.loads(line))
+            content = generate_function(spec)
+        except (ValueError, UnicodeDecodeError) as e:
+            # json.JSONDecodeError is a ValueError
+            yield line_number, record_offset, None, None, str(e), time.perf_counter() - start_time, len(line)
+            continue
+
+        yield line_number, record_offset, spec.function_name, content, None, time.perf_counter() - start_time, len(line)
+
+
+def generate_function_code_jsonl(infh=None, outfh=None, outdir: str = None, shard_size: int = None, metrics: RunMetrics = None, manifest: OutputManifest = None) -> tuple:
+    """Generate the code of a stream of JSONL function spec records.
+    The functions are written to the output stream in the order of
+    their records or, with a shard size, to functions-00000.py,
+    functions-00001.py, ... in the output directory, each holding up
+    to that many functions.  Only one shard is held in memory at a
+    time.  A malformed record is reported on stderr with its line
+    number and byte offset and skipped.
+    :param infh: {BufferedReader} - opened in binary mode, e.g.: sys.stdin.buffer
+    :param outfh: {TextIOWrapper} - e.g.: sys.stdout, not used with a shard size
+    :param outdir: {str} - the directory of the shards
+    :param shard_size: {int} - the number of functions per shard file, None to write to the output stream
+    :param metrics: {RunMetrics} - optional, receives the phase timings and each record
+    :param manifest: {OutputManifest} - optional, records the written shards
+    :returns (generated_ctr, failed_ctr): {tuple}
+    """
+    if manifest is None:
+        manifest = OutputManifest()
+
+    generated_ctr = 0
+    failed_ctr = 0
+    shard_list = []
+    shard_index = 0
+
+    def write_shard():
+        outfile = os.path.join(outdir, JSONL_SHARD_FORMAT.format(shard_index))
+        with time_phase(metrics, 'write'):
+            status = manifest.write_if_changed(outfile, '\n\n'.join(shard_list))
+        logging.info("Shard of '{}' functions in output file '{}' is {}".format(len(shard_list), outfile, status))
+        print("OK     {} functions -> {} ({})".format(len(shard_list), outfile, status))
+
+    name = getattr(infh, 'name', '<stdin>')
+
+    with time_phase(metrics, 'render'):
+        for line_number, offset, function_name, content, error, seconds, size in iter_jsonl_functions(infh):
+            if error is not None:
+                failed_ctr += 1
+                logging.error("Skipped record at line '{}' offset '{}' of '{}': {}".format(line_number, offset, name, error))
+                print("FAILED record at line {} offset {}: {}".format(line_number, offset, error), file=sys.stderr)
                 continue
-            if line.startswith('param:'):
-                logging.info("Found param line '{}'".format(line))
-                param = line.replace('param:', '')
-                parts = param.split(':')
-                param_name = parts[0]
-                datatype = parts[1]
-                default = parts[2]
-                desc = parts[3]
-                logging.info("Found param '{}' datatype '{}' default '{}' description '{}'".format(param_name, datatype, default, desc))
-                if param_name in parameter_lookup:
-                    logging.warning("parameter '{}' was already encountered - going to ignore it now".format(param_name))
-                    print("parameter '{}' was already encountered - going to ignore it now".format(param_name))
-                    continue
-                else:
-                    parameter_lookup[param_name] = {}
-                    parameter_list.append(param_name)
-                parameter_lookup[param_name]['datatype'] = datatype
-                parameter_lookup[param_name]['default'] = default
-                parameter_lookup[param_name]['description'] = desc
 
-    write_function(function_name, function_type, parameter_list, parameter_lookup, return_type, outfile)
+            if shard_size is None:
+                with time_phase(metrics, 'write'):
+                    # Two blank lines between top-level functions
+                    outfh.write(content if generated_ctr == 0 else '\n\n' + content)
+            else:
+                shard_list.append(content)
+                if len(shard_list) == shard_size:
+                    write_shard()
+                    shard_list = []
+                    shard_index += 1
+
+            generated_ctr += 1
+
+            if metrics is not None:
+                metrics.add_input('{}:{}'.format(name, line_number), seconds, size, 1)
+
+        if shard_list:
+            write_shard()
+
+    if shard_size is None:
+        outfh.flush()
+
+    logging.info("Generated '{}' functions from JSONL records of '{}' - '{}' failed".format(generated_ctr, name, failed_ctr))
+
+    return generated_ctr, failed_ctr
 
 
 def get_function_name() -> str:
@@ -110,7 +381,7 @@ def get_function_type() -> None:
     function_type = None # function or method
 
     while function_type is None or function_type == '':
-        function_type = prompt('Is this a function or method? [(f)unction|(m)ethod] ', completer=function_or_method_completer)
+        function_type = prompt_with_completion('Is this a function or method? [(f)unction|(m)ethod] ', FUNCTION_OR_METHOD_WORD_LIST)
         function_type = function_type.strip()
         if function_type is None or function_type == '':
             continue
@@ -134,7 +405,7 @@ def get_return_type() -> None:
     return_type = None # function or method
 
     while return_type is None or return_type == '':
-        return_type = prompt("return type? [bool|dict|float|int|list|str]: ", completer=datatype_completer)
+        return_type = prompt_with_completion("return type? [bool|dict|float|int|list|str]: ", DATATYPE_WORD_LIST)
         return_type = return_type.strip()
         if return_type is None or return_type == '':
             return_type = 'None'
@@ -143,9 +414,11 @@ def get_return_type() -> None:
     return return_type
 
 
-def generate_function_code(outfile: str = None) -> None:
+def generate_function_code(outfile: str = None, metrics: RunMetrics = None, manifest: OutputManifest = None) -> None:
     """Generate the function code
     :param outfile: {str}
+    :param metrics: {RunMetrics} - optional, receives the phase timings
+    :param manifest: {OutputManifest} - optional, records the written output
     :returns None:
     """
 
@@ -163,7 +436,7 @@ def generate_function_code(outfile: str = None) -> None:
         return_type = get_return_type()
 
         while has_parameters is None or has_parameters == '':
-            has_parameters = prompt('Has parameter(s)? [(Y)es|(n)o] ', completer=yes_or_no_completer)
+            has_parameters = prompt_with_completion('Has parameter(s)? [(Y)es|(n)o] ', YES_OR_NO_WORD_LIST)
             if has_parameters is None or has_parameters == '':
                 has_parameters = 'y'
             break
@@ -191,7 +464,7 @@ def generate_function_code(outfile: str = None) -> None:
 
                 parameter_datatype = None
                 while parameter_datatype is None:
-                    parameter_datatype = prompt("datatype? [bool|dict|float|int|list|str]: ", completer=datatype_completer)
+                    parameter_datatype = prompt_with_completion("datatype? [bool|dict|float|int|list|str]: ", DATATYPE_WORD_LIST)
                     if parameter_datatype is None or parameter_datatype == '':
                         continue
                     else:
@@ -229,78 +502,90 @@ def generate_function_code(outfile: str = None) -> None:
                     more_parameters = False
         run = False
 
-    write_function(function_name, function_type, parameter_list, parameter_lookup, return_type, outfile)
+    write_function(function_name, function_type, parameter_list, parameter_lookup, return_type, outfile, metrics, manifest)
 
 
-def write_function(function_name, function_type, parameter_list, parameter_lookup, return_type, outfile):
-    """Write the function code to the output file
+def write_function(function_name, function_type, parameter_list, parameter_lookup, return_type, outfile, metrics=None, manifest=None):
+    """Write the function code to the output file unless the file already holds it
     :param function_name: {str}
     :param function_type: {str}
     :param parameter_list: {list}
     :param parameter_lookup: {dict}
     :param return_type: {str}
     :param outfile: {str}
+    :param metrics: {RunMetrics} - optional, receives the render and write timings
+    :param manifest: {OutputManifest} - optional, records the written output
     """
-    formatted_param_list = []
-    formatted_param_desc_list = []
+    if manifest is None:
+        manifest = OutputManifest()
 
-    if len(parameter_list) > 0:
-        for parameter_name in parameter_list:
-            datatype = parameter_lookup[parameter_name]['datatype']
-            default = parameter_lookup[parameter_name]['default']
-            description = parameter_lookup[parameter_name]['description']
-            formatted_param_list.append('{}: {} = {}'.format(parameter_name, datatype, default))
-            formatted_param_desc_list.append(':param {}: {{{}}} - {}'.format(parameter_name, datatype, description))
+    with time_phase(metrics, 'render'):
+        content = render_function(function_name, function_type, parameter_list, parameter_lookup, return_type)
 
-    formatted_param_desc_list.append(':returns var: {{{}}} - '.format(return_type))
+    with time_phase(metrics, 'write'):
+        status = manifest.write_if_changed(outfile, content)
 
-    content = []
-
-    if function_type == 'method':
-        content.append('def {}(self, '.format(function_name))
+    if status == UNCHANGED:
+        print("\nFunction defintion in output file '{}' is unchanged".format(outfile))
     else:
-        content.append('def {}('.format(function_name))
-
-    content.append("{}) -> {}:\n".format(", ".join(formatted_param_list), return_type))
-    content.append("    '''\n")
-    content.append("    {}\n".format("\n    ".join(formatted_param_desc_list)))
-    content.append("    '''\n")
-
-    for parameter_name in parameter_list:
-        if 'file' in parameter_name:
-            if 'outfile' in parameter_name:
-                continue
-            else:
-                content.append("    if {} is None or {} == '':\n".format(parameter_name, parameter_name))
-                content.append("        logging.error('{}' is not defined)\n".format(parameter_name))
-                content.append("        sys.exit(1)\n")
-                content.append("    if not os.path.exists({}):\n".format(parameter_name))
-                content.append("        logging.error(file '{}' does not exist)\n".format(parameter_name))
-                content.append("        sys.exit(1)\n")
-
-    if not return_type == 'None':
-        content.append("\n    return var\n")
-
-    with open(outfile, 'w') as fh:
-        for line in content:
-            fh.write(line)
-
-    print("\nWrote function defintion to output file '{}'".format(outfile))
+        print("\nWrote function defintion to output file '{}'".format(outfile))
     print("Try:\ncat {}".format(outfile))
 
 
 @click.command()
 @click.option('--outdir', help='The output directory - default is {}'.format(DEFAULT_OUTDIR))
 @click.option('--outfile', help='The output file - if not specified a default will be assigned')
-@click.option('--infile', help='The input file')
+@click.option('--infile', help="The input file - or a directory, a glob pattern or a file of specs separated by '{}' lines to generate many functions, one <function_name>.py each".format(SPEC_SEPARATOR))
 @click.option('--logfile', help="The log file - if not is specified a default will be assigned")
 @click.option('--verbose', is_flag=True, help="Whether to execute in verbose mode - default is {}".format(DEFAULT_VERBOSE))
-def main(outdir, outfile, infile, logfile, verbose):
+@click.option('--metrics', '--profile', 'metrics', is_flag=True, help="Whether to write the phase timings and peak memory to a .metrics.json file next to the output file")
+@click.option('--workers', type=int, help="The number of worker processes when --infile holds many specs - default is the CPU count {}".format(DEFAULT_WORKERS))
+@click.option('--manifest', help="The JSON file of the content hashes of the generated files, used to only write the files that changed - default is {} in --outdir".format(MANIFEST_BASENAME))
+@click.option('--jsonl', is_flag=True, help="Whether to read JSON function spec records, one per line, from --infile or from stdin when --infile is '{}' or not specified, and write the functions to stdout".format(JSONL_STDIN))
+@click.option('--shard-size', type=int, help="With --jsonl, write this many functions per file to {} in --outdir instead of to stdout".format(JSONL_SHARD_FORMAT.format(0)))
+def main(outdir, outfile, infile, logfile, verbose, metrics, workers, manifest, jsonl, shard_size):
     """Prompt the user and generate a Python function code
     """
 
+    code_fh = sys.stdout
+    if jsonl and shard_size is None:
+        # stdout carries the generated code, so every message goes to stderr
+        sys.stdout = sys.stderr
+
     error_ctr = 0
 
+    is_batch = not jsonl and infile is not None and infile != '' and is_spec_batch(infile)
+
+    if jsonl and outfile is not None:
+        print(Fore.RED + "--outfile cannot be specified with --jsonl - redirect stdout or specify --shard-size")
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if shard_size is not None and not jsonl:
+        print(Fore.RED + "--shard-size can only be specified with --jsonl")
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if shard_size is not None and shard_size < 1:
+        print(Fore.RED + "--shard-size must be at least 1 but was '{}'".format(shard_size))
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if is_batch and outfile is not None:
+        print(Fore.RED + "--outfile cannot be specified when --infile holds many specs - each function is written to --outdir")
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if workers is not None and not is_batch:
+        print(Fore.RED + "--workers can only be specified when --infile holds many specs")
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
+    if workers is not None and workers < 1:
+        print(Fore.RED + "--workers must be at least 1 but was '{}'".format(workers))
+        print(Style.RESET_ALL + '', end='')
+        error_ctr += 1
+
     if error_ctr > 0:
         print(Fore.RED + "Required command-line arguments were not specified")
         print(Style.RESET_ALL + '', end='')
@@ -334,27 +619,72 @@ def main(outdir, outfile, infile, logfile, verbose):
 
     assert isinstance(logfile, str)
 
-    if outfile is None:
+    if outfile is None and not is_batch and not jsonl:
         outfile = os.path.join(outdir, infile_basename + '.json')
         print(Fore.YELLOW + "--outfile was not specified and therefore was set to '{}'".format(outfile))
         print(Style.RESET_ALL + '', end='')
 
-    assert isinstance(outfile, str)
+    if manifest is None:
+        manifest = os.path.join(outdir, MANIFEST_BASENAME)
+        print(Fore.YELLOW + "--manifest was not specified and therefore was set to '{}'".format(manifest))
+        print(Style.RESET_ALL + '', end='')
+
+    if is_batch and workers is None:
+        workers = DEFAULT_WORKERS
+        print(Fore.YELLOW + "--workers was not specified and therefore was set to default '{}'".format(workers))
+        print(Style.RESET_ALL + '', end='')
 
 
     logging.basicConfig(filename=logfile,
                     format=LOGGING_FORMAT,
                     level=LOG_LEVEL)
 
-    if infile is not None and infile != '':
-        if not os.path.exists(infile):
-            print(Fore.RED + "infile '{}' does not exist".format(infile))
-            print(Style.RESET_ALL + '', end='')
-            sys.exit(1)
-    
-        generate_function_code_from_file(infile, outfile)
-    else:
-        generate_function_code(outfile)
+    run_metrics = None
+    if metrics:
+        run_metrics = RunMetrics(tool=infile_basename)
+
+    failed_ctr = 0
+
+    if is_batch and not get_spec_file_list(infile):
+        print(Fore.RED + "infile '{}' matches no spec files".format(infile))
+        print(Style.RESET_ALL + '', end='')
+        sys.exit(1)
+
+    is_stdin = jsonl and infile in (None, '', JSONL_STDIN)
+
+    if not is_batch and not is_stdin and infile is not None and infile != '' and not os.path.exists(infile):
+        print(Fore.RED + "infile '{}' does not exist".format(infile))
+        print(Style.RESET_ALL + '', end='')
+        sys.exit(1)
+
+    with OutputManifest(manifest_file=manifest) as output_manifest:
+        if is_stdin:
+            _, failed_ctr = generate_function_code_jsonl(sys.stdin.buffer, code_fh, outdir, shard_size, run_metrics, output_manifest)
+        elif jsonl:
+            with open(infile, 'rb') as infh:
+                _, failed_ctr = generate_function_code_jsonl(infh, code_fh, outdir, shard_size, run_metrics, output_manifest)
+        elif is_batch:
+            failed_ctr = generate_function_code_batch(infile, outdir, workers, run_metrics, output_manifest)
+        elif infile is not None and infile != '':
+            try:
+                generate_function_code_from_file(infile, outfile, run_metrics, output_manifest)
+            except ValueError as e:
+                logging.error(str(e))
+                print(Fore.RED + str(e))
+                print(Style.RESET_ALL + '', end='')
+                sys.exit(1)
+        else:
+            generate_function_code(outfile, run_metrics, output_manifest)
+
+    if not jsonl or shard_size is not None:
+        print(output_manifest.format_summary())
+        logging.info(output_manifest.format_summary())
+
+    if run_metrics is not None:
+        run_metrics.write(get_metrics_file(outfile or os.path.join(outdir, infile_basename + '.json')))
+
+    if failed_ctr > 0:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
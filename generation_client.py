@@ -0,0 +1,213 @@
+"""Thin client of generation_server.py.
+
+Sends a function spec or an Umlet .uxf diagram to the running server
+and writes the generated code, so each call only pays for starting the
+interpreter.  This script therefore imports nothing beyond the standard
+library and output_manifest, and parses its arguments with argparse
+rather than click.
+
+Usage:
+    python pycodgen.py server &
+    python generation_client.py function --infile spec.txt --outfile convert.py
+    python generation_client.py uml --infile diagram.uxf
+    python generation_client.py stop
+"""
+import os
+import sys
+import json
+import stat
+import socket
+import struct
+import argparse
+import tempfile
+import posixpath
+
+
+def get_socket_dir() -> str:
+    """Get the directory of the default socket: $XDG_RUNTIME_DIR, which
+    only its user can enter, or else a per-user directory in the
+    temporary directory, see ensure_socket_dir().
+    :returns socket_dir: {str}
+    """
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return runtime_dir
+    return os.path.join(tempfile.gettempdir(), 'pycodgen-{}'.format(os.getuid()))
+
+
+# Also the default of generation_server.py
+DEFAULT_SOCKET = os.path.join(get_socket_dir(), 'pycodgen.sock')
+
+
+def ensure_socket_dir(socket_dir: str = None) -> None:
+    """Create the socket directory if needed and check that only the
+    current user can use it, so no other user can bind the socket first.
+    :param socket_dir: {str}
+    :raises PermissionError: if the directory is not a directory of the current user closed to others
+    """
+    try:
+        os.mkdir(socket_dir, 0o700)
+    except FileExistsError:
+        pass
+
+    dir_stat = os.lstat(socket_dir)
+    if not stat.S_ISDIR(dir_stat.st_mode) or dir_stat.st_uid != os.getuid() or dir_stat.st_mode & 0o077:
+        raise PermissionError("socket directory '{}' must be a directory owned by uid '{}' with mode 0700".format(socket_dir, os.getuid()))
+
+
+def get_peer_uid(sock: socket.socket = None, socket_file: str = None) -> int:
+    """Get the user the server on the other end of the socket runs as
+    :param sock: {socket.socket} - connected
+    :param socket_file: {str}
+    :returns uid: {int} - from SO_PEERCRED where available, else the owner of the socket file
+    """
+    if hasattr(socket, 'SO_PEERCRED'):
+        credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        return struct.unpack('3i', credentials)[1]
+    return os.stat(socket_file).st_uid
+
+
+def send_request(socket_file: str = None, request: dict = None) -> dict:
+    """Send one request to the server and wait for its response.
+    :param socket_file: {str}
+    :param request: {dict}
+    :returns response: {dict}
+    :raises OSError: if the server is not running
+    :raises PermissionError: if the server runs as another user
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_file)
+        # Never send specs to, or write files for, a server another user started
+        peer_uid = get_peer_uid(sock, socket_file)
+        if peer_uid != os.getuid():
+            raise PermissionError("server on socket '{}' runs as uid '{}', not as uid '{}'".format(socket_file, peer_uid, os.getuid()))
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as fh:
+            line = fh.readline()
+
+    if not line:
+        raise OSError("server on socket '{}' closed the connection without a response".format(socket_file))
+    return json.loads(line)
+
+
+def write_function(response: dict = None, outfile: str = None) -> None:
+    """Write the generated function to the output file, or to stdout
+    :param response: {dict}
+    :param outfile: {str} - None for stdout
+    """
+    if outfile is None:
+        sys.stdout.write(response['content'])
+        return
+
+    from output_manifest import OutputManifest, UNCHANGED
+
+    if OutputManifest().write_if_changed(outfile, response['content']) == UNCHANGED:
+        print("Function defintion in output file '{}' is unchanged".format(outfile))
+    else:
+        print("Wrote function defintion to output file '{}'".format(outfile))
+
+
+def check_module_path(path: str = None) -> None:
+    """Check that a module path of a response stays below the current directory
+    :param path: {str} - e.g.: some/package/module.py
+    :raises ValueError: if the path is absolute or has a '..' component
+    """
+    if not isinstance(path, str) or path == '' or os.path.isabs(path) or '..' in path.replace(os.sep, posixpath.sep).split(posixpath.sep):
+        raise ValueError("server returned module path '{}' that is not below the current directory".format(path))
+
+
+def write_modules(response: dict = None, manifest_file: str = None) -> None:
+    """Write the generated modules below the current directory, like umlet_class_diagram_to_python_api.py
+    :param response: {dict}
+    :param manifest_file: {str}
+    :raises ValueError: if the path of a module is not below the current directory, nothing is written then
+    """
+    from output_manifest import OutputManifest, GenerationPlan, UNCHANGED
+
+    for module in response['files']:
+        check_module_path(module['path'])
+
+    plan = GenerationPlan()
+    with OutputManifest(manifest_file=manifest_file) as manifest:
+        for module in response['files']:
+            if plan.write_module(module['path'], module['content'], manifest, backup=True) == UNCHANGED:
+                print("Output file '{}' is unchanged".format(module['path']))
+            else:
+                print("Wrote output file '{}'".format(module['path']))
+
+    print(manifest.format_summary())
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser
+    :returns parser: {argparse.ArgumentParser}
+    """
+    parser = argparse.ArgumentParser(description='Generate Python code through a running generation_server.py')
+    parser.add_argument('--socket', dest='socket_file', default=DEFAULT_SOCKET, help='The Unix socket of the server - default is {}'.format(DEFAULT_SOCKET))
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    function_parser = subparsers.add_parser('function', help='Generate a function from a function spec file')
+    function_parser.add_argument('--infile', required=True, help='The function spec file')
+    function_parser.add_argument('--outfile', help='The output file - default is stdout')
+
+    uml_parser = subparsers.add_parser('uml', help='Generate the modules of an Umlet .uxf diagram below the current directory')
+    uml_parser.add_argument('--infile', required=True, help='The Umlet .uxf XML file')
+    uml_parser.add_argument('--manifest', default='.pycodgen-manifest.json', help='The JSON file of the content hashes of the generated modules - default is .pycodgen-manifest.json')
+
+    subparsers.add_parser('ping', help='Check that the server is running')
+    subparsers.add_parser('stop', help='Stop the server')
+
+    return parser
+
+
+def main(argv: list = None) -> int:
+    """Send the request of the command line to the server
+    :param argv: {list} - the arguments, default is sys.argv[1:]
+    :returns status: {int} - the exit status
+    """
+    args = get_parser().parse_args(argv)
+
+    if args.command in ('function', 'uml'):
+        if not os.path.exists(args.infile):
+            print("infile '{}' does not exist".format(args.infile), file=sys.stderr)
+            return 1
+        with open(args.infile, 'r') as fh:
+            text = fh.read()
+
+    if args.command == 'function':
+        request = {'command': 'function', 'name': args.infile, 'spec': text}
+    elif args.command == 'uml':
+        request = {'command': 'uml', 'name': args.infile, 'uxf': text}
+    elif args.command == 'stop':
+        request = {'command': 'shutdown'}
+    else:
+        request = {'command': 'ping'}
+
+    try:
+        response = send_request(args.socket_file, request)
+    except OSError as e:
+        print("Could not reach the server on socket '{}' - start it with 'python pycodgen.py server': {}".format(args.socket_file, e), file=sys.stderr)
+        return 1
+
+    if not response.get('ok'):
+        print(response.get('error'), file=sys.stderr)
+        return 1
+
+    if args.command == 'function':
+        write_function(response, args.outfile)
+    elif args.command == 'uml':
+        try:
+            write_modules(response, args.manifest)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+    elif args.command == 'ping':
+        print("Server with pid '{}' speaks protocol version '{}'".format(response['pid'], response['protocol_version']))
+    else:
+        print("Server on socket '{}' is stopping".format(args.socket_file))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import io
+import os
+import sys
+import json
+import stat
+import click
+import logging
+import socket
+import pathlib
+import threading
+import socketserver
+
+from colorama import Fore, Style
+from datetime import datetime
+
+import code_templates
+import code_generator
+from generation_client import DEFAULT_SOCKET, ensure_socket_dir
+
+
+DEFAULT_VERBOSE = False
+
+DEFAULT_OUTDIR = "/tmp/" + os.path.basename(__file__) + '/' + str(datetime.today().strftime('%Y-%m-%d-%H%M%S'))
+
+LOGGING_FORMAT = "%(levelname)s : %(asctime)s : %(pathname)s : %(lineno)d : %(message)s"
+
+LOG_LEVEL = logging.INFO
+
+# Bumped when the requests or responses change incompatibly; returned by 'ping'
+PROTOCOL_VERSION = 1
+
+# A request line longer than this is refused rather than read into memory
+MAX_REQUEST_SIZE = 64 * 1024 * 1024
+
+COMMAND_LIST = ['ping', 'function', 'uml', 'shutdown']
+
+# The templates the generators render, loaded when the server starts
+TEMPLATE_LIST = ['function', 'class']
+
+
+def handle_request(request: dict = None) -> dict:
+    """Run one request against the warm generators.
+    The requests are JSON objects, e.g.:
+    {"command": "function", "name": "spec.txt", "spec": "function_name:convert\\n..."}
+    {"command": "function", "record": {"function_name": "convert", "parameters": [...]}}
+    {"command": "uml", "name": "diagram.uxf", "uxf": "<diagram>...</diagram>"}
+    Nothing is written on the server side; the client writes the files.
+    :param request: {dict}
+    :returns response: {dict} - 'ok' is False and 'error' the reason if the request failed
+    :raises ValueError: if the request is malformed or its spec cannot be generated
+    """
+    if not isinstance(request, dict):
+        raise ValueError("request is not a JSON object")
+
+    command = request.get('command')
+
+    if command == 'ping':
+        return {'ok': True, 'protocol_version': PROTOCOL_VERSION, 'pid': os.getpid()}
+
+    if command == 'function':
+        if 'record' in request:
+            spec = code_generator.FunctionSpec.from_record(request['record'])
+        elif isinstance(request.get('spec'), str):
+            spec = code_generator.FunctionSpec.from_lines(request['spec'].splitlines(True), request.get('name', '<request>'))
+        else:
+            raise ValueError("request has neither a spec nor a record")
+
+        return {'ok': True, 'function_name': spec.function_name, 'content': code_generator.generate_function(spec)}
+
+    if command == 'uml':
+        if not isinstance(request.get('uxf'), str):
+            raise ValueError("request has no uxf")
+
+        source_lookup = code_generator.generate_diagram(io.BytesIO(request['uxf'].encode('utf-8')))
+        return {'ok': True, 'files': [{'path': outfile, 'content': content} for outfile, content in source_lookup.items()]}
+
+    raise ValueError("unknown command '{}' - expected one of {}".format(command, COMMAND_LIST))
+
+
+class GenerationRequestHandler(socketserver.StreamRequestHandler):
+    '''Serves the requests of one client connection, one JSON object
+    per line each way, until the client closes the connection.
+    '''
+
+    def handle(self) -> None:
+        '''Answer each request line with one response line
+        '''
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_SIZE + 1)
+            if not line:
+                break
+
+            if len(line) > MAX_REQUEST_SIZE:
+                self.send({'ok': False, 'error': "request is larger than '{}' bytes".format(MAX_REQUEST_SIZE)})
+                break
+
+            try:
+                request = json.loads(line)
+                if isinstance(request, dict) and request.get('command') == 'shutdown':
+                    self.send({'ok': True})
+                    # shutdown() waits for serve_forever() to return, so it cannot run on this thread
+                    threading.Thread(target=self.server.shutdown).start()
+                    break
+                response = handle_request(request)
+            except Exception as e:
+                # A bad request must not take the server down
+                logging.exception("Could not handle request")
+                response = {'ok': False, 'error': '{}: {}'.format(type(e).__name__, e)}
+
+            self.send(response)
+
+    def send(self, response: dict = None) -> None:
+        '''Write one response line
+        :param response: {dict}
+        '''
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+
+class GenerationServer(socketserver.ThreadingUnixStreamServer):
+    '''Keeps the generators, their templates and logging warm and serves
+    the requests of each client connection on its own thread.
+    '''
+
+    daemon_threads = True
+
+
+def is_server_running(socket_file: str = None) -> bool:
+    """Check whether a server answers on the socket.
+    :param socket_file: {str}
+    :returns is_running: {bool}
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_file)
+        except OSError:
+            return False
+    return True
+
+
+def remove_socket(socket_file: str = None) -> None:
+    """Remove the socket left behind by a server that was killed, but
+    never a file or directory that happens to be at the path.
+    :param socket_file: {str}
+    :raises FileExistsError: if something other than a socket is at the path
+    """
+    try:
+        mode = os.lstat(socket_file).st_mode
+    except FileNotFoundError:
+        return
+
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError("'{}' is not a socket - refusing to replace it".format(socket_file))
+
+    os.unlink(socket_file)
+
+
+def serve(socket_file: str = DEFAULT_SOCKET) -> None:
+    """Serve requests on the Unix socket until interrupted or asked to shut down.
+    :param socket_file: {str}
+    """
+    # Compile or load the templates now rather than on the first request
+    for name in TEMPLATE_LIST:
+        code_templates.get_template(name)
+
+    remove_socket(socket_file)
+
+    # Only the user who runs the server may connect to it
+    umask = os.umask(0o177)
+    try:
+        server = GenerationServer(socket_file, GenerationRequestHandler)
+    finally:
+        os.umask(umask)
+
+    print("Serving on socket '{}' with pid '{}'".format(socket_file, os.getpid()))
+    logging.info("Serving on socket '{}' with pid '{}'".format(socket_file, os.getpid()))
+
+    try:
+        with server:
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        remove_socket(socket_file)
+
+    print("Stopped serving on socket '{}'".format(socket_file))
+    logging.info("Stopped serving on socket '{}'".format(socket_file))
+
+
+@click.command()
+@click.option('--socket', 'socket_file', help='The Unix socket to serve on - default is {}'.format(DEFAULT_SOCKET))
+@click.option('--outdir', help='The output directory of the log file - default is {}'.format(DEFAULT_OUTDIR))
+@click.option('--logfile', help="The log file - if not is specified a default will be assigned")
+@click.option('--verbose', is_flag=True, help="Whether to execute in verbose mode - default is {}".format(DEFAULT_VERBOSE))
+def main(socket_file, outdir, logfile, verbose):
+    """Serve the function and Umlet generators on a Unix socket, see generation_client.py
+    """
+    if socket_file is None:
+        socket_file = DEFAULT_SOCKET
+        print(Fore.YELLOW + "--socket was not specified and therefore was set to default '{}'".format(socket_file))
+        print(Style.RESET_ALL + '', end='')
+
+        # No other user may be able to bind or replace the default socket
+        try:
+            ensure_socket_dir(os.path.dirname(socket_file))
+        except PermissionError as e:
+            print(Fore.RED + str(e))
+            print(Style.RESET_ALL + '', end='')
+            sys.exit(1)
+
+    if is_server_running(socket_file):
+        print(Fore.RED + "A server is already running on socket '{}'".format(socket_file))
+        print(Style.RESET_ALL + '', end='')
+        sys.exit(1)
+
+    if os.path.lexists(socket_file) and not stat.S_ISSOCK(os.lstat(socket_file).st_mode):
+        print(Fore.RED + "--socket '{}' exists and is not a socket".format(socket_file))
+        print(Style.RESET_ALL + '', end='')
+        sys.exit(1)
+
+    if verbose is None:
+        verbose = DEFAULT_VERBOSE
+        print(Fore.YELLOW + "--verbose was not specified and therefore was set to default '{}'".format(verbose))
+        print(Style.RESET_ALL + '', end='')
+
+    assert isinstance(verbose, bool)
+
+    if outdir is None:
+        outdir = DEFAULT_OUTDIR
+        print(Fore.YELLOW + "--outdir was not specified and therefore was set to default '{}'".format(outdir))
+        print(Style.RESET_ALL + '', end='')
+
+    assert isinstance(outdir, str)
+
+    if not os.path.exists(outdir):
+        pathlib.Path(outdir).mkdir(parents=True, exist_ok=True)
+        print(Fore.YELLOW + "Created output directory '{}'".format(outdir))
+        print(Style.RESET_ALL + '', end='')
+
+    if logfile is None:
+        logfile = os.path.join(outdir, os.path.splitext(os.path.basename(__file__))[0] + '.log')
+        print(Fore.YELLOW + "--logfile was not specified and therefore was set to '{}'".format(logfile))
+        print(Style.RESET_ALL + '', end='')
+
+    assert isinstance(logfile, str)
+
+    logging.basicConfig(filename=logfile,
+                    format=LOGGING_FORMAT,
+                    level=LOG_LEVEL)
+
+    serve(socket_file)
+
+
+if __name__ == "__main__":
+    main()
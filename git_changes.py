@@ -0,0 +1,103 @@
+import os
+import logging
+import threading
+import subprocess
+
+
+# git diff --name-status letters; with --no-renames there are no R/C entries
+STATUS_ADDED = 'A'
+STATUS_DELETED = 'D'
+STATUS_MODIFIED = 'M'
+
+
+def get_changed_files(indir: str = None, rev: str = None, use_gitignore: bool = False) -> list:
+    """Ask git which files below the directory differ between the
+    revision and the working tree.  Files that are not tracked yet count
+    as added, so the delta matches a full scan; like the full scan, only
+    with use_gitignore are the ignored ones left out.
+    :param indir: {str} - a directory inside a git checkout
+    :param rev: {str} - e.g.: a commit, tag or branch
+    :param use_gitignore: {bool} - whether untracked files ignored by .gitignore are left out
+    :returns change_list: {list} of (status, path relative to indir) tuples
+    :raises subprocess.CalledProcessError: if git fails, e.g.: unknown revision
+    """
+    output = subprocess.run(['git', 'diff', '--name-status', '--no-renames', '--relative', '-z', rev, '--'],
+                            cwd=indir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True).stdout
+
+    # With -z the output is status NUL path NUL status NUL path NUL ...
+    fields = output.split(b'\0')
+    status_lookup = {}
+    for i in range(0, len(fields) - 1, 2):
+        status = fields[i].decode('ascii')[:1]
+        path = os.fsdecode(fields[i + 1])
+        status_lookup[path] = status
+
+    # Paths are relative to indir, like git diff --relative
+    command = ['git', 'ls-files', '--others', '-z']
+    if use_gitignore:
+        command.append('--exclude-standard')
+    output = subprocess.run(command, cwd=indir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True).stdout
+
+    untracked_ctr = 0
+    for field in output.split(b'\0'):
+        if not field:
+            continue
+        path = os.fsdecode(field)
+        # A file removed from the index but still on disk was at the revision
+        status_lookup[path] = STATUS_MODIFIED if status_lookup.get(path) == STATUS_DELETED else STATUS_ADDED
+        untracked_ctr += 1
+
+    change_list = [(status, path) for path, status in status_lookup.items()]
+
+    logging.info("git reported '{}' changed files, '{}' of them untracked, in '{}' since '{}'".format(len(change_list), untracked_ctr, indir, rev))
+    return change_list
+
+
+def iter_blobs(indir: str = None, rev: str = None, path_list: list = None):
+    """Read the content of the files at the revision through a single
+    git cat-file process instead of one git call per file.
+    :param indir: {str} - a directory inside a git checkout
+    :param rev: {str}
+    :param path_list: {list} - paths relative to indir
+    :returns generator of (path, content): {tuple} - content is None if the path did not exist
+    """
+    if not path_list:
+        return
+
+    request = b''.join(('{}:./{}\n'.format(rev, path)).encode('utf-8', 'surrogateescape') for path in path_list)
+
+    process = subprocess.Popen(['git', 'cat-file', '--batch'], cwd=indir, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    # Write the requests from a thread so neither pipe can fill up and deadlock
+    writer = threading.Thread(target=write_and_close, args=(process.stdin, request), daemon=True)
+    writer.start()
+    try:
+        for path in path_list:
+            header = process.stdout.readline().split()
+            if len(header) < 2 or header[-1] == b'missing':
+                yield path, None
+                continue
+            size = int(header[2])
+            content = process.stdout.read(size)
+            process.stdout.read(1)
+            yield path, content
+    finally:
+        process.stdout.close()
+        process.wait()
+        writer.join()
+
+
+def write_and_close(fh=None, data: bytes = None) -> None:
+    """Write the data to the pipe and close it.
+    :param fh: {binary file object}
+    :param data: {bytes}
+    """
+    try:
+        fh.write(data)
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            fh.close()
+        except BrokenPipeError:
+            pass
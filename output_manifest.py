@@ -0,0 +1,299 @@
+import os
+import json
+import pathlib
+import logging
+import hashlib
+
+
+# Kept next to the generated files, see OutputManifest
+MANIFEST_BASENAME = '.pycodgen-manifest.json'
+
+MANIFEST_VERSION = '1'
+
+CREATED = 'created'
+
+UPDATED = 'updated'
+
+UNCHANGED = 'unchanged'
+
+STATUS_LIST = [CREATED, UPDATED, UNCHANGED]
+
+
+def get_text_hash(content: str = None) -> str:
+    """Compute the SHA-256 digest of the text as it is written to disk.
+    :param content: {str}
+    :returns digest: {str}
+    """
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class OutputManifest():
+    '''JSON store of the content hash of every generated file.
+    An output is only written when its rendered content differs from
+    what is on disk, so unchanged files keep their mtime and do not
+    trigger downstream rebuilds.  While the size and mtime of a file
+    match its manifest entry the stored hash is trusted; otherwise, e.g.:
+    for a file edited by hand or a missing manifest, the file on disk is
+    hashed instead.
+    '''
+
+    def __init__(self, **kwargs):
+        '''Class constructor
+        :param manifest_file: {str} - the JSON file, None to keep the manifest in memory only
+        '''
+
+        self._manifest_file = kwargs.get('manifest_file')
+
+        self._entries = {}
+        self._changed = False
+        self._counts = {status: 0 for status in STATUS_LIST}
+
+    def __enter__(self):
+        self.load()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.save()
+
+    def load(self) -> None:
+        '''Load the entries, starting empty when the manifest file is missing, unreadable or of another version
+        '''
+        if self._manifest_file is None or not os.path.exists(self._manifest_file):
+            return
+
+        try:
+            with open(self._manifest_file, 'r') as fh:
+                manifest = json.load(fh)
+        except (OSError, ValueError) as e:
+            logging.warning("Could not read manifest file '{}' - ignoring it: {}".format(self._manifest_file, e))
+            return
+
+        if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+            logging.info("Manifest file '{}' was written by another version - ignoring it".format(self._manifest_file))
+            return
+
+        self._entries = manifest.get('files', {})
+        logging.info("Loaded '{}' entries from manifest file '{}'".format(len(self._entries), self._manifest_file))
+
+    def save(self) -> None:
+        '''Write the manifest file when any entry changed.
+        The file is written next to the manifest and renamed over it.
+        '''
+        if self._manifest_file is None or not self._changed:
+            return
+
+        dirname = os.path.dirname(os.path.abspath(self._manifest_file))
+        if not os.path.exists(dirname):
+            pathlib.Path(dirname).mkdir(parents=True, exist_ok=True)
+
+        tmpfile = self._manifest_file + '.tmp'
+        with open(tmpfile, 'w') as fh:
+            json.dump({'version': MANIFEST_VERSION, 'files': self._entries}, fh, indent=1, sort_keys=True)
+        os.replace(tmpfile, self._manifest_file)
+        self._changed = False
+
+        logging.info("Wrote '{}' entries to manifest file '{}'".format(len(self._entries), self._manifest_file))
+
+    def is_unchanged(self, outfile: str = None, digest: str = None) -> bool:
+        '''Check whether the output file already holds the content with this digest.
+        :param outfile: {str}
+        :param digest: {str} - see get_text_hash()
+        :returns is_unchanged: {bool}
+        '''
+        path = os.path.abspath(outfile)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+
+        entry = self._entries.get(path)
+        if entry is not None and entry[1] == stat.st_size and entry[2] == stat.st_mtime_ns:
+            return entry[0] == digest
+
+        with open(path, 'rb') as fh:
+            if hashlib.sha256(fh.read()).hexdigest() != digest:
+                return False
+
+        # Trust the stat of the file from now on
+        self._entries[path] = [digest, stat.st_size, stat.st_mtime_ns]
+        self._changed = True
+        return True
+
+    def get_status(self, outfile: str = None, content: str = None) -> str:
+        '''Get the status writing the content to the output file would have, without writing it.
+        :param outfile: {str}
+        :param content: {str}
+        :returns status: {str} - one of STATUS_LIST
+        '''
+        if self.is_unchanged(outfile, get_text_hash(content)):
+            return UNCHANGED
+        return UPDATED if os.path.exists(outfile) else CREATED
+
+    def write_if_changed(self, outfile: str = None, content: str = None, backup: bool = False) -> str:
+        '''Write the content to the output file unless it already holds it.
+        The content is written next to the file and renamed over it.
+        :param outfile: {str}
+        :param content: {str}
+        :param backup: {bool} - whether to move a file that is replaced to <outfile>.bak
+        :returns status: {str} - one of STATUS_LIST
+        '''
+        digest = get_text_hash(content)
+
+        if self.is_unchanged(outfile, digest):
+            status = UNCHANGED
+        else:
+            status = UPDATED if os.path.exists(outfile) else CREATED
+
+            tmpfile = outfile + '.tmp'
+            with open(tmpfile, 'w', encoding='utf-8') as fh:
+                fh.write(content)
+
+            if backup and status == UPDATED:
+                bak_file = outfile + '.bak'
+                os.replace(outfile, bak_file)
+                logging.info("Backed up outfile '{}' to '{}'".format(outfile, bak_file))
+
+            os.replace(tmpfile, outfile)
+
+            stat = os.stat(outfile)
+            self._entries[os.path.abspath(outfile)] = [digest, stat.st_size, stat.st_mtime_ns]
+            self._changed = True
+
+        self._counts[status] += 1
+        logging.info("Output file '{}' is {}".format(outfile, status))
+        return status
+
+    def get_counts(self) -> dict:
+        '''Get the number of output files per status in this run.
+        :returns counts: {dict} - status => count
+        '''
+        return dict(self._counts)
+
+    def format_summary(self) -> str:
+        '''Summarize the statuses of the output files of this run.
+        :returns summary: {str}
+        '''
+        return "Output files: '{}' created, '{}' updated, '{}' unchanged".format(self._counts[CREATED], self._counts[UPDATED], self._counts[UNCHANGED])
+
+
+class GenerationPlan():
+    '''The package directories and __init__.py files of the modules of
+    a run.  Modules are written as they come in; the directories and
+    __init__.py files a module needs are created the first time a
+    module needs them, with one call each however many modules share
+    them, e.g.: a diagram with thousands of classes in a few packages.
+    Only the paths are kept, never the content of a module.  In a dry
+    run nothing is written and the status of each module is recorded
+    instead, to print the plan.
+    '''
+
+    def __init__(self, **kwargs):
+        '''Class constructor
+        :param dry_run: {bool} - whether to only record what would be written - default is False
+        :param root_dir: {str} - the output root, only the directories below it are packages - default is the current directory
+        '''
+
+        self._dry_run = kwargs.get('dry_run', False)
+        self._root_dir = kwargs.get('root_dir', '')
+
+        self._directory_set = set()
+        self._init_file_set = set()
+        self._module_set = set()
+        self._module_status_list = []
+
+    def add_packages(self, outfile: str = None) -> list:
+        '''Add the package directories of a module
+        :param outfile: {str} - e.g.: some/package/module.py, each directory below the output root gets an empty __init__.py so they form a package
+        :returns directory_list: {list} - the directories not added before, each after its parent
+        :raises ValueError: if the module is not below the output root
+        '''
+        relpath = os.path.relpath(outfile, self._root_dir or os.curdir)
+        if relpath == os.pardir or relpath.startswith(os.pardir + os.sep):
+            raise ValueError("Output file '{}' is not below the output root '{}'".format(outfile, self._root_dir or os.curdir))
+
+        directory_list = []
+        reldir = os.path.dirname(relpath)
+        while reldir != '':
+            dirname = os.path.join(self._root_dir, reldir)
+            if dirname in self._directory_set:
+                break
+            self._directory_set.add(dirname)
+            self._init_file_set.add(os.path.join(dirname, '__init__.py'))
+            directory_list.append(dirname)
+            reldir = os.path.dirname(reldir)
+
+        return directory_list[::-1]
+
+    def create_packages(self, directory_list: list = None) -> None:
+        '''Create the directories and their __init__.py files that do not
+        exist yet, with one call each rather than checking for them first.
+        :param directory_list: {list} - each after its parent, see add_packages()
+        '''
+        for dirname in directory_list:
+            try:
+                os.mkdir(dirname)
+                logging.info("created directory '{}'".format(dirname))
+            except FileExistsError:
+                pass
+
+            file = os.path.join(dirname, '__init__.py')
+            try:
+                pathlib.Path(file).touch(exist_ok=False)
+                logging.info("touched file '{}'".format(file))
+            except FileExistsError:
+                pass
+
+    def write_module(self, outfile: str = None, content: str = None, manifest: OutputManifest = None, backup: bool = False) -> str:
+        '''Create the packages of the module that were not created yet, then
+        write the module unless it already holds the content, see
+        OutputManifest.write_if_changed().  In a dry run only the status
+        the write would have is recorded.
+        :param outfile: {str}
+        :param content: {str}
+        :param manifest: {OutputManifest}
+        :param backup: {bool}
+        :returns status: {str} - one of STATUS_LIST
+        :raises ValueError: if the module is not below the output root
+        '''
+        if manifest is None:
+            manifest = OutputManifest()
+
+        if outfile in self._module_set:
+            logging.warning("Output file '{}' was already generated in this run - going to replace it".format(outfile))
+        self._module_set.add(outfile)
+
+        directory_list = self.add_packages(outfile)
+
+        if self._dry_run:
+            status = manifest.get_status(outfile, content)
+            self._module_status_list.append((outfile, status))
+            return status
+
+        self.create_packages(directory_list)
+        return manifest.write_if_changed(outfile, content, backup=backup)
+
+    def format_plan(self) -> str:
+        '''Describe what the dry run would have done, without touching the disk.
+        :returns plan: {str}
+        '''
+        line_list = []
+        for dirname in sorted(self._directory_set):
+            if not os.path.isdir(dirname):
+                line_list.append("Would create directory '{}'".format(dirname))
+
+        for file in sorted(self._init_file_set):
+            if not os.path.exists(file):
+                line_list.append("Would create file '{}'".format(file))
+
+        counts = {status: 0 for status in STATUS_LIST}
+        for outfile, status in self._module_status_list:
+            counts[status] += 1
+            if status == UNCHANGED:
+                line_list.append("Output file '{}' is unchanged".format(outfile))
+            else:
+                line_list.append("Would write output file '{}' ({})".format(outfile, status))
+
+        line_list.append("Plan: '{}' directories, '{}' __init__.py files and '{}' modules - '{}' created, '{}' updated, '{}' unchanged".format(
+            len(self._directory_set), len(self._init_file_set), len(self._module_status_list), counts[CREATED], counts[UPDATED], counts[UNCHANGED]))
+
+        return '\n'.join(line_list)
@@ -0,0 +1,55 @@
+import importlib
+import click
+
+
+# subcommand => (module, command); each module is only imported when its subcommand runs
+SUBCOMMANDS = {
+    'analyze': ('code_base_analyzer', 'main'),
+    'function': ('function_generator', 'main'),
+    'server': ('generation_server', 'main'),
+    'uml': ('umlet_class_diagram_to_python_api', 'main'),
+}
+
+
+class LazyGroup(click.Group):
+    '''A click group that imports the module of a subcommand only once
+    that subcommand is invoked, so a short run of one tool does not pay
+    for importing the dependencies of the others.
+    '''
+
+    def __init__(self, **kwargs):
+        '''Class constructor
+        :param lazy_subcommands: {dict} - subcommand => (module, command)
+        '''
+
+        self._lazy_subcommands = kwargs.pop('lazy_subcommands')
+        super().__init__(**kwargs)
+
+    def list_commands(self, ctx) -> list:
+        '''List the subcommands without importing them
+        :param ctx: {click.Context}
+        :returns subcommand_list: {list}
+        '''
+        return sorted(self._lazy_subcommands)
+
+    def get_command(self, ctx, cmd_name: str = None):
+        '''Import the module of the subcommand and return its command
+        :param ctx: {click.Context}
+        :param cmd_name: {str}
+        :returns command: {click.Command} - None if there is no such subcommand
+        '''
+        if cmd_name not in self._lazy_subcommands:
+            return None
+
+        module_name, command_name = self._lazy_subcommands[cmd_name]
+        return getattr(importlib.import_module(module_name), command_name)
+
+
+@click.group(cls=LazyGroup, lazy_subcommands=SUBCOMMANDS)
+def main():
+    """Generate Python code from function specs and Umlet class diagrams and analyze code-bases
+    """
+
+
+if __name__ == "__main__":
+    main()
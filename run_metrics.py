@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import time
+import heapq
+import logging
+import contextlib
+
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak RSS is then not reported
+    resource = None
+
+
+DEFAULT_TOP_N = 10
+
+METRICS_FILE_SUFFIX = '.metrics.json'
+
+
+def get_metrics_file(outfile: str = None) -> str:
+    """Derive the metrics sidecar file from the report or output file.
+    :param outfile: {str}
+    :returns metrics_file: {str} - e.g.: report.txt => report.metrics.json
+    """
+    return os.path.splitext(outfile)[0] + METRICS_FILE_SUFFIX
+
+
+def get_peak_rss(who: int = None) -> int:
+    """Get the peak resident set size.
+    :param who: {int} - resource.RUSAGE_SELF or resource.RUSAGE_CHILDREN
+    :returns peak_rss: {int} - in bytes, None where it is not available
+    """
+    if resource is None:
+        return None
+
+    max_rss = resource.getrusage(who).ru_maxrss
+
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == 'darwin':
+        return max_rss
+    return max_rss * 1024
+
+
+def time_phase(metrics=None, phase: str = None):
+    """Time a with statement as a phase of the metrics, if any.
+    :param metrics: {RunMetrics} - None when metrics are not collected
+    :param phase: {str}
+    :returns context manager
+    """
+    if metrics is None:
+        return contextlib.nullcontext()
+    return metrics.phase(phase)
+
+
+def time_iter(metrics=None, phase: str = None, iterable=None):
+    """Time the work done inside a lazy iterable as a phase of the metrics, if any.
+    :param metrics: {RunMetrics} - None when metrics are not collected
+    :param phase: {str}
+    :param iterable: {iterable}
+    :returns iterable
+    """
+    if metrics is None:
+        return iterable
+    return metrics.time_iter(phase, iterable)
+
+
+class RunMetrics():
+    '''Records where the time of one run goes.
+    Each phase accumulates its wall time over any number of calls;
+    phases may nest, e.g.: 'walk' runs inside 'analyze' when the tree
+    is analyzed while it is being walked.  Each input adds to the
+    file, byte and line totals, and the slowest inputs are kept.
+    '''
+
+    def __init__(self, **kwargs):
+        '''Class constructor
+        :param tool: {str} - the name of the program being measured
+        :param top_n: {int} - the number of slowest inputs to keep
+        '''
+
+        self._tool = kwargs['tool']
+        self._top_n = kwargs.get('top_n', DEFAULT_TOP_N)
+
+        self._started = datetime.now()
+        self._start_time = time.perf_counter()
+
+        # phase => [seconds, calls], in the order the phases first ran
+        self._phase_lookup = {}
+
+        self._file_ctr = 0
+        self._byte_ctr = 0
+        self._line_ctr = 0
+
+        # Min-heap of (seconds, sequence, name, bytes, lines) holding the slowest inputs
+        self._slowest_heap = []
+
+    def add_phase_time(self, phase: str = None, seconds: float = None) -> None:
+        '''Add to the wall time of a phase
+        :param phase: {str}
+        :param seconds: {float}
+        '''
+        entry = self._phase_lookup.setdefault(phase, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    @contextlib.contextmanager
+    def phase(self, phase: str = None):
+        '''Time the body of a with statement as one call of the phase
+        :param phase: {str}
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase_time(phase, time.perf_counter() - start)
+
+    def time_iter(self, phase: str = None, iterable=None):
+        '''Time only the work done inside a lazy iterable, e.g.: the
+        directory walk when its files are consumed as they are found
+        :param phase: {str}
+        :param iterable: {iterable}
+        :returns generator of the items of the iterable
+        '''
+        seconds = 0.0
+        iterator = iter(iterable)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += time.perf_counter() - start
+                yield item
+        finally:
+            self.add_phase_time(phase, seconds)
+
+    def add_input(self, name: str = None, seconds: float = None, size: int = 0, lines: int = 0) -> None:
+        '''Record one processed input, e.g.: a file or a diagram panel
+        :param name: {str}
+        :param seconds: {float} - the time spent on it
+        :param size: {int} - its size in bytes
+        :param lines: {int} - its number of lines
+        '''
+        self._file_ctr += 1
+        self._byte_ctr += size
+        self._line_ctr += lines
+
+        item = (seconds, self._file_ctr, name, size, lines)
+        if len(self._slowest_heap) < self._top_n:
+            heapq.heappush(self._slowest_heap, item)
+        elif seconds > self._slowest_heap[0][0]:
+            heapq.heapreplace(self._slowest_heap, item)
+
+    def get_metrics(self) -> dict:
+        '''Get the metrics collected so far
+        :returns metrics: {dict}
+        '''
+        wall_seconds = time.perf_counter() - self._start_time
+
+        def per_second(count):
+            return round(count / wall_seconds, 3) if wall_seconds > 0 else None
+
+        return {
+            'tool': self._tool,
+            'started': self._started.isoformat(),
+            'wall_seconds': round(wall_seconds, 6),
+            'phases': {phase: {'seconds': round(seconds, 6), 'calls': calls} for phase, (seconds, calls) in self._phase_lookup.items()},
+            'files': self._file_ctr,
+            'bytes': self._byte_ctr,
+            'lines': self._line_ctr,
+            'files_per_sec': per_second(self._file_ctr),
+            'bytes_per_sec': per_second(self._byte_ctr),
+            'lines_per_sec': per_second(self._line_ctr),
+            'peak_rss_bytes': get_peak_rss(resource.RUSAGE_SELF) if resource is not None else None,
+            'peak_rss_children_bytes': get_peak_rss(resource.RUSAGE_CHILDREN) if resource is not None else None,
+            'slowest_inputs': [{'name': name, 'seconds': round(seconds, 6), 'bytes': size, 'lines': lines}
+                               for seconds, _, name, size, lines in sorted(self._slowest_heap, reverse=True)],
+        }
+
+    def write(self, outfile: str = None) -> None:
+        '''Write the metrics as a JSON sidecar file
+        :param outfile: {str}
+        '''
+        with open(outfile, 'w') as fh:
+            json.dump(self.get_metrics(), fh, indent=2)
+            fh.write('\n')
+
+        print("Wrote metrics file '{}'".format(outfile))
+        logging.info("Wrote metrics file '{}'".format(outfile))
@@ -0,0 +1,52 @@
+import os
+import sys
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_base_analyzer  # noqa: E402
+from analysis_cache import AnalysisCache  # noqa: E402
+
+
+def write_file(file: str = None, content: str = None) -> None:
+    """Write a source file
+    :param file: {str}
+    :param content: {str}
+    """
+    with open(file, 'w') as fh:
+        fh.write(content)
+
+
+def get_cached_paths(cache_file: str = None) -> list:
+    """Get the paths of the cache entries
+    :param cache_file: {str}
+    :returns path_list: {list}
+    """
+    with sqlite3.connect(cache_file) as conn:
+        return sorted(row[0] for row in conn.execute("SELECT path FROM files"))
+
+
+def test_file_removed_after_the_walk_is_dropped(tmp_path):
+    kept = str(tmp_path / 'kept.py')
+    removed = str(tmp_path / 'removed.py')
+    write_file(kept, 'import os\n\n\ndef kept():\n    return os.sep\n')
+    write_file(removed, 'def removed():\n    return 1\n')
+    cache_file = str(tmp_path / 'cache.sqlite')
+
+    code_base_analyzer.analyze_file_list_cached([kept, removed], workers=1, cache_file=cache_file)
+    assert get_cached_paths(cache_file) == sorted([os.path.abspath(kept), os.path.abspath(removed)])
+
+    # The walk still lists the file, but it is gone by the time the cache checks it
+    os.remove(removed)
+    totals = code_base_analyzer.analyze_file_list_cached([kept, removed], workers=1, cache_file=cache_file)
+
+    assert totals == code_base_analyzer.analyze_file_list([kept], workers=1)
+    assert get_cached_paths(cache_file) == [os.path.abspath(kept)]
+
+
+def test_removed_file_is_not_stale(tmp_path):
+    missing = str(tmp_path / 'missing.py')
+
+    with AnalysisCache(cache_file=str(tmp_path / 'cache.sqlite')) as cache:
+        assert cache.get_stale_files([missing]) == []
+        assert cache.get_counters(missing) is None
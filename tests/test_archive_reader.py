@@ -0,0 +1,118 @@
+import os
+import sys
+import tarfile
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_base_analyzer  # noqa: E402
+from archive_reader import iter_archive_members  # noqa: E402
+
+
+# Relative path on disk -> content; the vendor/ directory is packed as a nested archive
+TREE_CONTENT_LOOKUP = {
+    'setup.py': b'from setuptools import setup\n\nsetup()\n',
+    'pkg/__init__.py': b'',
+    'pkg/module.py': b'import os\n\n\nclass Module():\n    # TODO: more\n    def run(self):\n        return os.sep\n',
+    'pkg/sub/deep.py': b'def deep():\n    pass\n',
+    'pkg/__pycache__/module.py': b'import excluded\n',
+    # A name that is not valid UTF-8
+    os.fsdecode(b'pkg/caf\xe9.py'): b'import sys\n',
+    'vendor/lib.py': b'from os import path\n\n\ndef lib():\n    return path\n',
+    'vendor/__init__.py': b'',
+}
+
+# Content that is not valid UTF-8, only the bytes engine counts it, the text engine fails on it like open() does
+NON_UTF8_CONTENT_LOOKUP = {
+    'pkg/latin1.py': b'# caf\xe9\n# TODO r\xe9sum\xe9\ndef f():\n    return "\xff"\n',
+}
+
+
+def write_tree(indir: str = None, non_utf8: bool = True) -> None:
+    """Write the files of the tree on disk
+    :param indir: {str}
+    :param non_utf8: {bool} - whether to write the files with content that is not valid UTF-8
+    """
+    content_lookup = dict(TREE_CONTENT_LOOKUP, **(NON_UTF8_CONTENT_LOOKUP if non_utf8 else {}))
+    for relpath, content in content_lookup.items():
+        path = os.path.join(indir, *relpath.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as fh:
+            fh.write(content)
+
+
+def write_zip(archive: str = None, indir: str = None, prefix: str = None) -> None:
+    """Pack the directory into a zip archive, with an entry for each directory
+    :param archive: {str}
+    :param indir: {str}
+    :param prefix: {str} - only the paths below this directory of indir
+    """
+    with zipfile.ZipFile(archive, 'w') as zf:
+        for path, subdirs, files in os.walk(os.path.join(indir, prefix)):
+            relpath = os.path.relpath(path, indir).replace(os.sep, '/')
+            zf.writestr(relpath + '/', b'')
+            for name in files:
+                # zipfile only writes UTF-8 names, so the bytes of other names are read as cp437 like unflagged names
+                arcname = (relpath + '/' + name).encode('utf-8', errors='surrogateescape').decode('cp437')
+                zf.write(os.path.join(path, name), arcname)
+
+
+def write_archive(archive: str = None, indir: str = None, workdir: str = None) -> None:
+    """Pack the tree into a .tar.gz or .zip archive, with vendor/ as an inner zip archive
+    :param archive: {str}
+    :param indir: {str}
+    :param workdir: {str} - for the inner archive
+    """
+    inner_archive = os.path.join(workdir, 'vendor.zip')
+    write_zip(inner_archive, indir, 'vendor')
+
+    if archive.endswith('.zip'):
+        write_zip(archive, indir, 'pkg')
+        with zipfile.ZipFile(archive, 'a') as zf:
+            zf.write(os.path.join(indir, 'setup.py'), 'setup.py')
+            zf.write(inner_archive, 'vendor.zip')
+        return
+
+    with tarfile.open(archive, 'w:gz') as tf:
+        # Directory members included
+        tf.add(os.path.join(indir, 'pkg'), 'pkg')
+        tf.add(os.path.join(indir, 'setup.py'), 'setup.py')
+        tf.add(inner_archive, 'vendor.zip')
+
+
+@pytest.mark.parametrize('archive_name', ['tree.tar.gz', 'tree.zip'])
+@pytest.mark.parametrize('engine', code_base_analyzer.ENGINE_LIST)
+def test_archive_counters_match_the_tree_on_disk(tmp_path, archive_name, engine):
+    indir = str(tmp_path / 'tree')
+    write_tree(indir, engine == 'bytes')
+    archive = str(tmp_path / archive_name)
+    write_archive(archive, indir, str(tmp_path))
+
+    file_options = {'engine': engine, 'mode': 'regex', 'archive_options': {'include_list': None, 'exclude_list': None}}
+    totals = code_base_analyzer.analyze_archive(archive, file_options)
+
+    expected = code_base_analyzer.analyze_file_list(code_base_analyzer.get_file_list(indir), workers=1, file_options={'engine': engine, 'mode': 'regex'})
+    assert totals == expected
+    assert totals['code_files'] == 5 + (engine == 'bytes') and totals['init_files'] == 2
+
+
+def test_archive_members(tmp_path):
+    indir = str(tmp_path / 'tree')
+    write_tree(indir)
+    archive = str(tmp_path / 'tree.tar.gz')
+    write_archive(archive, indir, str(tmp_path))
+
+    relpath_list = sorted(relpath for relpath, _, _ in iter_archive_members(archive))
+
+    assert relpath_list == sorted([
+        'pkg/__init__.py',
+        'pkg/module.py',
+        'pkg/sub/deep.py',
+        'pkg/latin1.py',
+        os.fsdecode(b'pkg/caf\xe9.py'),
+        'setup.py',
+        'vendor.zip/vendor/__init__.py',
+        'vendor.zip/vendor/lib.py',
+    ])
@@ -0,0 +1,36 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_generator import FunctionSpec, generate_function  # noqa: E402
+
+
+# What render_function() produced for this spec before the templates were compiled
+EXPECTED_SOURCE = ''.join([
+    "def convert(infile: None = None, count: int = 0) -> None:\n",
+    "    '''\n",
+    "    :param infile: {None} - the input file\n",
+    "    :param count: {int} - how many\n",
+    "    :returns var: {None} - \n",
+    "    '''\n",
+    "    if infile is None or infile == '':\n",
+    "        logging.error('infile' is not defined)\n",
+    "        sys.exit(1)\n",
+    "    if not os.path.exists(infile):\n",
+    "        logging.error(file 'infile' does not exist)\n",
+    "        sys.exit(1)\n",
+    "\n",
+    "    return var\n",
+])
+
+
+def test_spec_without_return_type_or_datatype():
+    # No return_type: line
+    spec = FunctionSpec.from_lines(['function_name:convert\n', 'function_type:function\n'], 'spec.txt')
+    assert spec.return_type is None
+
+    spec.add_parameter('infile', None, 'None', 'the input file')
+    spec.add_parameter('count', 'int', '0', 'how many')
+
+    assert generate_function(spec) == EXPECTED_SOURCE
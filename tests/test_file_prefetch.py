@@ -0,0 +1,78 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_prefetch import iter_prefetched  # noqa: E402
+
+
+BYTE_BUDGET = 1000
+
+# Seconds after which a prefetch that has not finished is taken as deadlocked
+TIMEOUT = 30
+
+
+def write_files(indir: str = None, size_list: list = None) -> list:
+    """Write one file of each size
+    :param indir: {str}
+    :param size_list: {list} - of sizes in bytes
+    :returns file_list: {list}
+    """
+    file_list = []
+    for i, size in enumerate(size_list):
+        file = os.path.join(indir, 'file-{:03d}.py'.format(i))
+        with open(file, 'wb') as fh:
+            fh.write(bytes([ord('a') + i % 26]) * size)
+        file_list.append(file)
+    return file_list
+
+
+def run_with_timeout(func) -> list:
+    """Collect what the function returns on another thread so a deadlock fails the test instead of hanging it
+    :param func: {callable}
+    :returns result: {list}
+    """
+    result_list = []
+    thread = threading.Thread(target=lambda: result_list.append(func()), daemon=True)
+    thread.start()
+    thread.join(TIMEOUT)
+    assert not thread.is_alive(), 'prefetch did not finish within {} seconds'.format(TIMEOUT)
+    return result_list[0]
+
+
+@pytest.mark.parametrize('depth', [1, 4, 16])
+def test_files_larger_than_the_budget(tmp_path, depth):
+    # Files over, at and under the budget, with runs of each kind
+    size_list = [5000, 10, BYTE_BUDGET, BYTE_BUDGET + 1, 600, 600, 600, 0, 2500, 2500, 999, 1, 400] * 5
+    file_list = write_files(str(tmp_path), size_list)
+
+    result_list = run_with_timeout(lambda: list(iter_prefetched(file_list, depth=depth, byte_budget=BYTE_BUDGET)))
+
+    # Every path once, in order
+    assert [file for file, _ in result_list] == file_list
+
+    for (file, content), size in zip(result_list, size_list):
+        if size > BYTE_BUDGET:
+            assert content is None
+        else:
+            with open(file, 'rb') as fh:
+                assert content == fh.read()
+
+
+def test_consumer_stops_early(tmp_path):
+    file_list = write_files(str(tmp_path), [BYTE_BUDGET + 1, 900, 900, 900, 900] * 4)
+
+    def consume_two():
+        prefetched = iter_prefetched(file_list, depth=8, byte_budget=BYTE_BUDGET)
+        result_list = [next(prefetched), next(prefetched)]
+        # Closing must turn away the readers still waiting for the budget
+        prefetched.close()
+        return result_list
+
+    result_list = run_with_timeout(consume_two)
+
+    assert [file for file, _ in result_list] == file_list[:2]
+    assert result_list[0][1] is None
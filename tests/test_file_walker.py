@@ -0,0 +1,120 @@
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_walker import translate_gitignore_pattern, walk_files, is_walked  # noqa: E402
+
+
+GITIGNORE = '\n'.join([
+    '# build output',
+    '*.log',
+    '!keep.log',
+    '/build',
+    'cache/',
+    'docs/**/*.tmp',
+    '**/generated',
+    '',
+])
+
+TREE_FILE_LIST = [
+    'main.py',
+    'app.log',
+    'keep.log',
+    'build/out.py',
+    'cache/keep.log',
+    'docs/readme.md',
+    'docs/top.tmp',
+    'docs/a/b/deep.tmp',
+    'generated/gen.py',
+    'src/module.py',
+    'src/cache',
+    'src/build/module.py',
+    'src/important.log',
+    'src/debug.log',
+    'src/generated/gen.py',
+    'src/.gitignore',
+]
+
+# What git itself would list with --exclude-standard
+EXPECTED_FILE_LIST = [
+    '.gitignore',
+    'docs/readme.md',
+    'keep.log',
+    'main.py',
+    'src/.gitignore',
+    'src/build/module.py',
+    'src/cache',
+    'src/important.log',
+    'src/module.py',
+]
+
+
+@pytest.mark.parametrize('pattern, path, matched', [
+    ('*.log', 'app.log', True),
+    ('*.log', 'src/deep/app.log', True),
+    ('*.log', 'app.logs', False),
+    ('/build', 'build', True),
+    ('/build', 'src/build', False),
+    ('src/build', 'src/build', True),
+    ('src/build', 'lib/src/build', False),
+    ('docs/**/*.tmp', 'docs/top.tmp', True),
+    ('docs/**/*.tmp', 'docs/a/b/deep.tmp', True),
+    ('docs/**/*.tmp', 'src/docs/top.tmp', False),
+    ('**/generated', 'generated', True),
+    ('**/generated', 'a/b/generated', True),
+    ('logs/**', 'logs/a/b.txt', True),
+    ('logs/**', 'logs', False),
+    ('a?c', 'abc', True),
+    ('a?c', 'a/c', False),
+    ('[!a]bc', 'xbc', True),
+    ('[!a]bc', 'abc', False),
+    ('\\#literal', '#literal', True),
+])
+def test_translate_gitignore_pattern(pattern, path, matched):
+    assert bool(re.fullmatch(translate_gitignore_pattern(pattern.lstrip('!')), path)) == matched
+
+
+def make_tree(indir: str = None) -> None:
+    """Write the fixture tree with its .gitignore files
+    :param indir: {str}
+    """
+    for relpath in TREE_FILE_LIST:
+        path = os.path.join(indir, *relpath.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as fh:
+            fh.write('')
+
+    with open(os.path.join(indir, '.gitignore'), 'w') as fh:
+        fh.write(GITIGNORE)
+    with open(os.path.join(indir, 'src', '.gitignore'), 'w') as fh:
+        fh.write('!important.log\n')
+
+
+def test_walk_files_honors_gitignore(tmp_path):
+    indir = str(tmp_path)
+    make_tree(indir)
+    visited_list = []
+
+    file_list = sorted(os.path.relpath(path, indir).replace(os.sep, '/') for path in walk_files(indir, use_gitignore=True, dir_callback=visited_list.append))
+
+    assert file_list == EXPECTED_FILE_LIST
+
+    # Ignored directories are pruned, not walked and filtered
+    visited_list = sorted(os.path.relpath(path, indir).replace(os.sep, '/') for path in visited_list)
+    assert visited_list == ['.', 'docs', 'docs/a', 'docs/a/b', 'src', 'src/build']
+
+    for relpath in TREE_FILE_LIST + ['.gitignore']:
+        assert is_walked(indir, relpath, use_gitignore=True) == (relpath in EXPECTED_FILE_LIST), relpath
+
+
+def test_walk_files_without_gitignore(tmp_path):
+    indir = str(tmp_path)
+    make_tree(indir)
+
+    file_list = sorted(os.path.relpath(path, indir).replace(os.sep, '/') for path in walk_files(indir))
+
+    assert file_list == sorted(TREE_FILE_LIST + ['.gitignore'])
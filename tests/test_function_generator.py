@@ -0,0 +1,74 @@
+import io
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import function_generator  # noqa: E402
+from code_generator import FunctionSpec, generate_function  # noqa: E402
+
+
+def write_specs(spec_file: str = None, spec_list: list = None) -> None:
+    """Write the specs to one file, separated by SPEC_SEPARATOR lines
+    :param spec_file: {str}
+    :param spec_list: {list} - of spec texts
+    """
+    with open(spec_file, 'w') as fh:
+        fh.write((function_generator.SPEC_SEPARATOR + '\n').join(spec_list))
+
+
+def test_function_name_must_be_an_identifier():
+    with pytest.raises(ValueError, match='not a Python identifier'):
+        FunctionSpec.from_lines(['function_name:../../x\n'], 'spec.txt')
+    with pytest.raises(ValueError, match='not a Python identifier'):
+        FunctionSpec.from_record({'function_name': '../../x'})
+
+
+def test_failing_spec_does_not_stop_the_batch(tmp_path, monkeypatch):
+    spec_file = str(tmp_path / 'specs.txt')
+    outdir = str(tmp_path / 'out')
+    os.mkdir(outdir)
+    write_specs(spec_file, ['function_name:first\n', 'function_name:broken\n', 'function_name:../../escaped\n', 'function_name:last\n'])
+
+    generate_function = function_generator.generate_function
+
+    def fail_on_broken(spec):
+        if spec.function_name == 'broken':
+            raise TypeError('cannot render')
+        return generate_function(spec)
+
+    monkeypatch.setattr(function_generator, 'generate_function', fail_on_broken)
+
+    failed_ctr = function_generator.generate_function_code_batch(spec_file, outdir, workers=1)
+
+    assert failed_ctr == 2
+    assert sorted(name for name in os.listdir(outdir) if name.endswith('.py')) == ['first.py', 'last.py']
+    assert not os.path.exists(str(tmp_path.parent / 'escaped.py'))
+
+
+def test_jsonl_malformed_record_is_reported_and_skipped(capsys):
+    good = b'{"function_name": "good", "parameters": [{"name": "infile", "datatype": "str"}]}\n'
+    malformed = b'{"function_name": "bad", \n'
+    infh = io.BytesIO(good + malformed)
+    outfh = io.StringIO()
+
+    generated_ctr, failed_ctr = function_generator.generate_function_code_jsonl(infh, outfh)
+
+    assert (generated_ctr, failed_ctr) == (1, 1)
+    assert outfh.getvalue() == generate_function(FunctionSpec.from_record(json.loads(good)))
+    # The error names the line and byte offset of the bad record
+    assert 'FAILED record at line 2 offset {}:'.format(len(good)) in capsys.readouterr().err
+
+
+def test_jsonl_malformed_record_with_shards(tmp_path, capsys):
+    infh = io.BytesIO(b'[1]\n{"function_name": "first"}\n\n{"function_name": "second"}\n')
+    outdir = str(tmp_path)
+
+    generated_ctr, failed_ctr = function_generator.generate_function_code_jsonl(infh, None, outdir, shard_size=1)
+
+    assert (generated_ctr, failed_ctr) == (2, 1)
+    assert sorted(name for name in os.listdir(outdir) if name.endswith('.py')) == [function_generator.JSONL_SHARD_FORMAT.format(0), function_generator.JSONL_SHARD_FORMAT.format(1)]
+    assert 'FAILED record at line 1 offset 0: record is a JSON list and not an object' in capsys.readouterr().err
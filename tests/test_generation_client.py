@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generation_client  # noqa: E402
+
+
+@pytest.mark.parametrize('path', ['/tmp/escaped.py', '../escaped.py', 'package/../../escaped.py', ''])
+def test_module_path_outside_the_current_directory_is_rejected(tmp_path, monkeypatch, path):
+    monkeypatch.chdir(tmp_path)
+    response = {'files': [{'path': 'package/kept.py', 'content': 'KEPT = 1\n'}, {'path': path, 'content': 'ESCAPED = 1\n'}]}
+
+    with pytest.raises(ValueError, match='not below the current directory'):
+        generation_client.write_modules(response, str(tmp_path / 'manifest.json'))
+
+    # Nothing is written when any path is rejected
+    assert not os.path.exists(str(tmp_path / 'package'))
+
+
+def test_socket_dir_open_to_others_is_rejected(tmp_path):
+    socket_dir = str(tmp_path / 'sockets')
+    generation_client.ensure_socket_dir(socket_dir)
+    assert os.stat(socket_dir).st_mode & 0o777 == 0o700
+
+    os.chmod(socket_dir, 0o777)
+    with pytest.raises(PermissionError):
+        generation_client.ensure_socket_dir(socket_dir)
@@ -0,0 +1,64 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_base_analyzer  # noqa: E402
+from git_changes import get_changed_files, STATUS_ADDED  # noqa: E402
+
+
+def git(indir: str = None, *args) -> None:
+    """Run a git command in the checkout
+    :param indir: {str}
+    """
+    subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + list(args), cwd=indir, check=True, stdout=subprocess.DEVNULL)
+
+
+def write_file(file: str = None, content: str = None) -> None:
+    """Write a source file
+    :param file: {str}
+    :param content: {str}
+    """
+    with open(file, 'w') as fh:
+        fh.write(content)
+
+
+def full_scan(indir: str = None, use_gitignore: bool = False) -> dict:
+    """Analyze every file of the tree
+    :param indir: {str}
+    :param use_gitignore: {bool}
+    :returns totals: {dict}
+    """
+    return code_base_analyzer.analyze_file_list(code_base_analyzer.get_file_list(indir, use_gitignore=use_gitignore), workers=1)
+
+
+@pytest.mark.parametrize('use_gitignore', [False, True])
+def test_untracked_files_match_a_full_scan(tmp_path, use_gitignore):
+    indir = str(tmp_path / 'repo')
+    os.mkdir(indir)
+    git(indir, 'init', '-q')
+    write_file(os.path.join(indir, 'tracked.py'), 'def tracked():\n    return 1\n')
+    write_file(os.path.join(indir, '.gitignore'), 'ignored.py\n')
+    git(indir, 'add', 'tracked.py', '.gitignore')
+    git(indir, 'commit', '-q', '-m', 'base')
+
+    # The base report describes the tree at the revision
+    base_report = str(tmp_path / 'base.txt')
+    code_base_analyzer.write_report(full_scan(indir, use_gitignore), indir, base_report)
+
+    write_file(os.path.join(indir, 'untracked.py'), 'import sys\n\n\ndef untracked():\n    return sys.argv\n')
+    write_file(os.path.join(indir, 'ignored.py'), 'import os\n')
+
+    change_list = get_changed_files(indir, 'HEAD', use_gitignore)
+    assert (STATUS_ADDED, 'untracked.py') in change_list
+    # Ignored files are only left out when the full scan leaves them out too
+    assert ((STATUS_ADDED, 'ignored.py') in change_list) == (not use_gitignore)
+
+    delta = code_base_analyzer.analyze_git_delta(indir, 'HEAD', base_report, workers=1, use_gitignore=use_gitignore)
+    full = full_scan(indir, use_gitignore)
+
+    counter_names = code_base_analyzer.get_counter_names()
+    assert {name: delta[name] for name in counter_names} == {name: full[name] for name in counter_names}
@@ -0,0 +1,77 @@
+import io
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code_base_analyzer  # noqa: E402
+
+
+LINE_LIST = [
+    # Blank lines
+    '\n', '   \n', '\t\n', '　\n',
+    # Comments, also indented
+    '#\n', '# comment\n', '    # indented comment\n', '\t#\tTODO: tabs\n', '#TODO fix\n', '    #   TODO: indented\n',
+    '# not a TODO\n', '## TODO\n', '# TODO\n',
+    # '#' inside strings is not a comment
+    "x = '# not a comment'\n", '"# TODO in a string"\n', "print('#')  # trailing comment\n",
+    # Docstring-only lines
+    '"""\n', '    """Docstring only."""\n', "'''class Foo in a docstring'''\n", '    def foo in a docstring\n', 'import this in a docstring\n',
+    # Prefixes
+    'class Foo:\n', '    class Foo(Bar):\n', 'classification = 1\n', 'klass = 1\n',
+    'def foo():\n', '    def foo(self):\n', 'def\tfoo():\n', 'def\n', 'def(\n', 'deferred = 1\n', 'async def foo():\n',
+    'import os\n', '    import os\n', 'importlib.reload(os)\n', 'from os import path\n', 'fromage = 1\n', '　def foo():\n',
+]
+
+
+def legacy_count_lines(lines=None, counters: dict = None) -> dict:
+    """The re.match chain the first-character classifier replaced, kept as the reference
+    :param lines: {iterable}
+    :param counters: {dict}
+    :returns counters: {dict}
+    """
+    for line in lines:
+        counters['lines'] += 1
+        line = line.strip()
+        if re.match(r'^\s*$', line):
+            counters['blank_lines'] += 1
+            continue
+
+        if re.match(r'^\s*class', line):
+            counters['classes'] += 1
+
+        if re.match(r'^\s*#\s*TODO', line):
+            counters['todos'] += 1
+
+        if re.match(r'^\s*def\s+', line):
+            counters['functions'] += 1
+
+        if re.match(r'^import', line):
+            counters['imports'] += 1
+
+        if re.match(r'^from', line):
+            counters['from_imports'] += 1
+
+        if re.match(r'^\s*#', line):
+            counters['comments'] += 1
+
+    return counters
+
+
+@pytest.mark.parametrize('line', LINE_LIST)
+def test_line_counters_match_the_re_match_chain(line):
+    expected = legacy_count_lines([line], code_base_analyzer.new_counters())
+
+    assert code_base_analyzer.count_lines([line], code_base_analyzer.new_counters()) == expected
+    assert code_base_analyzer.count_stream_bytes(io.BytesIO(line.encode('utf-8')), code_base_analyzer.new_counters()) == expected
+
+
+def test_source_counters_match_the_re_match_chain():
+    source = ''.join(LINE_LIST)
+    expected = legacy_count_lines(io.StringIO(source), code_base_analyzer.new_counters())
+
+    assert code_base_analyzer.count_lines(io.StringIO(source), code_base_analyzer.new_counters()) == expected
+    assert code_base_analyzer.count_stream_bytes(io.BytesIO(source.encode('utf-8')), code_base_analyzer.new_counters()) == expected
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from output_manifest import GenerationPlan  # noqa: E402
+
+
+def test_packages_stop_at_the_output_root(tmp_path):
+    root_dir = str(tmp_path / 'out')
+    os.mkdir(root_dir)
+    plan = GenerationPlan(root_dir=root_dir)
+
+    plan.write_module(os.path.join(root_dir, 'pkg', 'sub', 'module.py'), 'MODULE = 1\n')
+    plan.write_module(os.path.join(root_dir, 'pkg', 'other.py'), 'OTHER = 1\n')
+    plan.write_module(os.path.join(root_dir, 'top.py'), 'TOP = 1\n')
+
+    init_file_list = sorted(os.path.relpath(os.path.join(path, name), str(tmp_path)) for path, subdirs, files in os.walk(str(tmp_path)) for name in files if name == '__init__.py')
+    assert init_file_list == [os.path.join('out', 'pkg', '__init__.py'), os.path.join('out', 'pkg', 'sub', '__init__.py')]
+
+
+def test_absolute_outfile_below_the_current_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    plan = GenerationPlan(dry_run=True)
+
+    plan.write_module(str(tmp_path / 'pkg' / 'module.py'), 'MODULE = 1\n')
+
+    # No package is planned in any ancestor of the current directory
+    assert plan.format_plan().splitlines()[:2] == ["Would create directory 'pkg'", "Would create file '{}'".format(os.path.join('pkg', '__init__.py'))]
+
+
+def test_outfile_outside_the_output_root(tmp_path):
+    plan = GenerationPlan(root_dir=str(tmp_path / 'out'))
+
+    with pytest.raises(ValueError, match='not below the output root'):
+        plan.write_module(str(tmp_path / 'elsewhere' / 'module.py'), 'MODULE = 1\n')
+
+    assert not os.path.exists(str(tmp_path / 'elsewhere'))
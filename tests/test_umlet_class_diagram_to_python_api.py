@@ -0,0 +1,53 @@
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import umlet_class_diagram_to_python_api as umlet  # noqa: E402
+
+
+INFILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples', 'parser.uxf')
+
+
+def read_tree(indir: str = None) -> dict:
+    """Read every file below the directory
+    :param indir: {str}
+    :returns content_lookup: {dict} - relative path -> content
+    """
+    content_lookup = {}
+    for path, subdirs, files in os.walk(indir):
+        for name in files:
+            file = os.path.join(path, name)
+            with open(file, 'rb') as fh:
+                content_lookup[os.path.relpath(file, indir)] = fh.read()
+    return content_lookup
+
+
+def convert_in(outdir: str = None, workers: int = None) -> dict:
+    """Convert the example diagram with the modules written below the directory
+    :param outdir: {str}
+    :param workers: {int}
+    :returns content_lookup: {dict} - the generated tree
+    """
+    os.mkdir(outdir)
+    cwd = os.getcwd()
+    os.chdir(outdir)
+    try:
+        umlet.convert(INFILE, os.path.join(outdir, 'parser.py'), workers=workers)
+    finally:
+        os.chdir(cwd)
+    return read_tree(outdir)
+
+
+def test_workers_generate_identical_trees(tmp_path, monkeypatch, caplog):
+    # One panel per batch, so the example diagram is spread over the process pool
+    monkeypatch.setattr(umlet, 'BATCH_SIZE', 1)
+    caplog.set_level(logging.INFO)
+
+    serial_tree = convert_in(str(tmp_path / 'workers-1'), workers=1)
+    parallel_tree = convert_in(str(tmp_path / 'workers-4'), workers=4)
+
+    assert "Going to generate the panels with '4' workers" in caplog.text
+    assert any(path.endswith('.py') and not path.endswith('__init__.py') for path in serial_tree)
+    assert parallel_tree == serial_tree
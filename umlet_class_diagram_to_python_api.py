@@ -3,15 +3,15 @@ import sys
 import click
 import pathlib
 import logging
-import shutil
-import calendar
 import time
-import xml.etree.ElementTree as ET
+import itertools
+import collections
 
-from pathlib import Path
 from colorama import Fore, Style
+from run_metrics import RunMetrics, get_metrics_file, time_phase, time_iter
+from code_generator import iter_panel_attributes, parse_panel, get_class_outfile, render_class_definition
+from output_manifest import OutputManifest, GenerationPlan, MANIFEST_BASENAME, UNCHANGED
 from datetime import datetime
-from datetime import date
 
 DEFAULT_VERBOSE = False
 
@@ -21,260 +21,174 @@ LOGGING_FORMAT = "%(levelname)s : %(asctime)s : %(pathname)s : %(lineno)d : %(me
 
 LOG_LEVEL = logging.INFO
 
+DEFAULT_WORKERS = os.cpu_count() or 1
 
-def get_panel_attributes_list(infile: str = None) -> list:
-    """
+# Number of panels handed to a worker process at a time
+BATCH_SIZE = 64
+
+
+class LogRecordCollector(logging.Handler):
+    '''Keeps the log records of a worker process, so the parent can
+    replay them in panel order instead of the workers interleaving
+    their lines in the log file.
+    '''
+
+    def __init__(self, **kwargs):
+        '''Class constructor
+        :param level: {int} - default is logging.NOTSET
+        '''
+        super().__init__(kwargs.get('level', logging.NOTSET))
+
+        self.record_list = []
+
+    def emit(self, record) -> None:
+        '''Keep the record
+        :param record: {logging.LogRecord}
+        '''
+        # Render the message now, so the record pickles whatever its arguments were
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        self.record_list.append(record)
+
+
+def render_panel(content: str = None, pa_attrib_ctr: int = None) -> tuple:
+    """Parse one panel and render the module of its class.
+    :param content: {str} - the panel_attributes text
+    :param pa_attrib_ctr: {int} - the number of the panel in the diagram
+    :returns (package_name, outfile, source, line_ctr, parse_seconds, render_seconds): {tuple}
     """
-    tree = ET.parse(infile)
-    root = tree.getroot()
-    panel_attributes_list = []
-    for panel_attributes in root.iter('panel_attributes'):
-        panel_attributes_list.append(panel_attributes)
+    logging.info("Here is the content for panel_attributes number '{}' '{}'".format(content, pa_attrib_ctr))
+
+    start_time = time.perf_counter()
+    package_name, class_desc, inherits_from_class, import_list, attribute_list, method_list, is_singleton, line_ctr = parse_panel(content)
+    parse_seconds = time.perf_counter() - start_time
 
-    return panel_attributes_list
+    start_time = time.perf_counter()
+    class_name, outfile = get_class_outfile(package_name)
+    source = render_class_definition(class_name, class_desc, inherits_from_class, import_list, attribute_list, method_list, is_singleton)
+    render_seconds = time.perf_counter() - start_time
 
-def convert(infile: str = None, outfile: str = None) -> None:
-    """Parse the Umlet .uxf XML file and generate the code
+    return package_name, outfile, source, line_ctr, parse_seconds, render_seconds
+
+
+def render_panel_batch(panel_list: list = None, level: int = LOG_LEVEL) -> list:
+    """Render a batch of panels in a worker process, keeping the log records of each panel.
+    :param panel_list: {list} - of (pa_attrib_ctr, content)
+    :param level: {int} - the log level of the parent
+    :returns result_list: {list} - of (render_panel() result, record_list)
+    """
+    root_logger = logging.getLogger()
+    handler_list = root_logger.handlers
+    # The log file handler is inherited from the parent on fork; only the parent may write to it
+    collector = LogRecordCollector()
+    root_logger.handlers = [collector]
+    root_logger.setLevel(level)
+
+    result_list = []
+    try:
+        for pa_attrib_ctr, content in panel_list:
+            result = render_panel(content, pa_attrib_ctr)
+            result_list.append((result, collector.record_list))
+            collector.record_list = []
+    finally:
+        root_logger.handlers = handler_list
+
+    return result_list
+
+
+def iter_panel_results(content_iter=None, workers: int = DEFAULT_WORKERS):
+    """Parse and render the panels, across a process pool when there is
+    more than one worker and more than one batch, and yield each panel
+    with its result in order.  Only a bounded number of batches is in
+    flight, so the panels may come straight from the streaming reader.
+    :param content_iter: {iterable} - of panel_attributes text
+    :param workers: {int}
+    :returns generator of (pa_attrib_ctr, content, result, record_list): {tuple} - record_list holds the log records of a worker, still to be handled
+    """
+    panel_iter = enumerate(content_iter, 1)
+    batch = list(itertools.islice(panel_iter, BATCH_SIZE))
+
+    if workers <= 1 or len(batch) < BATCH_SIZE:
+        for pa_attrib_ctr, content in itertools.chain(batch, panel_iter):
+            yield pa_attrib_ctr, content, render_panel(content, pa_attrib_ctr), []
+        return
+
+    # Only large diagrams need a process pool, so a small one does not pay for importing it
+    from concurrent.futures import ProcessPoolExecutor
+
+    logging.info("Going to generate the panels with '{}' workers".format(workers))
+
+    level = logging.getLogger().getEffectiveLevel()
+    pending = collections.deque()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while batch or pending:
+            if batch:
+                pending.append((batch, executor.submit(render_panel_batch, batch, level)))
+                batch = list(itertools.islice(panel_iter, BATCH_SIZE))
+                if batch and len(pending) < workers * 2:
+                    continue
+
+            done_batch, future = pending.popleft()
+            for (pa_attrib_ctr, content), (result, record_list) in zip(done_batch, future.result()):
+                yield pa_attrib_ctr, content, result, record_list
+
+
+def convert(infile: str = None, outfile: str = None, metrics: RunMetrics = None, manifest: OutputManifest = None, workers: int = DEFAULT_WORKERS, dry_run: bool = False) -> None:
+    """Parse the Umlet .uxf XML file and generate the code.
+    The panels are parsed and rendered across worker processes, but
+    all logging, output and filesystem work happens here, in panel
+    order, so the log and summary do not depend on the number of
+    workers.  Each module is written as soon as its panel is rendered,
+    after the package directories it needs, see GenerationPlan.
     :param infile: {str}
     :param outfile: {str}
+    :param metrics: {RunMetrics} - optional, receives the phase timings and the time of each panel
+    :param manifest: {OutputManifest} - optional, records the written modules
+    :param workers: {int} - number of worker processes
+    :param dry_run: {bool} - whether to print the plan instead of applying it
     :returns None:
     """
-    panel_attributes_list = get_panel_attributes_list(infile)
-
-    for pa_attrib_ctr, panel_attributes in enumerate(panel_attributes_list, 1):
-        
-    
-        content = panel_attributes.text
-        
-        logging.info("Here is the content for panel_attributes number '{}' '{}'".format(content, pa_attrib_ctr))        
-        # print("content '{}'".format(content))        
-    
-        package_name = None
-        class_desc = 'INSERT CLASS DESCRIPTION HERE'
-        import_list = []
-        attribute_list = []
-        method_list = []
-        inherits_from_class = None
-        is_singleton = False
-        
-        in_attribute_section = False
-        in_method_section = False
-    
-        line_ctr = 0
-
-        for line in content.split("\n"):
-            line_ctr += 1
-            line = line.strip()
-            if line_ctr == 1:
-                package_name = line
-                logging.info("Found package name '{}'".format(package_name))
-                continue
-            if line.startswith('//singleton'):
-                is_singleton = True
-                logging.info("Found indication that this class is a singleton")
-                continue
-            if line.startswith('//desc:'):
-                class_desc = line.replace('//desc:', '')
-                logging.info("Found class description '{}'".format(class_desc))
-                continue
-            if line.startswith('//inherits:'):
-                inherits_from_class = line.replace('//inherits:', '')
-                logging.info("Found inherits '{}'".format(inherits_from_class))
-                continue
-            if line.startswith('//import') or line.startswith('//from'):
-                line = line.replace('//', '')
-                logging.info("Found import '{}'".format(line))
-                import_list.append(line)
-                continue
-            if line.startswith('--'):
-                if in_attribute_section:
-                    logging.info("Found method section")
-                    in_method_section = True
-                    in_attribute_section = False
-                else:
-                    logging.info("Found attribute section")
-                    in_attribute_section = True
-                    in_method_section = False
-                continue
-            if in_attribute_section:
-                attribute_list.append(line)
-                logging.info("Found attribute '{}'".format(line))
-                continue
-            elif in_method_section:
-                if len(line) > 5:
-                    method_list.append(line)
-                    logging.info("Found method '{}'".format(line))
-                else:
-                    logging.info("Going to ignore method line '{}' at line number '{}'".format(line, line_ctr))
-                continue
-            else:
-                logging.error("Don't know what to do with '{}' at line number '{}'".format(line, line_ctr))
-                continue
-        
+    if manifest is None:
+        manifest = OutputManifest()
+
+    plan = GenerationPlan(dry_run=dry_run)
+
+    # Each panel is generated as soon as it is parsed rather than after the whole diagram
+    content_iter = time_iter(metrics, 'xml_parse', iter_panel_attributes(infile))
+
+    for pa_attrib_ctr, content, result, record_list in iter_panel_results(content_iter, workers):
+        package_name, module_file, source, line_ctr, parse_seconds, render_seconds = result
+
+        for record in record_list:
+            logging.getLogger(record.name).handle(record)
+
         print("Parsed '{}' lines in panel_attributes number '{}' for package '{}'".format(line_ctr, pa_attrib_ctr, package_name))
 
-        create_class_definition(package_name, class_desc, inherits_from_class, import_list, attribute_list, method_list, is_singleton)
-            
+        start_time = time.perf_counter()
 
-def create_class_definition(package_name, class_desc, inherits_from_class, import_list, attribute_list, method_list, is_singleton):
-    """
-    """
-    path = package_name.split('.')
-    class_name = path[-1]
-
-    logging.info("class name '{}'".format(class_name))
-    filename = path[-2]
-    
-    logging.info("filename '{}'".format(filename))
-
-    count = len(path)
-    dirname_list = []
-    for i, dir in enumerate(path):
-        if i < count - 2:
-            dirname_list.append(dir)
-    dirname = '/'.join(dirname_list)
-    
-    logging.info("dirname '{}'".format(dirname))
-
-    if not os.path.exists(dirname):
-        pathlib.Path(dirname).mkdir(parents=True, exist_ok=True)
-
-    cumulative_path = ''
-    for dir in dirname_list:
-        cumulative_path += dir + '/'
-        file = cumulative_path + '__init__.py'
-        logging.info("Will check for file '{}'".format(file))
-        if not os.path.exists(file):
-            Path(file).touch()
-            logging.info("touched file '{}'".format(file))
-
-    outfile = os.path.join(dirname, filename + '.py')        
-    if os.path.exists(outfile):
-        bak_file = outfile + '.bak'
-        shutil.move(outfile, bak_file)
-        logging.info("Backed up outfile '{}' to '{}'".format(outfile, bak_file))
-
-    with open(outfile, 'w') as fh:
-        for line in import_list:
-            fh.write("{}\n".format(line))
-
-        if is_singleton:
-            fh.write("from singleton_decorator import singleton\n")
-
-        if inherits_from_class is not None:
-            # E.g.: inherits_from_class = some.package.namespace.Converter
-
-            inherits_parts = inherits_from_class.split('.')
-            # e.g.: inherits_parts will be ['some', 'package', 'namespace', 'Converter']
-
-            base_class_name = inherits_parts[-1] 
-            # e.g.: base_class_name will be Converter
-            
-            inherits_import = inherits_from_class.replace('.' + base_class_name, '')  
-            # e.g.: inherits_import will be some.package.namespace
-
-            fh.write("from {} import {}\n".format(inherits_import, base_class_name))
-
-            fh.write("\n\n")
-
-            if is_singleton:
-                fh.write("@singleton\n")
-
-            fh.write("class {}({}):\n".format(class_name, base_class_name))
-        else:
-            fh.write("\n\n")
-
-            if is_singleton:
-                fh.write("@singleton\n")
-
-            fh.write("class {}():\n".format(class_name))
-
-        fh.write("    '''{}\n".format(class_desc))
-        fh.write("    '''\n\n")
-        fh.write("    def __init__(self, **kwargs):\n")
-        fh.write("        '''Class constructor\n")
-        fh.write("        '''\n\n")
-        for attribute in attribute_list:
-            logging.info("Process attribute '{}'".format(attribute))
-            fh.write("        if '{}' in kwargs:\n".format(attribute))
-            fh.write("            self._{} = kwargs['{}']\n\n".format(attribute, attribute))
-        fh.write("\n")
-
-        insert_check_file_status_private_method = False
-
-        for method in method_list:
-            method_name, formatted_params, param_desc_list, return_type, params_name_list = get_param_desc_list(method)            
-            fh.write("    def {}(self, {}) -> {}:\n".format(method_name, formatted_params, return_type))
-            fh.write("        '''INSERT DESCRIPTION HERE\n")
-            for param_desc in param_desc_list:
-                fh.write("        :param {}: {{{}}} -\n".format(param_desc['param_name'], param_desc['datatype']))
-            fh.write("        '''\n\n")
-
-            for param_name in params_name_list:
-                if 'file' in param_name:
-                    if 'outfile' not in param_name:
-                        fh.write("        self._check_infile_status({})\n\n".format(param_name))
-                        insert_check_file_status_private_method = True
-
-
-        #! Move this to a Jinja2 template soon
-        fh.write("    def _check_infile_status(self, infile: str = None) -> None:\n")
-        fh.write("        '''Check the input file for the following:\n")
-        fh.write("        1) does the file variable defined\n")
-        fh.write("        2) does the file exist\n")
-        fh.write("        3) does the file a regular file or a file symlink\n")
-        fh.write("        4) does the file have content\n")
-        fh.write("        :param infile: {str} - input file to check status of\n")
-        fh.write("        '''\n\n")
-        fh.write("        if {} is None or {} == '':\n".format(param_name, param_name))
-        fh.write("            logging.error(\"'{{}}' is not defined'\".format({}))\n".format(param_name))
-        fh.write("            sys.exit(1)\n\n")
-        fh.write("        if not os.path.exists({}):\n".format(param_name))
-        fh.write("            logging.error(\"file '{{}}' does not exist'\".format({}))\n".format(param_name))
-        fh.write("            sys.exit(1)\n\n")
-        fh.write("        if not os.path.isfile({}):\n".format(param_name))
-        fh.write("            logging.error(\"'{{}}' is not a regular file or a symlink to a file\".format({}))\n".format(param_name))
-        fh.write("            sys.exit(1)\n\n")
-        fh.write("        if not os.stat({}) == 0:\n".format(param_name))
-        fh.write("            logging.error(\"file '{{}}' has no content\".format({}))\n".format(param_name))
-        fh.write("            sys.exit(1)\n\n")
-
-
-    
-    print("Wrote output file '{}'".format(outfile))
-
-
-def get_param_desc_list(line):
-    """
-    """
-    logging.info("Going to derive parameter details from method definition '{}'".format(line))
-    split1 = line.split('(')
-    split2 = split1[1].split(')')
-    split3 = split2[0].split(',')
-    
-    param_details_list = []
-    params = []
-    params_name_list = []
-    for param_details in split3:
-        param_name, type_default = param_details.split(':')
-        param_name = param_name.strip()
-        params_name_list.append(param_name)
-        datatype, default = type_default.split('=')
-        datatype = datatype.strip()
-        default = default.strip()
-        param_details_list.append({'param_name': param_name, 'datatype': datatype, 'default': default})
-        params.append('{}: {} = {}'.format(param_name, datatype, default))
-
-    formatted_params = ', '.join(params)
-    method_name = split1[0].strip()
-    return_type = split2[1].strip()
-    if return_type.startswith('->'):
-        return_type =  return_type.replace('->', '')
-    if return_type.endswith(':'):
-        return_type =  return_type.replace(':', '')
-    
-    return method_name, formatted_params, param_details_list, return_type, params_name_list
+        # A module that is replaced is backed up to .bak, one that is unchanged is not touched
+        with time_phase(metrics, 'write'):
+            status = plan.write_module(module_file, source, manifest, backup=True)
 
+        # A dry run prints the whole plan at the end instead
+        if not dry_run:
+            if status == UNCHANGED:
+                print("Output file '{}' is unchanged".format(module_file))
+            else:
+                print("Wrote output file '{}'".format(module_file))
+
+        if metrics is not None:
+            # With workers these add up the time spent in every worker process
+            metrics.add_phase_time('panel_parse', parse_seconds)
+            metrics.add_phase_time('render', render_seconds)
+            metrics.add_input(package_name, parse_seconds + render_seconds + time.perf_counter() - start_time, len(content.encode()), line_ctr)
+
+    if dry_run:
+        print(plan.format_plan())
 
 
 @click.command()
@@ -283,7 +197,11 @@ def get_param_desc_list(line):
 @click.option('--infile', help='The input file - should be the Umlet .uxf XML file')
 @click.option('--logfile', help="The log file - if not is specified a default will be assigned")
 @click.option('--verbose', is_flag=True, help="Whether to execute in verbose mode - default is {}".format(DEFAULT_VERBOSE))
-def main(outdir, outfile, infile, logfile, verbose):
+@click.option('--metrics', '--profile', 'metrics', is_flag=True, help="Whether to write the phase timings, throughput, peak memory and slowest panels to a .metrics.json file next to the output file")
+@click.option('--workers', type=int, help="The number of worker processes that parse and render the panels - default is the CPU count {}".format(DEFAULT_WORKERS))
+@click.option('--manifest', help="The JSON file of the content hashes of the generated modules, used to only write the modules that changed - default is {} in the current directory, where the package directories are created".format(MANIFEST_BASENAME))
+@click.option('--dry-run', is_flag=True, help="Whether to only print the package directories, __init__.py files and modules that would be written")
+def main(outdir, outfile, infile, logfile, verbose, metrics, workers, manifest, dry_run):
     """Parses the Umlet .uxf XML file and generates the Python API code
     """
 
@@ -299,6 +217,11 @@ def main(outdir, outfile, infile, logfile, verbose):
         print(Style.RESET_ALL + '', end='')
         sys.exit(1)
 
+    if workers is not None and workers < 1:
+        print(Fore.RED + "--workers must be at least 1 but was '{}'".format(workers))
+        print(Style.RESET_ALL + '', end='')
+        sys.exit(1)
+
     assert isinstance(infile, str)
 
     if not os.path.exists(infile):
@@ -341,12 +264,39 @@ def main(outdir, outfile, infile, logfile, verbose):
 
     assert isinstance(outfile, str)
 
+    if manifest is None:
+        manifest = MANIFEST_BASENAME
+        print(Fore.YELLOW + "--manifest was not specified and therefore was set to '{}'".format(manifest))
+        print(Style.RESET_ALL + '', end='')
+
+    if workers is None:
+        workers = DEFAULT_WORKERS
+        print(Fore.YELLOW + "--workers was not specified and therefore was set to default '{}'".format(workers))
+        print(Style.RESET_ALL + '', end='')
+
 
     logging.basicConfig(filename=logfile,
                     format=LOGGING_FORMAT,
                     level=LOG_LEVEL)
 
-    convert(infile, outfile)
+    run_metrics = None
+    if metrics:
+        run_metrics = RunMetrics(tool=os.path.splitext(os.path.basename(__file__))[0])
+
+    if dry_run:
+        # Loaded to tell the unchanged modules apart, but never saved
+        output_manifest = OutputManifest(manifest_file=manifest)
+        output_manifest.load()
+        convert(infile, outfile, run_metrics, output_manifest, workers, dry_run)
+    else:
+        with OutputManifest(manifest_file=manifest) as output_manifest:
+            convert(infile, outfile, run_metrics, output_manifest, workers)
+
+        print(output_manifest.format_summary())
+        logging.info(output_manifest.format_summary())
+
+    if run_metrics is not None:
+        run_metrics.write(get_metrics_file(outfile))
 
 
 if __name__ == "__main__":